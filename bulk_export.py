@@ -0,0 +1,51 @@
+"""
+Script para exportar papers o logs de búsqueda en NDJSON, CSV, Parquet o Arrow
+
+Uso:
+    python bulk_export.py papers --format ndjson -o papers.ndjson
+    python bulk_export.py search_logs --format parquet -o search_logs.parquet
+    python bulk_export.py papers --format csv > papers.csv
+"""
+import sys
+import os
+import argparse
+import time
+
+# Agregar el directorio src al path para importar módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.database.connection import SessionLocal
+from src.services.export_service import EXPORT_TABLES, export_rows, validate_export_format
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportación masiva de papers y logs de búsqueda")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES), help="Tabla a exportar")
+    parser.add_argument("--format", default="ndjson", choices=["ndjson", "csv", "parquet", "arrow"], help="Formato de salida")
+    parser.add_argument("-o", "--output", default="-", help="Archivo de salida ('-' para stdout)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Filas por lote del cursor")
+    args = parser.parse_args()
+
+    try:
+        fmt = validate_export_format(args.format)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    db = SessionLocal()
+    start_time = time.perf_counter()
+    written = 0
+    try:
+        for chunk in export_rows(db, args.table, fmt, args.chunk_size):
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        db.close()
+        if output is not sys.stdout.buffer:
+            output.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"📤 {args.table} exportado ({fmt}): {written / 1024 / 1024:.1f} MB en {elapsed:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Script para importar papers masivamente desde archivos NDJSON o CSV
+
+Uso:
+    python bulk_import_papers.py papers.ndjson
+    python bulk_import_papers.py papers.csv --batch-size 500
+    cat papers.ndjson | python bulk_import_papers.py - --format ndjson
+"""
+import sys
+import os
+import argparse
+import io
+
+# Agregar el directorio src al path para importar módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.database.connection import SessionLocal
+from src.services.bulk_service import bulk_import_papers, detect_format
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de papers (NDJSON/CSV)")
+    parser.add_argument("path", help="Archivo a importar ('-' para leer de stdin)")
+    parser.add_argument("--format", choices=["ndjson", "jsonl", "csv"], help="Formato del archivo (por defecto según la extensión)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Filas por lote/transacción")
+    parser.add_argument("--creator-id", type=int, default=None, help="ID del usuario creador de los papers")
+    parser.add_argument("--show-errors", type=int, default=20, help="Número de errores a mostrar")
+    args = parser.parse_args()
+
+    fmt = detect_format(None if args.path == "-" else args.path, args.format)
+
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        stream = open(args.path, "r", encoding="utf-8-sig", newline="")
+
+    db = SessionLocal()
+    try:
+        report = bulk_import_papers(db, stream, fmt, args.creator_id, args.batch_size)
+    finally:
+        db.close()
+        stream.close()
+
+    print(f"📥 Filas procesadas: {report['total_rows']}")
+    print(f"✅ Insertadas: {report['inserted']}")
+    print(f"❌ Con error: {report['failed']}")
+    print(f"⏱️  {report['elapsed_seconds']:.2f}s ({report['rows_per_second']:.0f} filas/s)")
+
+    for error in report["errors"][:args.show_errors]:
+        doi = f" [{error['doi']}]" if error.get("doi") else ""
+        print(f"  - Fila {error['row']}{doi}: {error['error']}")
+    if report["failed"] > args.show_errors:
+        print(f"  ... y {report['failed'] - args.show_errors} errores más")
+
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Script para registrar usuarios masivamente desde archivos NDJSON o CSV
+
+Uso:
+    python bulk_register_users.py estudiantes.csv
+    python bulk_register_users.py estudiantes.ndjson --workers 8 --batch-size 200
+    cat estudiantes.ndjson | python bulk_register_users.py - --format ndjson
+
+Columnas/campos: username, email, password, full_name (opcional)
+"""
+import sys
+import os
+import argparse
+import io
+
+# Agregar el directorio src al path para importar módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.database.connection import SessionLocal
+from src.services.auth_service import calibrate_password_hashing
+from src.services.bulk_service import detect_format
+from src.services.bulk_user_service import bulk_register_users
+
+def main():
+    parser = argparse.ArgumentParser(description="Alta masiva de usuarios (NDJSON/CSV)")
+    parser.add_argument("path", help="Archivo a importar ('-' para leer de stdin)")
+    parser.add_argument("--format", choices=["ndjson", "jsonl", "csv"], help="Formato del archivo (por defecto según la extensión)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Filas por lote/transacción")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para hashear (por defecto todos los cores)")
+    parser.add_argument("--show-errors", type=int, default=20, help="Número de errores a mostrar")
+    args = parser.parse_args()
+
+    fmt = detect_format(None if args.path == "-" else args.path, args.format)
+
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+    else:
+        stream = open(args.path, "r", encoding="utf-8-sig", newline="")
+
+    # Mismo costo de hashing que usaría la API en este host
+    calibrate_password_hashing()
+
+    db = SessionLocal()
+    try:
+        report = bulk_register_users(db, stream, fmt, args.batch_size, args.workers or os.cpu_count() or 1)
+    finally:
+        db.close()
+        stream.close()
+
+    print(f"📥 Filas procesadas: {report['total_rows']}")
+    print(f"✅ Usuarios creados: {report['created']}")
+    print(f"❌ Con error: {report['failed']}")
+    print(f"🔐 Hashing: {report['hash_seconds']:.2f}s con {report['hash_workers']} procesos")
+    print(f"⏱️  {report['elapsed_seconds']:.2f}s ({report['rows_per_second']:.0f} filas/s)")
+
+    errors = [result for result in report["results"] if result["status"] == "error"]
+    for error in errors[:args.show_errors]:
+        username = f" [{error['username']}]" if error.get("username") else ""
+        print(f"  - Fila {error['row']}{username}: {error['error']}")
+    if len(errors) > args.show_errors:
+        print(f"  ... y {len(errors) - args.show_errors} errores más")
+
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,135 @@ class Settings(BaseSettings):
     jwt_secret_key: str = os.getenv("JWT_SECRET_KEY", "fallback-secret-key")
     jwt_algorithm: str = os.getenv("JWT_ALGORITHM", "HS256")
     access_token_expire_minutes: int = 30
+    # Backend JWT: "jose" (python-jose) o "pyjwt" (más rápido, soporta EdDSA)
+    jwt_backend: str = os.getenv("JWT_BACKEND", "jose")
+    # Claves PEM para algoritmos asimétricos (EdDSA, RS256, ES256...)
+    jwt_private_key: str = os.getenv("JWT_PRIVATE_KEY", "")
+    jwt_public_key: str = os.getenv("JWT_PUBLIC_KEY", "")
+    jwt_cache_max_entries: int = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Refresh tokens y revocación de sesiones
+    refresh_token_expire_days: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+    # Cada cuánto cada worker incorpora al Bloom filter las revocaciones hechas por otros
+    revocation_sync_seconds: float = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+    revocation_bloom_capacity: int = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+    revocation_bloom_error_rate: float = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+    
+    # Cache de usuarios autenticados (evita consultar la BD en cada request)
+    user_cache_ttl_seconds: int = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    user_cache_max_entries: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    
+    # Hashing de passwords: esquema para hashes nuevos (bcrypt, argon2id, pbkdf2_sha256)
+    password_hash_scheme: str = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+    # Tiempo objetivo de verificación para calibrar el costo al iniciar; solo sube los costos de abajo (0 = usar costos fijos)
+    password_hash_target_ms: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", "100"))
+    bcrypt_rounds: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    pbkdf2_iterations: int = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+    argon2_time_cost: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    argon2_memory_kib: int = int(os.getenv("ARGON2_MEMORY_KIB", "65536"))
+    argon2_parallelism: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+    
+    # Rate limiting de endpoints de autenticación (token bucket por IP y por username)
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # "memory" (por proceso) o "sqlite" (archivo local compartido por los workers)
+    rate_limit_store: str = os.getenv("RATE_LIMIT_STORE", "memory")
+    rate_limit_sqlite_path: str = os.getenv("RATE_LIMIT_SQLITE_PATH", "data/ratelimit.db")
+    auth_rate_limit_ip_burst: int = int(os.getenv("AUTH_RATE_LIMIT_IP_BURST", "50"))
+    auth_rate_limit_ip_per_minute: float = float(os.getenv("AUTH_RATE_LIMIT_IP_PER_MINUTE", "120"))
+    auth_rate_limit_user_burst: int = int(os.getenv("AUTH_RATE_LIMIT_USER_BURST", "10"))
+    auth_rate_limit_user_per_minute: float = float(os.getenv("AUTH_RATE_LIMIT_USER_PER_MINUTE", "20"))
+    # Máximo de hashes de password simultáneos por proceso (el resto recibe 503)
+    auth_max_concurrent_hashes: int = int(os.getenv("AUTH_MAX_CONCURRENT_HASHES", str(os.cpu_count() or 2)))
+    
+    # Carga y exportación masiva
+    bulk_batch_size: int = int(os.getenv("BULK_BATCH_SIZE", "500"))
+    bulk_max_reported_errors: int = int(os.getenv("BULK_MAX_REPORTED_ERRORS", "1000"))
+    bulk_max_reported_results: int = int(os.getenv("BULK_MAX_REPORTED_RESULTS", "1000"))
+    # Procesos del pool compartido que hashea el alta masiva de usuarios; ocupan cupos de
+    # AUTH_MAX_CONCURRENT_HASHES (0 = la mitad, el resto queda para login/registro)
+    bulk_hash_workers: int = int(os.getenv("BULK_HASH_WORKERS", "0"))
+    export_chunk_size: int = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+    
+    # Cache HTTP (ETag / Cache-Control)
+    cache_control_papers: str = os.getenv("CACHE_CONTROL_PAPERS", "public, max-age=60")
+    cache_control_search: str = os.getenv("CACHE_CONTROL_SEARCH", "public, max-age=30")
+    
+    # Compresión de respuestas (gzip/br/zstd); niveles bajos priorizan latencia
+    compression_enabled: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    compression_min_size: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    gzip_level: int = int(os.getenv("GZIP_LEVEL", "5"))
+    brotli_quality: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    zstd_level: int = int(os.getenv("ZSTD_LEVEL", "3"))
+    
+    # Endpoints de administración (/api/v1/admin); vacío = deshabilitados
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    
+    # Monitor de lag del event loop
+    loop_lag_enabled: bool = os.getenv("LOOP_LAG_ENABLED", "true").lower() == "true"
+    loop_lag_interval_ms: float = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+    loop_lag_threshold_ms: float = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+    loop_lag_max_events: int = int(os.getenv("LOOP_LAG_MAX_EVENTS", "200"))
+    
+    # Perfilado bajo demanda (header X-Profile o toggle en /api/v1/admin/profiling)
+    profiling_interval_ms: float = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+    profiling_max_stored: int = int(os.getenv("PROFILING_MAX_STORED", "50"))
+    # Directorio donde además se escriben los perfiles (.collapsed y .speedscope.json); vacío = solo memoria
+    profiling_output_dir: str = os.getenv("PROFILING_OUTPUT_DIR", "")
+    
+    # Profiler de muestreo continuo (flamegraph en /api/v1/admin/flamegraph)
+    profiler_enabled: bool = os.getenv("PROFILER_ENABLED", "true").lower() == "true"
+    profiler_interval_ms: float = float(os.getenv("PROFILER_INTERVAL_MS", "20"))
+    profiler_max_stacks: int = int(os.getenv("PROFILER_MAX_STACKS", "2000"))
+    profiler_include_idle: bool = os.getenv("PROFILER_INCLUDE_IDLE", "false").lower() == "true"
+    # Directorio donde escribir el flamegraph al cerrar la app (ej. reports); vacío = no escribir
+    profiler_report_dir: str = os.getenv("PROFILER_REPORT_DIR", "")
+    
+    # Búsqueda tolerante a errores ("did you mean"): distancia máxima de SymSpell y similitud de trigramas
+    search_max_edit_distance: int = int(os.getenv("SEARCH_MAX_EDIT_DISTANCE", "2"))
+    search_trigram_similarity: float = float(os.getenv("SEARCH_TRIGRAM_SIMILARITY", "0.4"))
+    # Índice persistido (formato mmap); vacío = solo en memoria. Cada cuántos segundos se revisa si otro proceso publicó uno nuevo
+    search_index_path: str = os.getenv("SEARCH_INDEX_PATH", "data/search_index.idx")
+    search_index_reload_seconds: float = float(os.getenv("SEARCH_INDEX_RELOAD_SECONDS", "5"))
+    # Valores por faceta (año, keyword, autor) en las respuestas con facets=
+    search_facet_limit: int = int(os.getenv("SEARCH_FACET_LIMIT", "10"))
+    # Búsqueda semántica (TF-IDF con hashing + SVD truncada); vectores persistidos como memmap en el directorio
+    semantic_dimensions: int = int(os.getenv("SEMANTIC_DIMENSIONS", "128"))
+    semantic_hash_features: int = int(os.getenv("SEMANTIC_HASH_FEATURES", "32768"))
+    semantic_index_dir: str = os.getenv("SEMANTIC_INDEX_DIR", "data/semantic")
+    # Desde cuántos papers se usa LSH (aproximado) en lugar del coseno contra todos
+    semantic_ann_min_docs: int = int(os.getenv("SEMANTIC_ANN_MIN_DOCS", "20000"))
+    semantic_lsh_tables: int = int(os.getenv("SEMANTIC_LSH_TABLES", "8"))
+    semantic_lsh_bits: int = int(os.getenv("SEMANTIC_LSH_BITS", "12"))
+    # Ranking híbrido: peso del puntaje por keywords (0 = solo semántico) y candidatos a combinar
+    semantic_keyword_weight: float = float(os.getenv("SEMANTIC_KEYWORD_WEIGHT", "0.3"))
+    semantic_candidates: int = int(os.getenv("SEMANTIC_CANDIDATES", "200"))
+    # Planes del lenguaje de consultas (author:, year:a..b, cited:>N, AND/OR/NOT) cacheados por consulta
+    query_plan_cache_size: int = int(os.getenv("QUERY_PLAN_CACHE_SIZE", "1000"))
+    # Largo máximo de una consulta del lenguaje (los paréntesis y NOT anidados se limitan aparte)
+    query_max_length: int = int(os.getenv("QUERY_MAX_LENGTH", "1000"))
+    # Change log de papers: cada cuántos segundos cada worker lee los cambios de los demás (0 = solo los propios),
+    # cambios por lectura y cuántos se conservan (un worker más atrasado reconstruye sus estructuras)
+    change_feed_poll_seconds: float = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "0.5"))
+    change_feed_batch_size: int = int(os.getenv("CHANGE_FEED_BATCH_SIZE", "500"))
+    change_log_retention: int = int(os.getenv("CHANGE_LOG_RETENTION", "100000"))
+    # Warm-up del cache de búsquedas al iniciar: las N consultas más frecuentes de search_logs de los últimos días,
+    # ponderadas por recencia (vida media en horas), con un presupuesto de tiempo (0 consultas = desactivado)
+    search_warmup_queries: int = int(os.getenv("SEARCH_WARMUP_QUERIES", "200"))
+    search_warmup_lookback_days: int = int(os.getenv("SEARCH_WARMUP_LOOKBACK_DAYS", "7"))
+    search_warmup_half_life_hours: float = float(os.getenv("SEARCH_WARMUP_HALF_LIFE_HOURS", "24"))
+    search_warmup_time_budget_seconds: float = float(os.getenv("SEARCH_WARMUP_TIME_BUDGET_SECONDS", "60"))
+    # Fracción del tráfico reciente (ponderado) que debe poder servirse del cache antes de aceptar requests
+    # (0 = no esperar: el warm-up sigue en segundo plano) y espera máxima
+    search_warmup_target_hit_ratio: float = float(os.getenv("SEARCH_WARMUP_TARGET_HIT_RATIO", "0"))
+    search_warmup_timeout_seconds: float = float(os.getenv("SEARCH_WARMUP_TIMEOUT_SECONDS", "30"))
+    # Búsquedas en tendencia (Count-Min sketch + heap top-k por ventana, HyperLogLog de buscadores distintos);
+    # snapshot periódico en disco, uno por worker (<ruta>.<pid>.npz; vacío = solo en memoria)
+    trending_top_k: int = max(1, int(os.getenv("TRENDING_TOP_K", "50")))
+    trending_cms_width: int = int(os.getenv("TRENDING_CMS_WIDTH", "2048"))
+    trending_cms_depth: int = int(os.getenv("TRENDING_CMS_DEPTH", "4"))
+    trending_hll_precision: int = int(os.getenv("TRENDING_HLL_PRECISION", "12"))
+    trending_snapshot_path: str = os.getenv("TRENDING_SNAPSHOT_PATH", "data/trending.npz")
+    trending_snapshot_seconds: float = float(os.getenv("TRENDING_SNAPSHOT_SECONDS", "60"))
     
     # Mock API
     mock_enabled: bool = os.getenv("MOCK_ENABLED", "true").lower() == "true"
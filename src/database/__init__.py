@@ -1,5 +1,5 @@
 # Database models and connection
-from .models import User, Paper, SearchLog, Base
+from .models import User, Paper, PaperChange, SearchLog, UserSession, Base
 from .connection import get_db, create_tables, engine
 
-__all__ = ["User", "Paper", "SearchLog", "Base", "get_db", "create_tables", "engine"]
+__all__ = ["User", "Paper", "PaperChange", "SearchLog", "UserSession", "Base", "get_db", "create_tables", "engine"]
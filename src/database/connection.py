@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
-from .models import Base
+from .models import Base, PAPER_CHANGE_TRIGGERS
+from .normalization import normalized_paper_columns
 from ..config import settings
 import os
 
@@ -20,6 +21,59 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def create_tables():
     """Crear todas las tablas en la base de datos"""
     Base.metadata.create_all(bind=engine)
+    add_search_columns()
+    add_session_columns()
+    create_missing_indexes()
+    create_change_log_triggers()
+
+def create_missing_indexes():
+    """Crear índices declarados en los modelos que no existen en tablas ya creadas"""
+    # create_all omite los índices nuevos de tablas existentes
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def create_change_log_triggers(bind=None):
+    """Crear los triggers del change log en bases cuya tabla papers ya existía"""
+    with (bind or engine).begin() as conn:
+        for trigger in PAPER_CHANGE_TRIGGERS:
+            conn.execute(text(trigger))
+
+def add_search_columns(bind=None, batch_size: int = 1000):
+    """Agregar y poblar las columnas normalizadas de búsqueda en bases creadas antes de que existieran"""
+    bind = bind or engine
+    existing = {column["name"] for column in inspect(bind).get_columns("papers")}
+    with bind.begin() as conn:
+        for column, ddl in (("title_norm", "VARCHAR(500)"), ("authors_norm", "TEXT"), ("keywords_norm", "TEXT")):
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE papers ADD COLUMN {column} {ddl}"))
+    
+    # Backfill por lotes de las filas sin normalizar
+    select_pending = text(
+        "SELECT id, title, authors, keywords FROM papers WHERE title_norm IS NULL ORDER BY id LIMIT :limit"
+    )
+    update = text(
+        "UPDATE papers SET title_norm = :title_norm, authors_norm = :authors_norm, "
+        "keywords_norm = :keywords_norm WHERE id = :id"
+    )
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(select_pending, {"limit": batch_size}).fetchall()
+            if not rows:
+                return
+            conn.execute(update, [
+                {"id": row.id, **normalized_paper_columns(row.title, row.authors, row.keywords)}
+                for row in rows
+            ])
+
+def add_session_columns(bind=None):
+    """Agregar previous_hash (detección de reuso de refresh tokens) en bases creadas antes de que existiera"""
+    bind = bind or engine
+    existing = {column["name"] for column in inspect(bind).get_columns("user_sessions")}
+    if "previous_hash" not in existing:
+        with bind.begin() as conn:
+            conn.execute(text("ALTER TABLE user_sessions ADD COLUMN previous_hash VARCHAR(64)"))
+
 def get_db() -> Generator[Session, None, None]:
     """Dependency para obtener sesión de base de datos"""
     db = SessionLocal()
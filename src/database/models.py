@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Boolean, DDL, event, func, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import deferred, sessionmaker, relationship
 from datetime import datetime
+from .normalization import normalized_paper_columns
 import os
 
 Base = declarative_base()
@@ -31,14 +32,68 @@ class Paper(Base):
     doi = Column(String(100), unique=True)
     pdf_url = Column(String(500))
     keywords = Column(Text)  # JSON string de keywords
-    citation_count = Column(Integer, default=0)
+    citation_count = Column(Integer, default=0, index=True)  # ORDER BY de /papers/popular
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Columnas de búsqueda sin acentos y en minúsculas ("García" -> "garcia"), mantenidas al escribir
+    # (deferred: solo se usan en filtros, no se cargan con el paper)
+    title_norm = deferred(Column(String(500)))
+    authors_norm = deferred(Column(Text))
+    keywords_norm = deferred(Column(Text))
+    
     # Foreign key al usuario que creó el paper
     creator_id = Column(Integer, ForeignKey("users.id"))
     creator = relationship("User", back_populates="papers")
 
+SEARCH_SOURCE_COLUMNS = ("title", "authors", "keywords")
+
+@event.listens_for(Paper, "before_insert")
+def _normalize_new_paper(mapper, connection, target):
+    for column, value in normalized_paper_columns(target.title, target.authors, target.keywords).items():
+        setattr(target, column, value)
+
+@event.listens_for(Paper, "before_update")
+def _normalize_updated_paper(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[column].history.has_changes() for column in SEARCH_SOURCE_COLUMNS):
+        for column, value in normalized_paper_columns(target.title, target.authors, target.keywords).items():
+            setattr(target, column, value)
+
+class PaperChange(Base):
+    __tablename__ = "paper_changes"
+    # Change log de papers: lo escriben triggers de SQLite en la misma transacción que la escritura,
+    # así también registra los inserts de Core (carga masiva) y el SQL directo. AUTOINCREMENT no
+    # reutiliza números y SQLite serializa las escrituras: seq es monótono en orden de commit
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    paper_id = Column(Integer, nullable=False)
+    op = Column(String(6), nullable=False)  # "insert", "update" o "delete"
+    changed_at = Column(DateTime, server_default=func.current_timestamp())
+
+PAPER_CHANGE_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS papers_log_{op} AFTER {op.upper()} ON papers "
+    f"BEGIN INSERT INTO paper_changes (paper_id, op) VALUES ({row}.id, '{op}'); END"
+    for op, row in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD"))
+)
+
+for _trigger in PAPER_CHANGE_TRIGGERS:
+    event.listen(Paper.__table__, "after_create", DDL(_trigger))
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+    
+    # id = "sid" del access token; el refresh token solo se guarda como SHA-256
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    refresh_hash = Column(String(64), nullable=False)
+    # Hash del refresh token reemplazado en la última rotación: presentarlo de nuevo es un reuso
+    previous_hash = Column(String(64), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+
 class SearchLog(Base):
     __tablename__ = "search_logs"
     
@@ -47,4 +102,4 @@ class SearchLog(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     results_count = Column(Integer, default=0)
     search_type = Column(String(50))  # "papers", "authors", etc.
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # rango reciente del warm-up
@@ -0,0 +1,41 @@
+from typing import Iterable, Optional
+import json
+import unicodedata
+
+# Separador entre elementos de listas normalizadas (autores, keywords)
+LIST_SEPARATOR = "\n"
+
+def fold_text(value: Optional[str]) -> str:
+    """Normalizar para búsqueda: NFKD, sin acentos y casefold ("García" -> "garcia")"""
+    if not value:
+        return ""
+    if value.isascii():
+        # Texto ASCII: NFKD no lo cambia y no hay marcas que quitar
+        return " ".join(value.casefold().split())
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+def fold_list(values: Iterable[str]) -> str:
+    """Normalizar cada elemento de una lista y unirlos con LIST_SEPARATOR"""
+    return LIST_SEPARATOR.join(fold_text(value) for value in values if value)
+
+def fold_json_list(value: Optional[str]) -> str:
+    """Normalizar una columna JSON de lista (authors/keywords tal como se guardan)"""
+    if not value:
+        return ""
+    try:
+        items = json.loads(value)
+    except ValueError:
+        return fold_text(value)
+    if not isinstance(items, list):
+        return fold_text(str(items))
+    return fold_list(str(item) for item in items)
+
+def normalized_paper_columns(title: Optional[str], authors_json: Optional[str], keywords_json: Optional[str]) -> dict:
+    """Columnas de búsqueda normalizadas a partir de los valores almacenados"""
+    return {
+        "title_norm": fold_text(title),
+        "authors_norm": fold_json_list(authors_json),
+        "keywords_norm": fold_json_list(keywords_json),
+    }
@@ -1,13 +1,24 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
 import time
 import logging
 from datetime import datetime
 
 from .config import settings
 from .models.schemas import HealthCheck, Message
-from .routers import papers_router, search_router, users_router, external_router
+from .routers import papers_router, search_router, users_router, external_router, admin_router
+from .middleware import CompressionMiddleware
+from .services.auth_service import calibrate_password_hashing
+from .services.change_feed import change_feed
+from .services.search_service import prepare_search_indexes
+from .services.search_warmup import search_warmup
+from .services.trending import trending_searches
+from .services.bulk_user_service import shutdown_hash_executor
+from .database import get_db
+from .monitoring import loop_lag_monitor, continuous_profiler, ProfilingMiddleware
 
 # Configurar logging
 logging.basicConfig(
@@ -21,6 +32,37 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Tareas de inicio y cierre de la aplicación"""
+    # Ajustar el costo de hashing de passwords al hardware de este host
+    calibrate_password_hashing()
+    # Seguir el change log con la misma sesión que usan los endpoints (respeta dependency_overrides)
+    change_feed.start(contextmanager(app.dependency_overrides.get(get_db, get_db)))
+    # Abrir o construir los índices de búsqueda fuera del event loop, antes de aceptar requests
+    await asyncio.to_thread(prepare_search_indexes, change_feed.session_factory)
+    if settings.search_warmup_queries > 0:
+        search_warmup.start(change_feed.session_factory, settings.search_warmup_target_hit_ratio)
+        if settings.search_warmup_target_hit_ratio > 0:
+            # No aceptar tráfico hasta que el cache cubra la fracción objetivo de las búsquedas recientes (acotado)
+            await asyncio.to_thread(search_warmup.wait_ready, settings.search_warmup_timeout_seconds)
+    # Restaurar las ventanas de búsquedas en tendencia del último snapshot y guardarlas periódicamente
+    trending_searches.start()
+    if settings.loop_lag_enabled:
+        loop_lag_monitor.start(app)
+    if settings.profiler_enabled:
+        continuous_profiler.start()
+    yield
+    await loop_lag_monitor.stop()
+    search_warmup.stop()
+    trending_searches.stop()
+    change_feed.stop()
+    shutdown_hash_executor()
+    if continuous_profiler.running:
+        continuous_profiler.stop()
+        if settings.profiler_report_dir:
+            continuous_profiler.write_report(settings.profiler_report_dir)
+
 # Crear la aplicación FastAPI
 app = FastAPI(
     title=settings.app_name,
@@ -53,6 +95,7 @@ app = FastAPI(
         "name": "MIT License",
         "url": "https://opensource.org/licenses/MIT",
     },
+    lifespan=lifespan,
 )
 
 # Configurar CORS
@@ -64,6 +107,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión gzip/br/zstd con umbral de tamaño mínimo
+app.add_middleware(CompressionMiddleware)
+
+# Perfilado bajo demanda; queda dentro del middleware de logging para muestrear la misma tarea que el endpoint
+app.add_middleware(ProfilingMiddleware)
+
 # Middleware para logging de requests
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -88,6 +137,7 @@ app.include_router(users_router)
 app.include_router(papers_router)
 app.include_router(search_router)
 app.include_router(external_router)
+app.include_router(admin_router)
 
 # Endpoints principales
 @app.get("/", response_model=Message, tags=["root"])
@@ -108,6 +158,21 @@ async def health_check():
         version=settings.app_version
     )
 
+@app.get("/ready", tags=["health"])
+async def readiness_check():
+    """
+    Readiness: con `SEARCH_WARMUP_TARGET_HIT_RATIO` responde 503 mientras el warm-up del cache no cubra esa
+    fracción de las búsquedas recientes (o no termine); sin objetivo, el warm-up corre en segundo plano.
+    """
+    waiting = (
+        settings.search_warmup_queries > 0 and settings.search_warmup_target_hit_ratio > 0
+        and not search_warmup.ready.is_set()
+    )
+    return JSONResponse(
+        status_code=503 if waiting else 200,
+        content={"status": "warming_up" if waiting else "ready", "warmup": search_warmup.stats()}
+    )
+
 @app.get("/info", tags=["info"])
 async def get_api_info():
     """
@@ -0,0 +1,4 @@
+# Middlewares ASGI
+from .compression import CompressionMiddleware
+
+__all__ = ["CompressionMiddleware"]
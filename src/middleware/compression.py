@@ -0,0 +1,90 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..config import settings
+from ..services.compression import StreamCompressor, choose_encoding, compress_body, is_compressible
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compresión con negociación gzip/br/zstd.
+    
+    - Respuestas completas menores a COMPRESSION_MIN_SIZE se envían sin comprimir.
+    - Respuestas en streaming se comprimen de forma incremental.
+    - Respuestas que ya traen Content-Encoding (p. ej. cuerpos precomprimidos del
+      cache de búsqueda) se dejan pasar sin tocar.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = settings.compression_min_size if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        responder = _CompressionResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+class _CompressionResponder:
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.compressor is None and not more_body:
+            # Respuesta completa: comprimir solo si supera el umbral
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if len(body) >= self.minimum_size:
+                body = compress_body(body, self.encoding)
+                headers["Content-Encoding"] = self.encoding
+                headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        
+        if self.compressor is None:
+            # Primera parte de una respuesta en streaming
+            self.compressor = StreamCompressor(self.encoding)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(self.start_message)
+        
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.flush()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,16 +1,18 @@
 # Pydantic models for API
 from .schemas import (
     User, UserCreate, UserLogin, UserInDB,
-    Paper, PaperCreate, PaperUpdate,
-    Token, TokenData, SearchQuery, SearchResponse,
+    Paper, PaperCreate, PaperUpdate, PaperPartial,
+    BulkRowError, BulkImportReport, BulkUserRowResult, BulkUserReport,
+    Token, TokenData, RefreshRequest, SearchQuery, SearchResponse,
     ExternalPaper, ExternalSearchResponse,
-    Message, HealthCheck
+    Message, HealthCheck, ProfilingToggle
 )
 
 __all__ = [
     "User", "UserCreate", "UserLogin", "UserInDB",
-    "Paper", "PaperCreate", "PaperUpdate",
-    "Token", "TokenData", "SearchQuery", "SearchResponse",
+    "Paper", "PaperCreate", "PaperUpdate", "PaperPartial",
+    "BulkRowError", "BulkImportReport", "BulkUserRowResult", "BulkUserReport",
+    "Token", "TokenData", "RefreshRequest", "SearchQuery", "SearchResponse",
     "ExternalPaper", "ExternalSearchResponse",
-    "Message", "HealthCheck"
+    "Message", "HealthCheck", "ProfilingToggle"
 ]
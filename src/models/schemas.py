@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
 # Schemas para User
@@ -58,10 +58,63 @@ class Paper(PaperBase):
     class Config:
         from_attributes = True
 
+class PaperPartial(BaseModel):
+    """Paper con proyección de campos (fields=); solo se serializan los campos pedidos"""
+    id: int
+    title: Optional[str] = None
+    abstract: Optional[str] = None
+    authors: Optional[List[str]] = None
+    publication_year: Optional[int] = None
+    doi: Optional[str] = None
+    pdf_url: Optional[str] = None
+    keywords: Optional[List[str]] = None
+    citation_count: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    creator_id: Optional[int] = None
+
+# Schemas para carga masiva
+class BulkRowError(BaseModel):
+    row: int
+    doi: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    total_rows: int
+    inserted: int
+    failed: int
+    errors: List[BulkRowError] = []
+    errors_truncated: bool = False
+    elapsed_seconds: float
+    rows_per_second: float
+
+class BulkUserRowResult(BaseModel):
+    row: int
+    username: Optional[str] = None
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkUserReport(BaseModel):
+    total_rows: int
+    created: int
+    failed: int
+    results: List[BulkUserRowResult] = []
+    results_truncated: bool = False
+    hash_workers: int
+    hash_seconds: float
+    elapsed_seconds: float
+    rows_per_second: float
+
 # Schemas para autenticación
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -71,11 +124,19 @@ class SearchQuery(BaseModel):
     q: str
     limit: Optional[int] = 10
     offset: Optional[int] = 0
+    fields: Optional[List[str]] = None
+    facets: Optional[List[str]] = None
+
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
 
 class SearchResponse(BaseModel):
     query: str
     total: int
-    results: List[Paper]
+    results: List[Union[Paper, PaperPartial]]
+    suggestion: Optional[str] = None  # "Quizás quisiste decir" cuando no hay resultados
+    facets: Optional[Dict[str, List[FacetCount]]] = None  # Conteos sobre todas las coincidencias
     
 # Schema para mock external API
 class ExternalPaper(BaseModel):
@@ -100,3 +161,10 @@ class HealthCheck(BaseModel):
     status: str
     timestamp: datetime
     version: str
+
+# Schemas de administración
+class ProfilingToggle(BaseModel):
+    enabled: bool
+    sample_rate: float = 1.0
+    path_prefix: str = ""
+    max_profiles: Optional[int] = None
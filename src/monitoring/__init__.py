@@ -0,0 +1,12 @@
+# Runtime monitoring
+from .loop_lag import LoopLagMonitor, loop_lag_monitor
+from .sampler import ContinuousProfiler, continuous_profiler
+from .profiling import ProfilingMiddleware, profiling_state, profile_store, speedscope_for
+from .stacks import collapsed_text, to_speedscope
+
+__all__ = [
+    "LoopLagMonitor", "loop_lag_monitor",
+    "ContinuousProfiler", "continuous_profiler",
+    "ProfilingMiddleware", "profiling_state", "profile_store", "speedscope_for",
+    "collapsed_text", "to_speedscope"
+]
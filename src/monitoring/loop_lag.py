@@ -0,0 +1,227 @@
+from ..config import settings
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 40
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LoopLagMonitor:
+    """
+    Mide el retraso de scheduling del event loop con un heartbeat asyncio.
+    Un hilo watchdog detecta el bloqueo mientras ocurre, captura el stack del hilo
+    del loop y lo atribuye a la ruta cuyo endpoint aparece en ese stack.
+    """
+
+    def __init__(self, interval_ms: float, threshold_ms: float, max_events: int, max_samples: int = 2048):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.samples: deque = deque(maxlen=max_samples)
+        self.events: deque = deque(maxlen=max_events)
+        self.routes: Dict[str, Dict] = {}
+        self.sample_count = 0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self._route_codes: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._beat = 0
+        self._beat_deadline = 0.0
+        self._captures: Dict[int, Dict] = {}
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def register_routes(self, app):
+        """Mapear el código de cada endpoint a "METHOD /ruta" para atribuir bloqueos"""
+        for route in app.routes:
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(endpoint, "__code__", None)
+            if code is None:
+                continue
+            methods = ",".join(sorted(getattr(route, "methods", None) or []))
+            self._route_codes[code] = f"{methods} {route.path}".strip()
+
+    def start(self, app=None):
+        """Iniciar heartbeat y watchdog (llamar dentro del event loop)"""
+        if self.running:
+            return
+        if app is not None:
+            self.register_routes(app)
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat_deadline = time.perf_counter() + self.interval
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            with self._lock:
+                self._beat += 1
+                beat = self._beat
+                self._beat_deadline = time.perf_counter() + self.interval
+                deadline = self._beat_deadline
+            await asyncio.sleep(self.interval)
+            self._record(beat, max(0.0, time.perf_counter() - deadline))
+
+    def _watch(self):
+        captured_beat = 0
+        while not self._stop.wait(min(self.interval, self.threshold) / 2):
+            with self._lock:
+                beat, deadline = self._beat, self._beat_deadline
+            if beat == captured_beat or time.perf_counter() - deadline < self.threshold:
+                continue
+            # El loop sigue bloqueado: capturar el stack mientras el culpable está ejecutándose
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            capture = {
+                "route": self._attribute(frame),
+                "stack": [
+                    f"{entry.filename}:{entry.lineno} {entry.name}"
+                    for entry in traceback.extract_stack(frame, limit=MAX_STACK_DEPTH)
+                ],
+            }
+            with self._lock:
+                self._captures[beat] = capture
+            captured_beat = beat
+
+    def _attribute(self, frame) -> str:
+        """Ruta activa: el endpoint en el stack o, si no hay, el scope ASGI más interno"""
+        scope_route = None
+        current = frame
+        while current is not None:
+            route = self._route_codes.get(current.f_code)
+            if route is not None:
+                return route
+            if scope_route is None:
+                scope = current.f_locals.get("scope")
+                if isinstance(scope, dict) and "path" in scope:
+                    scope_route = f"{scope.get('method', '')} {scope['path']}".strip()
+            current = current.f_back
+        return scope_route or "<fuera de requests>"
+
+    def _record(self, beat: int, lag: float):
+        with self._lock:
+            self.samples.append(lag)
+            self.sample_count += 1
+            self.lag_sum += lag
+            self.lag_max = max(self.lag_max, lag)
+            capture = self._captures.pop(beat, None)
+            # Descartar capturas de beats anteriores que no llegaron a registrarse
+            for stale in [key for key in self._captures if key < beat]:
+                del self._captures[stale]
+            if lag < self.threshold:
+                return
+            route = capture["route"] if capture else "<sin captura>"
+            stats = self.routes.setdefault(route, {"route": route, "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += lag * 1000
+            stats["max_ms"] = max(stats["max_ms"], lag * 1000)
+            self.events.append({
+                "timestamp": datetime.utcnow().isoformat(),
+                "lag_ms": round(lag * 1000, 2),
+                "route": route,
+                "stack": capture["stack"] if capture else [],
+            })
+        logger.warning(f"Event loop bloqueado {lag * 1000:.0f}ms en {route}")
+
+    def blocking_handlers(self) -> List[Dict]:
+        with self._lock:
+            handlers = [dict(stats) for stats in self.routes.values()]
+        for stats in handlers:
+            stats["total_ms"] = round(stats["total_ms"], 2)
+            stats["max_ms"] = round(stats["max_ms"], 2)
+        return sorted(handlers, key=lambda stats: stats["total_ms"], reverse=True)
+
+    def snapshot(self, include_events: bool = True) -> Dict:
+        with self._lock:
+            samples = list(self.samples)
+            events = list(self.events) if include_events else []
+            count, lag_sum, lag_max = self.sample_count, self.lag_sum, self.lag_max
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": {
+                "samples": count,
+                "mean_ms": round(lag_sum / count * 1000, 3) if count else 0.0,
+                "p50_ms": round(_percentile(samples, 0.5) * 1000, 3),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+                "max_ms": round(lag_max * 1000, 3),
+            },
+            "blocking_handlers": self.blocking_handlers(),
+            "events": events,
+        }
+
+    def prometheus(self) -> str:
+        """Métricas en formato de exposición de Prometheus"""
+        with self._lock:
+            samples = list(self.samples)
+            count, lag_sum, lag_max = self.sample_count, self.lag_sum, self.lag_max
+        lines = [
+            "# HELP event_loop_lag_seconds Retraso de scheduling del event loop",
+            "# TYPE event_loop_lag_seconds summary",
+            f'event_loop_lag_seconds{{quantile="0.5"}} {_percentile(samples, 0.5):.6f}',
+            f'event_loop_lag_seconds{{quantile="0.99"}} {_percentile(samples, 0.99):.6f}',
+            f"event_loop_lag_seconds_sum {lag_sum:.6f}",
+            f"event_loop_lag_seconds_count {count}",
+            "# HELP event_loop_lag_max_seconds Máximo retraso observado",
+            "# TYPE event_loop_lag_max_seconds gauge",
+            f"event_loop_lag_max_seconds {lag_max:.6f}",
+            "# HELP event_loop_blocked_total Bloqueos sobre el umbral por ruta",
+            "# TYPE event_loop_blocked_total counter",
+        ]
+        handlers = self.blocking_handlers()
+        for stats in handlers:
+            lines.append(f'event_loop_blocked_total{{route="{stats["route"]}"}} {stats["count"]}')
+        lines += [
+            "# HELP event_loop_blocked_seconds_total Tiempo bloqueado sobre el umbral por ruta",
+            "# TYPE event_loop_blocked_seconds_total counter",
+        ]
+        for stats in handlers:
+            lines.append(f'event_loop_blocked_seconds_total{{route="{stats["route"]}"}} {stats["total_ms"] / 1000:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.events.clear()
+            self.routes.clear()
+            self.sample_count = 0
+            self.lag_sum = 0.0
+            self.lag_max = 0.0
+
+loop_lag_monitor = LoopLagMonitor(
+    settings.loop_lag_interval_ms,
+    settings.loop_lag_threshold_ms,
+    settings.loop_lag_max_events,
+)
@@ -0,0 +1,184 @@
+from ..config import settings
+from ..services.auth_service import verify_admin_token
+from .stacks import collapse_stack, collapsed_text, current_frames, to_speedscope
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+
+PROFILE_HEADER = b"x-profile"
+
+class RequestSampler(threading.Thread):
+    """Muestrea el hilo del event loop y conserva solo los stacks que pasan por el frame del request"""
+
+    def __init__(self, thread_id: int, anchor, interval_ms: float):
+        super().__init__(name="request-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.anchor = anchor
+        self.interval = interval_ms / 1000
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = collapse_stack(frame, stop_at=self.anchor)
+            # None: el loop está ejecutando otra tarea, no este request
+            if stack is not None:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def stop(self) -> Dict[str, int]:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+class ProfileStore:
+    """Perfiles recientes en memoria (acotados) y opcionalmente en disco"""
+
+    def __init__(self, max_profiles: int, output_dir: str = ""):
+        self.max_profiles = max_profiles
+        self.output_dir = output_dir
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict):
+        with self._lock:
+            self._profiles[profile["id"]] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f"profile_{profile['id']}")
+            with open(f"{base}.collapsed", "w") as f:
+                f.write(collapsed_text(profile["stacks"]))
+            with open(f"{base}.speedscope.json", "w") as f:
+                json.dump(speedscope_for(profile), f)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self) -> List[Dict]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {key: value for key, value in profile.items() if key != "stacks"}
+            for profile in reversed(profiles)
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+class ProfilingState:
+    """Toggle de administración: perfilar una fracción de requests, opcionalmente por prefijo"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.path_prefix = ""
+        self.remaining: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, sample_rate: float = 1.0, path_prefix: str = "", max_profiles: Optional[int] = None):
+        with self._lock:
+            self.enabled = enabled
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+            self.path_prefix = path_prefix
+            self.remaining = max_profiles
+
+    def take(self, path: str) -> bool:
+        """Decidir si este request se perfila (consume un cupo si hay límite)"""
+        if not self.enabled or not path.startswith(self.path_prefix):
+            return False
+        if random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self.remaining is not None:
+                if self.remaining <= 0:
+                    self.enabled = False
+                    return False
+                self.remaining -= 1
+            return True
+
+    def as_dict(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "path_prefix": self.path_prefix,
+            "remaining": self.remaining,
+        }
+
+def speedscope_for(profile: Dict) -> Dict:
+    return to_speedscope(
+        profile["stacks"], f"{profile['method']} {profile['path']}", profile["interval_ms"]
+    )
+
+profiling_state = ProfilingState()
+profile_store = ProfileStore(settings.profiling_max_stored, settings.profiling_output_dir)
+
+class ProfilingMiddleware:
+    """
+    Perfilado por request bajo demanda: header X-Profile con el token de administración
+    o toggle de administración con tasa de muestreo. Sin activar, solo revisa un flag.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _requested(self, scope) -> bool:
+        if profiling_state.enabled and profiling_state.take(scope["path"]):
+            return True
+        if not settings.admin_token:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return verify_admin_token(value.decode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (profiling_state.enabled or settings.admin_token) or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(8)
+        status_code = 0
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        # El frame de esta corrutina delimita qué muestras pertenecen al request
+        sampler = RequestSampler(threading.get_ident(), sys._getframe(), settings.profiling_interval_ms)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stacks = sampler.stop()
+            profile_store.add({
+                "id": profile_id,
+                "method": scope.get("method", ""),
+                "path": scope["path"],
+                "status_code": status_code,
+                "timestamp": datetime.utcnow().isoformat(),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "interval_ms": settings.profiling_interval_ms,
+                "samples": sampler.samples,
+                "stacks": stacks,
+            })
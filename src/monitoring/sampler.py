@@ -0,0 +1,160 @@
+from ..config import settings
+from .stacks import collapse_stack, collapsed_text, current_frames, to_speedscope
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Hojas de stack de hilos en espera (no consumen CPU)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"),
+}
+
+OVERFLOW_STACK = "[otros stacks]"
+
+def _thread_group(name: str) -> str:
+    """Agrupar hilos equivalentes (ThreadPoolExecutor-0_3 -> ThreadPoolExecutor)"""
+    return re.sub(r"[-_ ]?\d+(_\d+)?$", "", name) or name
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES
+
+class ContinuousProfiler:
+    """
+    Profiler de muestreo siempre activo: un hilo toma sys._current_frames() cada
+    `interval_ms` y agrega stacks colapsados (por grupo de hilo) en un store acotado.
+    """
+
+    def __init__(self, interval_ms: float, max_stacks: int, include_idle: bool = False):
+        self.interval = interval_ms / 1000
+        self.max_stacks = max_stacks
+        self.include_idle = include_idle
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.dropped = 0
+        self.started_at: Optional[str] = None
+        self.sampling_seconds = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped.clear()
+        self.started_at = datetime.utcnow().isoformat()
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            started = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in current_frames().items():
+                if thread_id == own_id or (not self.include_idle and _is_idle(frame)):
+                    continue
+                root = _thread_group(names.get(thread_id, "thread"))
+                self._add(f"{root};{collapse_stack(frame)}")
+            self.sampling_seconds += time.perf_counter() - started
+
+    def _add(self, stack: str):
+        with self._lock:
+            self.samples += 1
+            if stack in self.stacks:
+                self.stacks[stack] += 1
+            elif len(self.stacks) < self.max_stacks:
+                self.stacks[stack] = 1
+            else:
+                # Store lleno: los stacks nuevos solo suman al contador de desborde
+                self.dropped += 1
+
+    def snapshot(self, contains: Optional[str] = None) -> Dict[str, int]:
+        """Copia de los stacks agregados, opcionalmente solo los que contienen un texto"""
+        with self._lock:
+            stacks = dict(self.stacks)
+            if self.dropped:
+                stacks[OVERFLOW_STACK] = self.dropped
+        if contains:
+            stacks = {stack: count for stack, count in stacks.items() if contains in stack}
+        return stacks
+
+    def top_functions(self, limit: int = 20, contains: Optional[str] = None) -> List[Dict]:
+        """Funciones con más muestras: propias (hoja) e inclusivas (en cualquier nivel)"""
+        own: Dict[str, int] = {}
+        inclusive: Dict[str, int] = {}
+        for stack, count in self.snapshot(contains).items():
+            frames = stack.split(";")
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for label in set(frames[1:]):
+                inclusive[label] = inclusive.get(label, 0) + count
+        # Empates (ancestros comunes) se resuelven a favor de quien consume CPU propia
+        ranked = sorted(inclusive.items(), key=lambda item: (item[1], own.get(item[0], 0)), reverse=True)[:limit]
+        return [
+            {"function": label, "inclusive_samples": count, "own_samples": own.get(label, 0)}
+            for label, count in ranked
+        ]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            unique = len(self.stacks)
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "unique_stacks": unique,
+            "max_stacks": self.max_stacks,
+            "dropped_samples": self.dropped,
+            "overhead_seconds": round(self.sampling_seconds, 4),
+        }
+
+    def speedscope(self, contains: Optional[str] = None) -> Dict:
+        return to_speedscope(self.snapshot(contains), "paperly (continuo)", self.interval * 1000)
+
+    def write_report(self, directory: str) -> str:
+        """Escribir flamegraph (.collapsed y .speedscope.json) junto a los reportes"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"flamegraph_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+        with open(f"{base}.collapsed", "w") as f:
+            f.write(collapsed_text(self.snapshot()))
+        with open(f"{base}.speedscope.json", "w") as f:
+            json.dump(self.speedscope(), f)
+        logger.info(f"Flamegraph escrito en {base}.*")
+        return base
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.dropped = 0
+            self.sampling_seconds = 0.0
+            self.started_at = datetime.utcnow().isoformat()
+
+continuous_profiler = ContinuousProfiler(
+    settings.profiler_interval_ms,
+    settings.profiler_max_stacks,
+    settings.profiler_include_idle,
+)
@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional
+import os
+import sys
+
+_CWD = os.getcwd() + os.sep
+
+def short_path(filename: str) -> str:
+    """Ruta relativa al proyecto o a site-packages para etiquetas legibles"""
+    marker = "site-packages" + os.sep
+    index = filename.find(marker)
+    if index >= 0:
+        return filename[index + len(marker):]
+    if filename.startswith(_CWD):
+        return filename[len(_CWD):]
+    return filename
+
+def frame_label(code) -> str:
+    """Etiqueta estable por función: nombre (archivo:primera línea)"""
+    return f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame, stop_at=None) -> Optional[str]:
+    """
+    Stack en formato collapsed (raíz;...;hoja). Con stop_at, solo se incluye la parte
+    del stack por debajo de ese frame y se retorna None si el frame no está en la cadena.
+    """
+    labels: List[str] = []
+    current = frame
+    while current is not None:
+        labels.append(frame_label(current.f_code))
+        if current is stop_at:
+            break
+        current = current.f_back
+    else:
+        if stop_at is not None:
+            return None
+    labels.reverse()
+    return ";".join(labels)
+
+def collapsed_text(stacks: Dict[str, int]) -> str:
+    """Formato de flamegraph.pl / speedscope: una línea "stack conteo" por stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+def to_speedscope(stacks: Dict[str, int], name: str, interval_ms: float) -> Dict:
+    """Convertir stacks agregados a un perfil "sampled" de speedscope"""
+    frames: List[Dict] = []
+    index: Dict[str, int] = {}
+    samples: List[List[int]] = []
+    weights: List[float] = []
+    for stack, count in stacks.items():
+        sample = []
+        for label in stack.split(";"):
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            sample.append(index[label])
+        samples.append(sample)
+        weights.append(count * interval_ms)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": name,
+        "exporter": "paperly",
+    }
+
+def current_frames() -> Dict[int, object]:
+    """Frames actuales de todos los hilos (sys._current_frames)"""
+    return sys._current_frames()
@@ -0,0 +1,180 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from ..models.schemas import Message, ProfilingToggle
+from ..monitoring import loop_lag_monitor, continuous_profiler, profiling_state, profile_store, speedscope_for, collapsed_text
+from ..services.auth_service import verify_admin_token
+from ..services.search_index import search_index
+from ..services.index_rebuild import index_rebuilder, RebuildError
+from ..services.change_feed import change_feed, latest_seq, read_changes
+from ..database import get_db
+from ..config import settings
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency para endpoints de administración (header X-Admin-Token)"""
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token de administración inválido o no configurado"
+        )
+
+@router.get("/loop-lag", summary="Lag del event loop y handlers que lo bloquean", dependencies=[Depends(require_admin)])
+async def get_loop_lag(events: bool = True):
+    """
+    Estadísticas del retraso de scheduling del event loop.
+    
+    - **blocking_handlers**: rutas que bloquearon el loop sobre el umbral (conteo, total y máximo)
+    - **events**: últimos bloqueos con el stack capturado mientras ocurrían
+    """
+    return loop_lag_monitor.snapshot(include_events=events)
+
+@router.post("/loop-lag/reset", response_model=Message, summary="Reiniciar estadísticas de lag", dependencies=[Depends(require_admin)])
+async def reset_loop_lag():
+    """Reiniciar las estadísticas del monitor (por ejemplo, antes de una fitness function)"""
+    loop_lag_monitor.reset()
+    return Message(message="Estadísticas de lag reiniciadas")
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Métricas (formato Prometheus)", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """Métricas de runtime en formato de exposición de Prometheus"""
+    return PlainTextResponse(loop_lag_monitor.prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/profiling", summary="Estado del perfilado bajo demanda", dependencies=[Depends(require_admin)])
+async def get_profiling():
+    """Configuración actual del toggle y perfiles disponibles (sin los stacks)"""
+    return {"state": profiling_state.as_dict(), "profiles": profile_store.summaries()}
+
+@router.post("/profiling", summary="Activar/desactivar perfilado bajo demanda", dependencies=[Depends(require_admin)])
+async def set_profiling(toggle: ProfilingToggle):
+    """
+    Perfilar una fracción de los requests sin redeploy.
+    
+    - **enabled**: activar o desactivar
+    - **sample_rate**: fracción de requests a perfilar (0-1)
+    - **path_prefix**: solo rutas con este prefijo (ej. `/api/v1/search`)
+    - **max_profiles**: desactivar automáticamente tras N perfiles
+    
+    También se puede perfilar un request puntual con el header `X-Profile: <ADMIN_TOKEN>`;
+    la respuesta incluye `X-Profile-Id`.
+    """
+    profiling_state.configure(toggle.enabled, toggle.sample_rate, toggle.path_prefix, toggle.max_profiles)
+    return {"state": profiling_state.as_dict()}
+
+@router.get("/profiles/{profile_id}", summary="Descargar perfil de un request", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """
+    Perfil de un request en formato `speedscope` (JSON, abrir en speedscope.app)
+    o `collapsed` (stacks colapsados para flamegraph.pl).
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado"
+        )
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_text(profile["stacks"]))
+    if format != "speedscope":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no soportado (usar speedscope o collapsed)"
+        )
+    return JSONResponse(
+        speedscope_for(profile),
+        headers={"Content-Disposition": f'attachment; filename="profile_{profile_id}.speedscope.json"'}
+    )
+
+@router.get("/flamegraph", summary="Flamegraph del profiler continuo", dependencies=[Depends(require_admin)])
+async def get_flamegraph(format: str = "speedscope", contains: Optional[str] = None):
+    """
+    Stacks agregados por el profiler de muestreo continuo desde el último reinicio.
+    
+    - **format**: `speedscope` (JSON), `collapsed` (flamegraph.pl) o `top` (funciones con más muestras)
+    - **contains**: solo stacks que pasan por este texto (ej. `search_service`, `pydantic`)
+    """
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_text(continuous_profiler.snapshot(contains)))
+    if format == "top":
+        return {"stats": continuous_profiler.stats(), "functions": continuous_profiler.top_functions(contains=contains)}
+    if format != "speedscope":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no soportado (usar speedscope, collapsed o top)"
+        )
+    return JSONResponse(
+        continuous_profiler.speedscope(contains),
+        headers={"Content-Disposition": 'attachment; filename="flamegraph.speedscope.json"'}
+    )
+
+@router.post("/flamegraph/reset", response_model=Message, summary="Reiniciar el profiler continuo", dependencies=[Depends(require_admin)])
+async def reset_flamegraph():
+    """Descartar los stacks acumulados (por ejemplo, antes de una fitness function)"""
+    continuous_profiler.reset()
+    return Message(message="Profiler continuo reiniciado")
+
+@router.post("/flamegraph/write", response_model=Message, summary="Escribir flamegraph a disco", dependencies=[Depends(require_admin)])
+async def write_flamegraph():
+    """Escribir el flamegraph actual en `PROFILER_REPORT_DIR` (.collapsed y .speedscope.json)"""
+    if not settings.profiler_report_dir:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="PROFILER_REPORT_DIR no está configurado"
+        )
+    base = continuous_profiler.write_report(settings.profiler_report_dir)
+    return Message(message=f"Flamegraph escrito en {base}.collapsed")
+
+@router.get("/search-index", summary="Estado del índice de búsqueda", dependencies=[Depends(require_admin)])
+async def get_search_index_stats():
+    """Papers, términos y posting lists materializadas; `snapshot` indica si se abrió desde el archivo mmap"""
+    return search_index.stats()
+
+@router.post(
+    "/search-index/rebuild", status_code=status.HTTP_202_ACCEPTED,
+    summary="Reconstruir el índice de búsqueda en segundo plano", dependencies=[Depends(require_admin)]
+)
+async def rebuild_search_index():
+    """
+    Construir una versión nueva del índice junto a la vigente, reaplicar los cambios que lleguen mientras
+    tanto, verificar la cantidad de papers, publicarla en `SEARCH_INDEX_PATH` y cambiar a los lectores;
+    la búsqueda sigue respondiendo con la versión vigente durante todo el proceso
+    """
+    try:
+        return index_rebuilder.start()
+    except RebuildError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/search-index/rebuild", summary="Avance de la reconstrucción del índice", dependencies=[Depends(require_admin)])
+async def get_search_index_rebuild():
+    """Estado, papers procesados, papers/s, cambios reaplicados y conteos verificados"""
+    return index_rebuilder.progress()
+
+@router.post("/search-index/rollback", summary="Volver a la versión anterior del índice", dependencies=[Depends(require_admin)])
+def rollback_search_index():
+    """
+    Cambiar a la versión reemplazada por la última reconstrucción (puesta al día con el change log) y volver
+    a publicar su archivo para que los demás workers la adopten
+    """
+    try:
+        return index_rebuilder.rollback()
+    except RebuildError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/changes", summary="Change log de papers", dependencies=[Depends(require_admin)])
+def get_paper_changes(
+    after: int = Query(0, ge=0, description="Devolver los cambios con seq mayor a este"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Cambios registrados por los triggers de la tabla papers y la posición del feed de este worker"""
+    return {
+        "latest_seq": latest_seq(db),
+        "feed": change_feed.stats(),
+        "changes": [
+            {"seq": seq, "paper_id": paper_id, "op": op}
+            for seq, paper_id, op in read_changes(db, after, limit)
+        ],
+    }
@@ -1,33 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
+import io
 
 from ..database import get_db
-from ..models.schemas import Paper, PaperCreate, PaperUpdate, Message
+from ..models.schemas import Paper, PaperCreate, PaperUpdate, PaperPartial, Message, BulkImportReport
 from ..services import (
     get_papers, get_paper_by_id, create_paper, update_paper, delete_paper,
-    get_popular_papers, convert_db_paper_to_schema, verify_token, get_user_by_username
+    get_popular_papers, convert_db_paper_to_schema, parse_fields, papers_to_schemas,
+    verify_token_claims, get_user_by_username, get_user_by_id, get_cached_user, cache_user, is_session_revoked,
+    bulk_import_papers, detect_format,
+    export_rows, export_filename, validate_export_format, EXPORT_MEDIA_TYPES,
+    etag_for_papers, etag_matches, cache_headers, not_modified
 )
+from ..config import settings
 
 router = APIRouter(prefix="/api/v1/papers", tags=["papers"])
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
 
-def get_current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    """Dependency para obtener ID del usuario actual (opcional)"""
+def rejected_token_exception(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def get_current_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security), db: Session = Depends(get_db)):
+    """
+    Dependency para obtener ID del usuario actual (opcional: sin header Authorization es anónimo). Un token
+    inválido o expirado, un usuario desactivado o una sesión revocada reciben 401: tratarlos como anónimos
+    les saltaría la verificación de creador al editar o borrar
+    """
+    if credentials is None:
+        return None
+    claims = verify_token_claims(credentials.credentials)
+    if claims is None:
+        raise rejected_token_exception("Token inválido o expirado")
+    if claims.get("act") is False:
+        raise rejected_token_exception("Usuario desactivado")
+    if is_session_revoked(db, claims.get("sid")):
+        raise rejected_token_exception("Sesión revocada")
+    
+    user_id = claims.get("uid")
+    if user_id is not None:
+        # Camino rápido: usuario en cache; si no está (ej. se invalidó al desactivarlo) se consulta la BD
+        user = get_cached_user(user_id)
+        if user is None:
+            user = get_user_by_id(db, user_id)
+            if user is not None:
+                user = cache_user(user)
+    else:
+        # Tokens emitidos antes de incluir el claim uid
+        user = get_user_by_username(db, claims["sub"])
+    
+    if user is None:
+        raise rejected_token_exception("Usuario no encontrado")
+    if not user.is_active:
+        raise rejected_token_exception("Usuario desactivado")
+    return user.id
+
+def get_fields(fields: Optional[str] = None) -> Optional[List[str]]:
+    """Dependency para validar la proyección de campos (fields=title,authors)"""
     try:
-        username = verify_token(credentials.credentials)
-        if username:
-            user = get_user_by_username(db, username)
-            return user.id if user else None
-    except:
-        pass
-    return None
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
-@router.get("/", response_model=List[Paper], summary="Obtener lista de papers")
+def with_version_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Agregar updated_at a la proyección para poder calcular el ETag"""
+    if fields and "updated_at" not in fields:
+        return fields + ["updated_at"]
+    return fields
+
+@router.get(
+    "/", response_model=List[Union[Paper, PaperPartial]], response_model_exclude_unset=True,
+    summary="Obtener lista de papers"
+)
 async def list_papers(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 10, 
+    fields: Optional[List[str]] = Depends(get_fields),
     db: Session = Depends(get_db)
 ):
     """
@@ -35,37 +95,75 @@ async def list_papers(
     
     - **skip**: Número de papers a omitir (para paginación)
     - **limit**: Número máximo de papers a retornar
+    - **fields**: Campos a retornar separados por coma (ej. `title,authors`); solo esas columnas se consultan
+    
+    Soporta `If-None-Match`: si la página no cambió (ids y updated_at) responde 304.
     """
-    db_papers = get_papers(db, skip=skip, limit=limit)
-    papers = []
-    for db_paper in db_papers:
-        paper_dict = convert_db_paper_to_schema(db_paper)
-        papers.append(Paper(**paper_dict))
-    return papers
+    db_papers = get_papers(db, skip=skip, limit=limit, fields=with_version_fields(fields))
+    etag = etag_for_papers(db_papers, "list", fields)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, settings.cache_control_papers)
+    response.headers.update(cache_headers(etag, settings.cache_control_papers))
+    return papers_to_schemas(db_papers, fields)
 
-@router.get("/popular", response_model=List[Paper], summary="Obtener papers populares")
+@router.get(
+    "/popular", response_model=List[Union[Paper, PaperPartial]], response_model_exclude_unset=True,
+    summary="Obtener papers populares"
+)
 async def list_popular_papers(
+    request: Request,
+    response: Response,
     limit: int = 10, 
+    fields: Optional[List[str]] = Depends(get_fields),
     db: Session = Depends(get_db)
 ):
     """
     Obtener papers más populares ordenados por citation_count.
     
     - **limit**: Número máximo de papers a retornar
+    - **fields**: Campos a retornar separados por coma (ej. `title,citation_count`)
     """
-    db_papers = get_popular_papers(db, limit=limit)
-    papers = []
-    for db_paper in db_papers:
-        paper_dict = convert_db_paper_to_schema(db_paper)
-        papers.append(Paper(**paper_dict))
-    return papers
+    db_papers = get_popular_papers(db, limit=limit, fields=with_version_fields(fields))
+    etag = etag_for_papers(db_papers, "popular", fields)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, settings.cache_control_papers)
+    response.headers.update(cache_headers(etag, settings.cache_control_papers))
+    return papers_to_schemas(db_papers, fields)
+
+@router.get("/export", summary="Exportar catálogo de papers (NDJSON/CSV/Parquet/Arrow)")
+async def export_papers_endpoint(
+    format: str = "ndjson",
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar todos los papers en streaming con un cursor del lado del servidor.
+    
+    La memoria se mantiene acotada al tamaño de lote (`EXPORT_CHUNK_SIZE`),
+    sin paginar con OFFSET ni construir objetos Pydantic por fila.
+    
+    - **format**: `ndjson` (default), `csv`, `parquet` o `arrow` (estos dos requieren pyarrow)
+    """
+    try:
+        fmt = validate_export_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    return StreamingResponse(
+        export_rows(db, "papers", fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("papers", fmt)}"'}
+    )
 
 @router.get("/{paper_id}", response_model=Paper, summary="Obtener paper específico")
-async def get_paper(paper_id: int, db: Session = Depends(get_db)):
+async def get_paper(paper_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Obtener un paper específico por su ID.
     
     - **paper_id**: ID único del paper
+    
+    Soporta `If-None-Match`: si el paper no cambió desde el ETag indicado responde 304.
     """
     db_paper = get_paper_by_id(db, paper_id)
     if not db_paper:
@@ -74,6 +172,11 @@ async def get_paper(paper_id: int, db: Session = Depends(get_db)):
             detail="Paper no encontrado"
         )
     
+    etag = etag_for_papers([db_paper])
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, settings.cache_control_papers)
+    response.headers.update(cache_headers(etag, settings.cache_control_papers))
+    
     paper_dict = convert_db_paper_to_schema(db_paper)
     return Paper(**paper_dict)
 
@@ -104,10 +207,53 @@ async def create_new_paper(
                 detail="Ya existe un paper con este DOI"
             )
     
-    db_paper = create_paper(db, paper_data, current_user_id)
+    # La escritura aplica el change log (toma el lock del feed): en el threadpool, no en el event loop
+    db_paper = await run_in_threadpool(create_paper, db, paper_data, current_user_id)
     paper_dict = convert_db_paper_to_schema(db_paper)
     return Paper(**paper_dict)
 
+@router.post("/bulk", response_model=BulkImportReport, summary="Carga masiva de papers (NDJSON/CSV)")
+async def bulk_import_endpoint(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Importar papers desde un archivo NDJSON o CSV.
+    
+    El archivo se procesa en streaming por lotes: cada lote se valida, resuelve los
+    DOIs existentes con una sola consulta y se inserta en una transacción.
+    
+    - **file**: Archivo `.ndjson`/`.jsonl` (un paper por línea) o `.csv` con encabezado
+      (authors y keywords separados por `;` o como lista JSON)
+    - **format**: `ndjson` o `csv` (por defecto se detecta por la extensión)
+    - **batch_size**: Tamaño de lote (máximo 900)
+    """
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # newline="" para que el parser CSV maneje campos multilínea
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = await run_in_threadpool(
+            bulk_import_papers, db, stream, fmt, current_user_id, batch_size
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8"
+        )
+    finally:
+        stream.detach()
+    return BulkImportReport(**report)
+
 @router.put("/{paper_id}", response_model=Paper, summary="Actualizar paper")
 async def update_existing_paper(
     paper_id: int, 
@@ -136,7 +282,7 @@ async def update_existing_paper(
             detail="No tienes permisos para editar este paper"
         )
     
-    updated_paper = update_paper(db, paper_id, paper_update)
+    updated_paper = await run_in_threadpool(update_paper, db, paper_id, paper_update)
     if not updated_paper:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,7 +318,7 @@ async def delete_existing_paper(
             detail="No tienes permisos para eliminar este paper"
         )
     
-    success = delete_paper(db, paper_id)
+    success = await run_in_threadpool(delete_paper, db, paper_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
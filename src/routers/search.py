@@ -1,18 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
+from .papers import get_fields
+from .admin import require_admin
 from ..models.schemas import SearchQuery, SearchResponse, Message
-from ..services import search_papers_service, search_authors_service, get_search_suggestions
+from ..services import (
+    search_papers_cached, search_authors_cached, search_query_cached, search_semantic_cached, get_search_suggestions,
+    get_search_index, explain_query, is_structured_query, QuerySyntaxError, SEARCH_FACETS,
+    etag_matches, cache_headers, not_modified, choose_encoding, get_encoded_body,
+    export_rows, export_filename, validate_export_format, EXPORT_MEDIA_TYPES, trending_searches, TRENDING_WINDOWS
+)
+from ..config import settings
 
 router = APIRouter(prefix="/api/v1/search", tags=["search"])
 
-@router.get("/papers", response_model=SearchResponse, summary="Buscar papers")
+def cached_search_response(request: Request, entry: dict) -> Response:
+    """Responder con el cuerpo, ETag y compresión precalculados de la entrada de cache (o 304)"""
+    etag = entry["etag"]
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag, settings.cache_control_search)
+    
+    headers = cache_headers(etag, settings.cache_control_search)
+    body = entry["body"]
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding and len(body) >= settings.compression_min_size:
+        # El middleware de compresión deja pasar respuestas con Content-Encoding
+        body = get_encoded_body(entry, encoding)
+        headers["Content-Encoding"] = encoding
+        headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+SEARCH_SYNTAXES = ("auto", "simple", "query")
+
+def client_host(request: Request) -> Optional[str]:
+    """Identidad del buscador anónimo para contar buscadores distintos en las tendencias"""
+    return request.client.host if request.client else None
+
+def get_facets(facets: Optional[str] = None) -> Optional[List[str]]:
+    """Dependency para validar las facetas pedidas (facets=year,keyword,author)"""
+    if not facets:
+        return None
+    requested = list(dict.fromkeys(facet.strip() for facet in facets.split(",") if facet.strip()))
+    invalid = [facet for facet in requested if facet not in SEARCH_FACETS]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Facetas inválidas: {', '.join(invalid)}. Disponibles: {', '.join(SEARCH_FACETS)}"
+        )
+    return requested or None
+
+@router.get("/papers", response_model=SearchResponse, response_model_exclude_unset=True, summary="Buscar papers")
 async def search_papers_endpoint(
+    request: Request,
     q: str,
     limit: int = 10,
     offset: int = 0,
+    syntax: str = "auto",
+    fields: Optional[List[str]] = Depends(get_fields),
+    facets: Optional[List[str]] = Depends(get_facets),
     db: Session = Depends(get_db)
 ):
     """
@@ -21,21 +69,98 @@ async def search_papers_endpoint(
     - **q**: Término de búsqueda (requerido)
     - **limit**: Número máximo de resultados (default: 10)
     - **offset**: Número de resultados a omitir para paginación (default: 0)
+    - **syntax**: `simple` (texto en el título), `query` (lenguaje de consultas) o `auto` (default:
+      `query` si `q` tiene operadores, comillas o calificadores)
+    - **fields**: Campos de cada resultado separados por coma (ej. `title,authors`)
+    - **facets**: Conteos por `year`, `keyword` y/o `author` sobre todas las coincidencias (ej. `year,keyword`)
+    
+    Lenguaje de consultas: `AND`/`OR`/`NOT` (o `-término`), paréntesis, `"frases exactas"`,
+    `author:garcia`, `keyword:"machine learning"`, `title:`, `year:2020..2024`, `year:>=2020`, `cited:>50`.
+    """
+    if not q or len(q.strip()) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El término de búsqueda debe tener al menos 2 caracteres"
+        )
+    if syntax not in SEARCH_SYNTAXES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="syntax debe ser auto, simple o query"
+        )
+    
+    search_query = SearchQuery(q=q.strip(), limit=limit, offset=offset, fields=fields, facets=facets)
+    if syntax == "query" or (syntax == "auto" and is_structured_query(search_query.q)):
+        try:
+            entry = search_query_cached(db, search_query, client=client_host(request))
+        except QuerySyntaxError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Consulta inválida: {e}"
+            )
+        return cached_search_response(request, entry)
+    return cached_search_response(request, search_papers_cached(db, search_query, client=client_host(request)))
+
+@router.get("/semantic", response_model=SearchResponse, response_model_exclude_unset=True, summary="Búsqueda semántica")
+async def search_semantic_endpoint(
+    request: Request,
+    q: str,
+    limit: int = 10,
+    offset: int = 0,
+    keyword_weight: float = settings.semantic_keyword_weight,
+    fields: Optional[List[str]] = Depends(get_fields),
+    db: Session = Depends(get_db)
+):
+    """
+    Buscar papers conceptualmente relacionados aunque no compartan las palabras exactas.
+    
+    - **q**: Texto libre (ej. `redes neuronales para imágenes médicas`)
+    - **limit** / **offset**: Paginación (default: 10 / 0)
+    - **keyword_weight**: Peso del puntaje por keywords en el ranking híbrido, entre 0 (solo
+      similitud semántica) y 1 (solo keywords)
+    - **fields**: Campos de cada resultado separados por coma (ej. `title,authors`)
+    
+    Título y abstract se proyectan con TF-IDF + SVD truncada (modelo local, sin servicios externos).
     """
     if not q or len(q.strip()) < 2:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El término de búsqueda debe tener al menos 2 caracteres"
         )
+    if not 0 <= keyword_weight <= 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="keyword_weight debe estar entre 0 y 1"
+        )
+    
+    search_query = SearchQuery(q=q.strip(), limit=limit, offset=offset, fields=fields)
+    return cached_search_response(
+        request, search_semantic_cached(db, search_query, keyword_weight, client=client_host(request))
+    )
+
+@router.get("/explain", summary="Plan de ejecución de una consulta")
+async def explain_search_endpoint(q: str, db: Session = Depends(get_db)):
+    """
+    Plan compilado de una consulta del lenguaje de búsqueda, con la cardinalidad estimada
+    de cada nodo. Las intersecciones se ejecutan desde el nodo más selectivo.
     
-    search_query = SearchQuery(q=q.strip(), limit=limit, offset=offset)
-    return search_papers_service(db, search_query)
+    - **q**: Consulta (ej. `author:garcia year:2020..2024 "deep learning"`)
+    """
+    try:
+        return {"query": q, "plan": explain_query(get_search_index(db), q)}
+    except QuerySyntaxError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Consulta inválida: {e}"
+        )
 
-@router.get("/authors", response_model=SearchResponse, summary="Buscar por autor")
+@router.get("/authors", response_model=SearchResponse, response_model_exclude_unset=True, summary="Buscar por autor")
 async def search_authors_endpoint(
+    request: Request,
     q: str,
     limit: int = 10,
     offset: int = 0,
+    fields: Optional[List[str]] = Depends(get_fields),
+    facets: Optional[List[str]] = Depends(get_facets),
     db: Session = Depends(get_db)
 ):
     """
@@ -44,6 +169,8 @@ async def search_authors_endpoint(
     - **q**: Nombre del autor a buscar (requerido)
     - **limit**: Número máximo de resultados (default: 10)
     - **offset**: Número de resultados a omitir para paginación (default: 0)
+    - **fields**: Campos de cada resultado separados por coma (ej. `title,authors`)
+    - **facets**: Conteos por `year`, `keyword` y/o `author` sobre todas las coincidencias
     """
     if not q or len(q.strip()) < 2:
         raise HTTPException(
@@ -51,8 +178,26 @@ async def search_authors_endpoint(
             detail="El nombre del autor debe tener al menos 2 caracteres"
         )
     
-    search_query = SearchQuery(q=q.strip(), limit=limit, offset=offset)
-    return search_authors_service(db, search_query)
+    search_query = SearchQuery(q=q.strip(), limit=limit, offset=offset, fields=fields, facets=facets)
+    return cached_search_response(request, search_authors_cached(db, search_query, client=client_host(request)))
+
+@router.get("/trending", summary="Búsquedas en tendencia")
+async def trending_searches_endpoint(window: str = "1h", limit: int = 10):
+    """
+    Consultas más buscadas en la ventana deslizante, respondidas desde memoria (sin leer search_logs).
+    
+    - **window**: `1h` (buckets de 1 minuto) o `24h` (buckets de 1 hora) (default: `1h`)
+    - **limit**: Cantidad de consultas (default: 10, máximo `TRENDING_TOP_K`)
+    
+    `count` es la frecuencia estimada por un Count-Min sketch (cota superior) y `distinct_searchers`
+    una estimación HyperLogLog de usuarios/clientes distintos en la ventana.
+    """
+    if window not in TRENDING_WINDOWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"window debe ser {' o '.join(TRENDING_WINDOWS)}"
+        )
+    return trending_searches.trending(window, max(1, min(limit, settings.trending_top_k)))
 
 @router.get("/suggestions", response_model=List[str], summary="Obtener sugerencias de búsqueda")
 async def get_suggestions_endpoint(q: str):
@@ -66,3 +211,31 @@ async def get_suggestions_endpoint(q: str):
     
     suggestions = get_search_suggestions(q.strip())
     return suggestions
+
+@router.get(
+    "/logs/export", summary="Exportar logs de búsqueda (NDJSON/CSV/Parquet/Arrow)",
+    dependencies=[Depends(require_admin)]
+)
+async def export_search_logs_endpoint(
+    format: str = "ndjson",
+    db: Session = Depends(get_db)
+):
+    """
+    Exportar la tabla de logs de búsqueda en streaming para análisis.
+    
+    - **format**: `ndjson` (default), `csv`, `parquet` o `arrow` (estos dos requieren pyarrow)
+    
+    Incluye user_id y el texto de cada consulta: requiere el header `X-Admin-Token`.
+    """
+    try:
+        fmt = validate_export_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    return StreamingResponse(
+        export_rows(db, "search_logs", fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("search_logs", fmt)}"'}
+    )
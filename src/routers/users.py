@@ -1,39 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
+import io
 
 from ..database import get_db
-from ..models.schemas import User, UserCreate, UserLogin, Token, Message
+from ..models.schemas import User, UserCreate, UserLogin, Token, RefreshRequest, Message, BulkUserReport
 from ..services import (
-    get_user_by_username, get_user_by_email, create_user, authenticate_user,
-    create_access_token, verify_token
+    get_user_by_username, get_user_by_email, get_user_by_id, create_user, authenticate_user,
+    create_user_access_token, verify_token_claims, cache_user, get_cached_user,
+    create_session, rotate_refresh_token, revoke_session, is_session_revoked,
+    bulk_register_users, detect_format
 )
+from ..services.rate_limiter import (
+    check_auth_rate_limits, hash_admission, retry_after_header, ServerBusy, TooManyRequests
+)
+from .admin import require_admin
 from ..config import settings
 
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Dependency para obtener el usuario actual autenticado"""
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_current_claims(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> dict:
+    """Dependency para validar el token actual (firma, exp y sesión no revocada)"""
+    claims = verify_token_claims(token)
+    if claims is None or claims.get("act") is False:
+        raise credentials_exception()
+    if is_session_revoked(db, claims.get("sid")):
+        raise credentials_exception()
+    return claims
+
+def get_current_user(claims: dict = Depends(get_current_claims), db: Session = Depends(get_db)):
+    """Dependency para obtener el usuario actual autenticado"""
+    # Camino rápido: usuario en cache, sin consultar la BD
+    user_id = claims.get("uid")
+    if user_id is not None:
+        user = get_cached_user(user_id)
+        if user is not None:
+            if not user.is_active:
+                raise credentials_exception()
+            return user
+        db_user = get_user_by_id(db, user_id)
+    else:
+        # Tokens emitidos antes de incluir el claim uid
+        db_user = get_user_by_username(db, username=claims["sub"])
     
-    username = verify_token(token)
-    if username is None:
-        raise credentials_exception
-    
-    user = get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
+    if db_user is None or not db_user.is_active:
+        raise credentials_exception()
     
-    return user
+    return cache_user(db_user)
+
+def build_token(user, session_id: str, refresh_token: str) -> Token:
+    """Emitir access token ligado a la sesión junto con su refresh token"""
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token = create_user_access_token(user, expires_delta=access_token_expires, session_id=session_id)
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        refresh_token=refresh_token,
+        expires_in=int(access_token_expires.total_seconds())
+    )
+
+def issue_tokens(db: Session, user) -> Token:
+    """Crear sesión y emitir access token + refresh token"""
+    cache_user(user)
+    session, refresh_token = create_session(db, user)
+    return build_token(user, session.id, refresh_token)
+
+def enforce_auth_rate_limits(request: Request, username: Optional[str]):
+    """Aplicar token buckets por IP y username (429 con Retry-After)"""
+    try:
+        check_auth_rate_limits(request.client.host if request.client else None, username)
+    except TooManyRequests as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos, intenta más tarde",
+            headers=retry_after_header(e.retry_after),
+        )
+
+async def run_hash_operation(func, *args):
+    """Ejecutar una operación con hashing fuera del event loop, con cupo global (503 si no hay)"""
+    try:
+        with hash_admission.slot():
+            return await run_in_threadpool(func, *args)
+    except ServerBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, intenta más tarde",
+            headers=retry_after_header(e.retry_after),
+        )
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED, summary="Registrar nuevo usuario")
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, request: Request, db: Session = Depends(get_db)):
     """
     Registrar un nuevo usuario en el sistema.
     
@@ -42,6 +109,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     - **password**: Contraseña (requerido)
     - **full_name**: Nombre completo (opcional)
     """
+    enforce_auth_rate_limits(request, user_data.username)
+    
     # Verificar si el usuario ya existe
     existing_user = get_user_by_username(db, user_data.username)
     if existing_user:
@@ -59,18 +128,70 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Crear el usuario
-    db_user = create_user(db, user_data)
+    db_user = await run_hash_operation(create_user, db, user_data)
     return User.from_orm(db_user)
 
+@router.post(
+    "/bulk-register", response_model=BulkUserReport, summary="Alta masiva de usuarios (NDJSON/CSV)",
+    dependencies=[Depends(require_admin)]
+)
+async def bulk_register_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Registrar usuarios desde un archivo NDJSON o CSV.
+    
+    Los conflictos de username/email se resuelven con una consulta por lote, las
+    passwords se hashean en el pool de procesos compartido (ocupa cupos de hashing del
+    proceso: 503 si no hay) y cada lote se inserta en una transacción.
+    
+    - **file**: Archivo `.ndjson`/`.jsonl` o `.csv` con columnas username, email, password, full_name
+    - **format**: `ndjson` o `csv` (por defecto se detecta por la extensión)
+    - **batch_size**: Tamaño de lote (máximo 450)
+    
+    Requiere el header `X-Admin-Token`.
+    """
+    enforce_auth_rate_limits(request, None)
+    try:
+        fmt = detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        report = await run_in_threadpool(bulk_register_users, db, stream, fmt, batch_size)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8"
+        )
+    except ServerBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, intenta más tarde",
+            headers=retry_after_header(e.retry_after),
+        )
+    finally:
+        stream.detach()
+    return BulkUserReport(**report)
+
 @router.post("/login", response_model=Token, summary="Iniciar sesión")
-async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Iniciar sesión y obtener token de acceso.
     
     - **username**: Nombre de usuario
     - **password**: Contraseña
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    enforce_auth_rate_limits(request, form_data.username)
+    user = await run_hash_operation(authenticate_user, db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -78,21 +199,18 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Sessi
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return Token(access_token=access_token, token_type="bearer")
+    return issue_tokens(db, user)
 
 @router.post("/login-json", response_model=Token, summary="Iniciar sesión (JSON)")
-async def login_user_json(user_login: UserLogin, db: Session = Depends(get_db)):
+async def login_user_json(user_login: UserLogin, request: Request, db: Session = Depends(get_db)):
     """
     Iniciar sesión con datos JSON y obtener token de acceso.
     
     - **username**: Nombre de usuario
     - **password**: Contraseña
     """
-    user = authenticate_user(db, user_login.username, user_login.password)
+    enforce_auth_rate_limits(request, user_login.username)
+    user = await run_hash_operation(authenticate_user, db, user_login.username, user_login.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -100,11 +218,52 @@ async def login_user_json(user_login: UserLogin, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return Token(access_token=access_token, token_type="bearer")
+    return issue_tokens(db, user)
+
+@router.post("/refresh", response_model=Token, summary="Renovar access token")
+async def refresh_access_token(refresh_request: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Obtener un nuevo access token a partir del refresh token, sin volver a verificar la contraseña.
+    
+    El refresh token se rota en cada uso; reusar uno anterior revoca la sesión.
+    
+    - **refresh_token**: Refresh token recibido al iniciar sesión
+    """
+    rotated = rotate_refresh_token(db, refresh_request.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    session, refresh_token = rotated
+    
+    user = get_cached_user(session.user_id) or get_user_by_id(db, session.user_id)
+    if user is None or not user.is_active:
+        revoke_session(db, session.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuario inactivo",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    return build_token(user, session.id, refresh_token)
+
+@router.post("/logout", response_model=Message, summary="Cerrar sesión")
+async def logout(claims: dict = Depends(get_current_claims), db: Session = Depends(get_db)):
+    """
+    Revocar la sesión actual: el refresh token y los access tokens emitidos para ella dejan de ser válidos.
+    
+    Requiere token de autenticación válido.
+    """
+    session_id = claims.get("sid")
+    if not session_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El token no pertenece a una sesión revocable"
+        )
+    revoke_session(db, session_id)
+    return Message(message="Sesión cerrada")
 
 @router.get("/profile", response_model=User, summary="Obtener perfil del usuario")
 async def get_user_profile(current_user = Depends(get_current_user)):
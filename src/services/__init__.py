@@ -1,18 +1,57 @@
 # Services layer
-from .auth_service import verify_password, get_password_hash, create_access_token, verify_token
+from .auth_service import (
+    verify_password, get_password_hash, create_access_token, verify_token,
+    create_user_access_token, verify_token_claims, verify_and_update_password, calibrate_password_hashing
+)
+from .password_hashers import password_hashers
+from .rate_limiter import check_auth_rate_limits, hash_admission, TooManyRequests, ServerBusy
+from .session_service import create_session, rotate_refresh_token, revoke_session, revoke_user_sessions
+from .revocation import is_session_revoked
+from .user_cache import cache_user, get_cached_user, invalidate_user, clear_user_cache
 from .user_service import get_user_by_username, get_user_by_email, get_user_by_id, create_user, authenticate_user
 from .paper_service import (
     get_papers, get_paper_by_id, get_paper_by_doi, create_paper, update_paper, delete_paper, 
-    search_papers, get_popular_papers, convert_db_paper_to_schema
+    search_papers, get_popular_papers, convert_db_paper_to_schema, parse_fields, papers_to_schemas
+)
+from .bulk_service import bulk_import_papers, detect_format
+from .bulk_user_service import bulk_register_users
+from .export_service import export_rows, export_filename, validate_export_format, MEDIA_TYPES as EXPORT_MEDIA_TYPES
+from .search_service import (
+    search_papers_service, search_authors_service, get_search_suggestions,
+    search_papers_cached, search_authors_cached, search_query_cached, search_semantic_cached, get_encoded_body,
+    prepare_search_indexes
 )
-from .search_service import search_papers_service, search_authors_service, get_search_suggestions
+from .search_index import search_index, get_search_index, FACETS as SEARCH_FACETS
+from .semantic_index import semantic_index, get_semantic_index
+from .change_feed import change_feed, read_changes, latest_seq, PaperDelta
+from .index_rebuild import index_rebuilder, RebuildError
+from .search_warmup import search_warmup, top_queries
+from .trending import trending_searches, TRENDING_WINDOWS
+from .query_language import QuerySyntaxError, is_structured_query, explain_query, plan_cache
+from .http_cache import make_etag, etag_for_papers, etag_matches, cache_headers, not_modified
+from .compression import choose_encoding, compress_body
 from .mock_external_api import external_api_mock
 
 __all__ = [
     "verify_password", "get_password_hash", "create_access_token", "verify_token",
+    "create_user_access_token", "verify_token_claims", "verify_and_update_password", "calibrate_password_hashing",
+    "password_hashers",
+    "check_auth_rate_limits", "hash_admission", "TooManyRequests", "ServerBusy",
+    "create_session", "rotate_refresh_token", "revoke_session", "revoke_user_sessions", "is_session_revoked",
+    "cache_user", "get_cached_user", "invalidate_user", "clear_user_cache",
     "get_user_by_username", "get_user_by_email", "get_user_by_id", "create_user", "authenticate_user",
     "get_papers", "get_paper_by_id", "get_paper_by_doi", "create_paper", "update_paper", "delete_paper",
-    "search_papers", "get_popular_papers", "convert_db_paper_to_schema",
+    "search_papers", "get_popular_papers", "convert_db_paper_to_schema", "parse_fields", "papers_to_schemas",
+    "bulk_import_papers", "detect_format", "bulk_register_users",
+    "export_rows", "export_filename", "validate_export_format", "EXPORT_MEDIA_TYPES",
     "search_papers_service", "search_authors_service", "get_search_suggestions",
+    "search_papers_cached", "search_authors_cached", "search_query_cached", "search_semantic_cached", "get_encoded_body",
+    "prepare_search_indexes",
+    "search_index", "get_search_index", "SEARCH_FACETS", "semantic_index", "get_semantic_index",
+    "change_feed", "read_changes", "latest_seq", "PaperDelta", "index_rebuilder", "RebuildError",
+    "search_warmup", "top_queries", "trending_searches", "TRENDING_WINDOWS",
+    "QuerySyntaxError", "is_structured_query", "explain_query", "plan_cache",
+    "make_etag", "etag_for_papers", "etag_matches", "cache_headers", "not_modified",
+    "choose_encoding", "compress_body",
     "external_api_mock"
 ]
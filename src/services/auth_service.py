@@ -1,32 +1,69 @@
-from passlib.context import CryptContext
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from collections import OrderedDict
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import threading
+import time
 from ..config import settings
-
-# Configuración para hashing de passwords
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from .jwt_backends import TokenError, create_backend
+from .password_hashers import password_hashers
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar password"""
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except Exception as e:
-        print(f"Error verificando password: {e}")
-        return False
+    return password_hashers.verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar password y retornar un hash nuevo si el actual está desactualizado"""
+    return password_hashers.verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Generar hash de password"""
-    try:
-        # Truncar la contraseña a 72 bytes para bcrypt
-        if len(password.encode('utf-8')) > 72:
-            password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-        return pwd_context.hash(password)
-    except Exception as e:
-        print(f"Error hasheando password: {e}")
-        # Fallback simple si bcrypt falla
-        import hashlib
-        return hashlib.sha256(password.encode()).hexdigest()
+    return password_hashers.hash(password)
+
+def calibrate_password_hashing() -> Optional[int]:
+    """Calibrar el costo del esquema por defecto según PASSWORD_HASH_TARGET_MS"""
+    if settings.password_hash_target_ms <= 0:
+        return None
+    return password_hashers.calibrate(settings.password_hash_target_ms)
+
+class VerifiedTokenCache:
+    """LRU acotado de claims ya verificados, indexado por el digest SHA-256 del token"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(digest)
+            if payload is None:
+                return None
+            # Respetar exp: un token expirado nunca se sirve desde el cache
+            exp = payload.get("exp")
+            if exp is not None and exp <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return dict(payload)
+
+    def put(self, digest: bytes, payload: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = dict(payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Backend JWT con claves preconstruidas y cache de verificaciones
+jwt_backend = create_backend()
+verified_tokens = VerifiedTokenCache(settings.jwt_cache_max_entries)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crear token JWT"""
@@ -37,16 +74,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    encoded_jwt = jwt_backend.encode(to_encode)
     return encoded_jwt
 
+def create_user_access_token(user, expires_delta: Optional[timedelta] = None, session_id: Optional[str] = None):
+    """Crear token JWT con claims firmados de id y estado del usuario (y sesión si existe)"""
+    data = {"sub": user.username, "uid": user.id, "act": bool(user.is_active)}
+    if session_id:
+        data["sid"] = session_id
+    return create_access_token(data=data, expires_delta=expires_delta)
+
+def verify_token_claims(token: str) -> Optional[dict]:
+    """Verificar token JWT y retornar sus claims (con cache de tokens ya verificados)"""
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    payload = verified_tokens.get(digest)
+    if payload is not None:
+        return payload
+    
+    try:
+        payload = jwt_backend.decode(token)
+    except TokenError:
+        return None
+    if payload.get("sub") is None:
+        return None
+    verified_tokens.put(digest, payload)
+    return payload
+
 def verify_token(token: str) -> Optional[str]:
     """Verificar y decodificar token JWT"""
-    try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
-    except JWTError:
+    payload = verify_token_claims(token)
+    if payload is None:
         return None
+    return payload.get("sub")
+
+def verify_admin_token(token: Optional[str]) -> bool:
+    """Verificar el token de administración (X-Admin-Token); sin ADMIN_TOKEN nunca es válido"""
+    if not settings.admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), settings.admin_token.encode("utf-8"))
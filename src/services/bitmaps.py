@@ -0,0 +1,251 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+# Posiciones de los bits encendidos para cada valor de byte
+_BYTE_BITS: List[List[int]] = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+# Contenedores de 2^16 ids (16 bits altos = clave); hasta ARRAY_MAX_SIZE ids se guardan como
+# array ordenado de uint16 (2 bytes por id), por encima como bitset de 8 KB (igual que Roaring)
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+ARRAY_MAX_SIZE = 4096
+
+Container = Union[array, int]
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value: int) -> int:
+        return bin(value).count("1")
+
+def _bits_to_array(bits: int) -> array:
+    values = array("H")
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for index, byte in enumerate(data):
+        if byte:
+            base = index << 3
+            values.extend(base + bit for bit in _BYTE_BITS[byte])
+    return values
+
+def _array_to_bits(values: Iterable[int]) -> int:
+    buffer = bytearray(1 << (CHUNK_BITS - 3))
+    for value in values:
+        buffer[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(bytes(buffer), "little")
+
+def _size(container: Container) -> int:
+    return _popcount(container) if isinstance(container, int) else len(container)
+
+def _from_bits(bits: int) -> Container:
+    """Contenedor para un bitset: vuelve a array si quedó disperso"""
+    return _bits_to_array(bits) if _popcount(bits) <= ARRAY_MAX_SIZE else bits
+
+def _from_sorted(values: List[int]) -> Container:
+    return array("H", values) if len(values) <= ARRAY_MAX_SIZE else _array_to_bits(values)
+
+def _and(a: Container, b: Container) -> Container:
+    if isinstance(a, int) and isinstance(b, int):
+        return _from_bits(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return array("H", [value for value in a if b >> value & 1])
+    return array("H", sorted(set(a).intersection(b)))
+
+def _and_size(a: Container, b: Container) -> int:
+    if isinstance(a, int) and isinstance(b, int):
+        return _popcount(a & b)
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        return sum(b >> value & 1 for value in a)
+    return len(set(a).intersection(b))
+
+def _or(a: Container, b: Container) -> Container:
+    if isinstance(a, int) or isinstance(b, int) or len(a) + len(b) > ARRAY_MAX_SIZE:
+        bits = (a if isinstance(a, int) else _array_to_bits(a)) | (b if isinstance(b, int) else _array_to_bits(b))
+        return _from_bits(bits)
+    return array("H", sorted(set(a).union(b)))
+
+def _sub(a: Container, b: Container) -> Container:
+    if isinstance(a, int):
+        return _from_bits(a & ~(b if isinstance(b, int) else _array_to_bits(b)))
+    if isinstance(b, int):
+        return array("H", [value for value in a if not b >> value & 1])
+    excluded = set(b)
+    return array("H", [value for value in a if value not in excluded])
+
+class Bitmap:
+    """
+    Conjunto de ids enteros comprimido al estilo Roaring: los ids se agrupan en bloques de 2^16 y
+    cada bloque es un array ordenado (disperso) o un bitset sobre un int de Python (denso), así
+    un término raro con ids altos ocupa bytes y no id/8 bytes. AND/OR/ANDNOT operan por bloque.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: Optional[Dict[int, Container]] = None):
+        self.chunks: Dict[int, Container] = chunks if chunks is not None else {}
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "Bitmap":
+        """Construir de una vez (ids agrupados por bloque y ordenados)"""
+        grouped: Dict[int, List[int]] = {}
+        for value in ids:
+            grouped.setdefault(value >> CHUNK_BITS, []).append(value & CHUNK_MASK)
+        return cls({
+            key: _from_sorted(sorted(set(values)))
+            for key, values in grouped.items()
+        })
+
+    @classmethod
+    def from_sorted(cls, ids: Sequence[int]) -> "Bitmap":
+        """Construir desde ids ordenados y sin repetir (posting lists persistidas) sin reagrupar"""
+        chunks: Dict[int, Container] = {}
+        start, total = 0, len(ids)
+        while start < total:
+            key = ids[start] >> CHUNK_BITS
+            end = bisect_left(ids, (key + 1) << CHUNK_BITS, start)
+            chunks[key] = _from_sorted([value & CHUNK_MASK for value in ids[start:end]])
+            start = end
+        return cls(chunks)
+
+    def add(self, value: int):
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        container = self.chunks.get(key)
+        if container is None:
+            self.chunks[key] = array("H", [low])
+        elif isinstance(container, int):
+            self.chunks[key] = container | 1 << low
+        else:
+            position = bisect_left(container, low)
+            if position == len(container) or container[position] != low:
+                container.insert(position, low)
+                if len(container) > ARRAY_MAX_SIZE:
+                    self.chunks[key] = _array_to_bits(container)
+
+    def discard(self, value: int):
+        key, low = value >> CHUNK_BITS, value & CHUNK_MASK
+        container = self.chunks.get(key)
+        if container is None:
+            return
+        if isinstance(container, int):
+            if container >> low & 1:
+                container = _from_bits(container ^ 1 << low)
+        else:
+            position = bisect_left(container, low)
+            if position < len(container) and container[position] == low:
+                del container[position]
+        if _size(container):
+            self.chunks[key] = container
+        else:
+            del self.chunks[key]
+
+    def copy(self) -> "Bitmap":
+        return Bitmap({
+            key: container if isinstance(container, int) else array("H", container)
+            for key, container in self.chunks.items()
+        })
+
+    def __contains__(self, value: int) -> bool:
+        container = self.chunks.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = value & CHUNK_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        position = bisect_left(container, low)
+        return position < len(container) and container[position] == low
+
+    def __len__(self) -> int:
+        return sum(_size(container) for container in self.chunks.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        chunks = {}
+        for key, container in self.chunks.items():
+            other_container = other.chunks.get(key)
+            if other_container is not None:
+                result = _and(container, other_container)
+                if _size(result):
+                    chunks[key] = result
+        return Bitmap(chunks)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        result = self.copy()
+        for key, container in other.chunks.items():
+            mine = result.chunks.get(key)
+            result.chunks[key] = (
+                (container if isinstance(container, int) else array("H", container))
+                if mine is None else _or(mine, container)
+            )
+        return result
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        chunks = {}
+        for key, container in self.chunks.items():
+            other_container = other.chunks.get(key)
+            if other_container is None:
+                chunks[key] = container if isinstance(container, int) else array("H", container)
+                continue
+            result = _sub(container, other_container)
+            if _size(result):
+                chunks[key] = result
+        return Bitmap(chunks)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Bitmap) and self.chunks == other.chunks
+
+    def intersection_size(self, other: "Bitmap") -> int:
+        """|A ∩ B| sin materializar la intersección (conteo de facetas)"""
+        if len(self.chunks) > len(other.chunks):
+            self, other = other, self
+        total = 0
+        for key, container in self.chunks.items():
+            other_container = other.chunks.get(key)
+            if other_container is not None:
+                total += _and_size(container, other_container)
+        return total
+
+    def __iter__(self) -> Iterator[int]:
+        """Ids en orden ascendente"""
+        for key in sorted(self.chunks):
+            container = self.chunks[key]
+            base = key << CHUNK_BITS
+            if isinstance(container, int):
+                container = _bits_to_array(container)
+            for low in container:
+                yield base + low
+
+    def memory_bytes(self) -> int:
+        """Tamaño aproximado de los contenedores (2 bytes por id disperso, 8 KB por bloque denso)"""
+        return sum(
+            (container.bit_length() + 7) // 8 if isinstance(container, int) else container.itemsize * len(container)
+            for container in self.chunks.values()
+        )
+
+    def __repr__(self) -> str:
+        return f"Bitmap({len(self)} ids, {len(self.chunks)} bloques)"
+
+def union_all(bitmaps: Iterable[Bitmap]) -> Bitmap:
+    """Unión de muchos bitmaps: cada bloque se combina una sola vez (set si es disperso, bitset si no)"""
+    grouped: Dict[int, List[Container]] = {}
+    for bitmap in bitmaps:
+        for key, container in bitmap.chunks.items():
+            grouped.setdefault(key, []).append(container)
+    chunks: Dict[int, Container] = {}
+    for key, containers in grouped.items():
+        if len(containers) == 1:
+            container = containers[0]
+            chunks[key] = container if isinstance(container, int) else array("H", container)
+        elif any(isinstance(container, int) for container in containers) or sum(map(len, containers)) > ARRAY_MAX_SIZE:
+            bits = 0
+            for container in containers:
+                bits |= container if isinstance(container, int) else _array_to_bits(container)
+            chunks[key] = _from_bits(bits)
+        else:
+            chunks[key] = array("H", sorted(set().union(*containers)))
+    return Bitmap(chunks)
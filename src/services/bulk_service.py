@@ -0,0 +1,227 @@
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from ..database.models import Paper as DBPaper
+from ..database.normalization import fold_list, fold_text
+from .change_feed import change_feed
+from ..models.schemas import PaperCreate
+from ..config import settings
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+import csv
+import json
+import time
+
+# SQLite limita la cantidad de parámetros por sentencia; el IN de DOIs usa uno por fila
+MAX_BATCH_SIZE = 900
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+# Columnas CSV que contienen listas (separadas por ';' o JSON)
+PAPER_LIST_FIELDS = ("authors", "keywords")
+
+def detect_format(filename: Optional[str], explicit_format: Optional[str] = None) -> str:
+    """Determinar el formato de entrada a partir del parámetro o la extensión del archivo"""
+    if explicit_format:
+        fmt = explicit_format.lower()
+        if fmt == "jsonl":
+            fmt = "ndjson"
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Formato no soportado: {explicit_format}")
+        return fmt
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+def iter_ndjson_records(stream: TextIO) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Leer NDJSON línea por línea, retornando (fila, registro, error)"""
+    for row_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Cada línea debe ser un objeto JSON"
+            continue
+        yield row_number, record, None
+
+def _parse_csv_list(value: Optional[str]) -> List[str]:
+    """Convertir una celda CSV en lista (JSON o separada por ';')"""
+    if value is None:
+        return []
+    value = value.strip()
+    if not value:
+        return []
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split(";") if item.strip()]
+
+def iter_csv_records(
+    stream: TextIO, list_fields: Tuple[str, ...] = PAPER_LIST_FIELDS
+) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Leer CSV con encabezado fila por fila, retornando (fila, registro, error)"""
+    reader = csv.DictReader(stream)
+    for row_number, row in enumerate(reader, start=1):
+        try:
+            record = {key: value for key, value in row.items() if key and value not in (None, "")}
+            for field in list_fields:
+                record[field] = _parse_csv_list(row.get(field))
+        except (ValueError, AttributeError) as e:
+            yield row_number, None, f"Fila CSV inválida: {e}"
+            continue
+        yield row_number, record, None
+
+def iter_records(
+    stream: TextIO, fmt: str, list_fields: Tuple[str, ...] = PAPER_LIST_FIELDS
+) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Seleccionar el parser incremental según el formato"""
+    if fmt == "csv":
+        return iter_csv_records(stream, list_fields)
+    return iter_ndjson_records(stream)
+
+def _paper_row(paper: PaperCreate, creator_id: Optional[int]) -> Dict:
+    """Construir la fila a insertar con el mismo formato que create_paper"""
+    # El insert de Core no dispara los eventos ORM: las columnas normalizadas se calculan aquí
+    return {
+        "title": paper.title,
+        "abstract": paper.abstract,
+        "authors": json.dumps(paper.authors) if paper.authors else "[]",
+        "publication_year": paper.publication_year,
+        "doi": paper.doi,
+        "pdf_url": paper.pdf_url,
+        "keywords": json.dumps(paper.keywords) if paper.keywords else "[]",
+        "creator_id": creator_id,
+        "title_norm": fold_text(paper.title),
+        "authors_norm": fold_list(paper.authors or []),
+        "keywords_norm": fold_list(paper.keywords or []),
+    }
+
+class BulkPaperImporter:
+    """Importador por lotes: valida, resuelve DOIs e inserta con executemany"""
+
+    def __init__(self, db: Session, creator_id: Optional[int] = None, batch_size: Optional[int] = None):
+        self.db = db
+        self.creator_id = creator_id
+        self.batch_size = max(1, min(batch_size or settings.bulk_batch_size, MAX_BATCH_SIZE))
+        self.max_reported_errors = settings.bulk_max_reported_errors
+        self.total_rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+        self.errors_truncated = False
+        self._pending: List[Tuple[int, dict]] = []
+        self._started = time.perf_counter()
+
+    def _record_error(self, row: int, error: str, doi: Optional[str] = None):
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append({"row": row, "doi": doi, "error": error})
+        else:
+            self.errors_truncated = True
+
+    def feed(self, row: int, record: Optional[dict], error: Optional[str] = None):
+        """Agregar un registro al lote actual; se inserta al llenarse el lote"""
+        self.total_rows += 1
+        if error is not None:
+            self._record_error(row, error)
+            return
+        self._pending.append((row, record))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _validate_batch(self) -> List[Tuple[int, PaperCreate]]:
+        valid = []
+        for row, record in self._pending:
+            try:
+                valid.append((row, PaperCreate(**record)))
+            except ValidationError as e:
+                first = e.errors()[0]
+                location = ".".join(str(part) for part in first.get("loc", ()))
+                self._record_error(row, f"{location}: {first.get('msg')}", record.get("doi"))
+        return valid
+
+    def _resolve_doi_conflicts(self, valid: List[Tuple[int, PaperCreate]]) -> List[Tuple[int, PaperCreate]]:
+        """Descartar DOIs existentes con una sola consulta por lote y duplicados dentro del lote"""
+        dois = {paper.doi for _, paper in valid if paper.doi}
+        existing = set()
+        if dois:
+            existing = {
+                doi for (doi,) in self.db.query(DBPaper.doi).filter(DBPaper.doi.in_(dois))
+            }
+        accepted = []
+        seen = set()
+        for row, paper in valid:
+            if paper.doi:
+                if paper.doi in existing:
+                    self._record_error(row, "Ya existe un paper con este DOI", paper.doi)
+                    continue
+                if paper.doi in seen:
+                    self._record_error(row, "DOI duplicado dentro del archivo", paper.doi)
+                    continue
+                seen.add(paper.doi)
+            accepted.append((row, paper))
+        return accepted
+
+    def _insert_individually(self, accepted: List[Tuple[int, PaperCreate]]):
+        """Fallback fila por fila cuando el lote falla por una carrera de DOIs"""
+        for row, paper in accepted:
+            values = _paper_row(paper, self.creator_id)
+            try:
+                self.db.execute(insert(DBPaper.__table__), [values])
+                self.db.commit()
+                self.inserted += 1
+            except IntegrityError:
+                self.db.rollback()
+                self._record_error(row, "Ya existe un paper con este DOI", paper.doi)
+        change_feed.poll(self.db)
+
+    def flush(self):
+        """Validar e insertar el lote pendiente en una sola transacción"""
+        if not self._pending:
+            return
+        accepted = self._resolve_doi_conflicts(self._validate_batch())
+        self._pending = []
+        if not accepted:
+            return
+        rows = [_paper_row(paper, self.creator_id) for _, paper in accepted]
+        try:
+            self.db.execute(insert(DBPaper.__table__), rows)
+            self.db.commit()
+            self.inserted += len(rows)
+        except IntegrityError:
+            self.db.rollback()
+            self._insert_individually(accepted)
+            return
+        # Los triggers registraron cada fila: los índices y el cache se actualizan desde el change log
+        change_feed.poll(self.db)
+
+    def finish(self) -> Dict:
+        """Insertar el último lote y construir el reporte"""
+        self.flush()
+        elapsed = time.perf_counter() - self._started
+        return {
+            "total_rows": self.total_rows,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_second": round(self.total_rows / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+def bulk_import_papers(
+    db: Session,
+    stream: TextIO,
+    fmt: str = "ndjson",
+    creator_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Dict:
+    """Importar papers desde un stream NDJSON/CSV con memoria constante"""
+    importer = BulkPaperImporter(db, creator_id=creator_id, batch_size=batch_size)
+    for row, record, error in iter_records(stream, fmt):
+        importer.feed(row, record, error)
+    return importer.finish()
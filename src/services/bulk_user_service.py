@@ -0,0 +1,225 @@
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from ..database.models import User as DBUser
+from ..models.schemas import UserCreate
+from ..config import settings
+from .bulk_service import iter_records
+from .password_hashers import password_hashers
+from .rate_limiter import hash_admission
+from typing import Dict, List, Optional, TextIO, Tuple
+import multiprocessing
+import threading
+import time
+
+# Cada fila usa dos parámetros en la consulta de conflictos (username y email)
+MAX_BATCH_SIZE = 450
+
+# Pool de procesos compartido por las altas masivas de la API (se crea al primer uso)
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def hash_workers() -> int:
+    """Procesos para hashear: BULK_HASH_WORKERS acotado al cupo de hashing del proceso (0 = la mitad del cupo)"""
+    limit = max(1, settings.auth_max_concurrent_hashes)
+    return max(1, min(settings.bulk_hash_workers or limit // 2, limit))
+
+def shared_hash_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Pool compartido; con spawn los procesos no heredan los hilos ni los locks del servidor"""
+    global _executor
+    if workers < 2:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def shutdown_hash_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+class BulkUserImporter:
+    """Alta masiva de usuarios: valida, resuelve conflictos por lote, hashea en paralelo e inserta"""
+
+    def __init__(
+        self,
+        db: Session,
+        batch_size: Optional[int] = None,
+        executor: Optional[ProcessPoolExecutor] = None,
+        workers: int = 1,
+    ):
+        self.db = db
+        self.batch_size = max(1, min(batch_size or settings.bulk_batch_size, MAX_BATCH_SIZE))
+        self.executor = executor
+        self.workers = workers if executor is not None else 1
+        self.max_reported_results = settings.bulk_max_reported_results
+        self.total_rows = 0
+        self.created = 0
+        self.failed = 0
+        self.results: List[Dict] = []
+        self.results_truncated = False
+        self.hash_seconds = 0.0
+        self._pending: List[Tuple[int, dict]] = []
+        self._started = time.perf_counter()
+
+    def _report(self, result: Dict):
+        if len(self.results) < self.max_reported_results:
+            self.results.append(result)
+        else:
+            self.results_truncated = True
+
+    def _record_error(self, row: int, error: str, username: Optional[str] = None):
+        self.failed += 1
+        self._report({"row": row, "username": username, "status": "error", "error": error})
+
+    def _record_created(self, row: int, username: str, user_id: int):
+        self.created += 1
+        self._report({"row": row, "username": username, "status": "created", "id": user_id})
+
+    def feed(self, row: int, record: Optional[dict], error: Optional[str] = None):
+        """Agregar un registro al lote actual; se procesa al llenarse el lote"""
+        self.total_rows += 1
+        if error is not None:
+            self._record_error(row, error)
+            return
+        self._pending.append((row, record))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _validate_batch(self) -> List[Tuple[int, UserCreate]]:
+        valid = []
+        for row, record in self._pending:
+            try:
+                valid.append((row, UserCreate(**record)))
+            except ValidationError as e:
+                first = e.errors()[0]
+                location = ".".join(str(part) for part in first.get("loc", ()))
+                self._record_error(row, f"{location}: {first.get('msg')}", record.get("username"))
+        return valid
+
+    def _resolve_conflicts(self, valid: List[Tuple[int, UserCreate]]) -> List[Tuple[int, UserCreate]]:
+        """Descartar usernames/emails existentes con una sola consulta y duplicados dentro del lote"""
+        usernames = {user.username for _, user in valid}
+        emails = {user.email for _, user in valid}
+        taken_usernames, taken_emails = set(), set()
+        if valid:
+            query = self.db.query(DBUser.username, DBUser.email).filter(
+                or_(DBUser.username.in_(usernames), DBUser.email.in_(emails))
+            )
+            for username, email in query:
+                taken_usernames.add(username)
+                taken_emails.add(email)
+        accepted = []
+        for row, user in valid:
+            if user.username in taken_usernames:
+                self._record_error(row, "El nombre de usuario ya está registrado", user.username)
+                continue
+            if user.email in taken_emails:
+                self._record_error(row, "El correo electrónico ya está registrado", user.username)
+                continue
+            # Las siguientes filas del lote con el mismo username/email son duplicados
+            taken_usernames.add(user.username)
+            taken_emails.add(user.email)
+            accepted.append((row, user))
+        return accepted
+
+    def _rows(self, accepted: List[Tuple[int, UserCreate]]) -> List[Dict]:
+        started = time.perf_counter()
+        hashes = password_hashers.hash_many(
+            [user.password for _, user in accepted], self.executor, self.workers
+        )
+        self.hash_seconds += time.perf_counter() - started
+        now = datetime.utcnow()
+        return [
+            {
+                "username": user.username,
+                "email": user.email,
+                "full_name": user.full_name,
+                "hashed_password": hashed,
+                "is_active": True,
+                "created_at": now,
+            }
+            for (_, user), hashed in zip(accepted, hashes)
+        ]
+
+    def _insert_individually(self, accepted: List[Tuple[int, UserCreate]], rows: List[Dict]):
+        """Fallback fila por fila cuando el lote falla por una carrera de altas"""
+        for (row, user), values in zip(accepted, rows):
+            try:
+                user_id = self.db.execute(insert(DBUser.__table__).returning(DBUser.id), [values]).scalar_one()
+                self.db.commit()
+                self._record_created(row, user.username, user_id)
+            except IntegrityError:
+                self.db.rollback()
+                self._record_error(row, "El usuario o correo ya está registrado", user.username)
+
+    def flush(self):
+        """Validar, hashear e insertar el lote pendiente en una sola transacción"""
+        if not self._pending:
+            return
+        accepted = self._resolve_conflicts(self._validate_batch())
+        self._pending = []
+        if not accepted:
+            return
+        rows = self._rows(accepted)
+        try:
+            statement = insert(DBUser.__table__).returning(DBUser.id, sort_by_parameter_order=True)
+            ids = self.db.execute(statement, rows).scalars().all()
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            self._insert_individually(accepted, rows)
+            return
+        for (row, user), user_id in zip(accepted, ids):
+            self._record_created(row, user.username, user_id)
+
+    def finish(self) -> Dict:
+        """Procesar el último lote y construir el reporte"""
+        self.flush()
+        elapsed = time.perf_counter() - self._started
+        return {
+            "total_rows": self.total_rows,
+            "created": self.created,
+            "failed": self.failed,
+            "results": sorted(self.results, key=lambda result: result["row"]),
+            "results_truncated": self.results_truncated,
+            "hash_workers": self.workers,
+            "hash_seconds": round(self.hash_seconds, 4),
+            "elapsed_seconds": round(elapsed, 4),
+            "rows_per_second": round(self.total_rows / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+def _register(db: Session, stream: TextIO, fmt: str, batch_size: Optional[int], executor, workers: int) -> Dict:
+    importer = BulkUserImporter(db, batch_size=batch_size, executor=executor, workers=workers)
+    for row, record, error in iter_records(stream, fmt, list_fields=()):
+        importer.feed(row, record, error)
+    return importer.finish()
+
+def bulk_register_users(
+    db: Session,
+    stream: TextIO,
+    fmt: str = "ndjson",
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Dict:
+    """
+    Registrar usuarios desde un stream NDJSON/CSV hasheando en un pool de procesos.
+    Con `workers` (script de línea de comandos) se usa un pool propio; si no, el pool compartido
+    reservando sus procesos en hash_admission (ServerBusy si no hay cupo)
+    """
+    if workers is not None:
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            return _register(db, stream, fmt, batch_size, executor, workers)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    workers = hash_workers()
+    with hash_admission.slot(workers):
+        return _register(db, stream, fmt, batch_size, shared_hash_executor(workers), workers)
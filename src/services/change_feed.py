@@ -0,0 +1,218 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..database.models import Paper as DBPaper, PaperChange
+from ..database.connection import get_db
+from ..config import settings
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Dict, Iterator, List, NamedTuple, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQLite limita la cantidad de parámetros por sentencia; el IN de ids usa uno por paper
+MAX_BATCH_SIZE = 900
+
+# Cada cuántos segundos el hilo del feed recorta el log a los últimos `retention` cambios
+PRUNE_INTERVAL = 60
+
+# Columnas que reciben los consumidores (las que usan los índices y el cache de búsqueda)
+DELTA_COLUMNS = (
+    DBPaper.id, DBPaper.title, DBPaper.abstract, DBPaper.authors, DBPaper.keywords,
+    DBPaper.publication_year, DBPaper.citation_count, DBPaper.title_norm, DBPaper.authors_norm,
+)
+
+class PaperDelta(NamedTuple):
+    """Paper modificado en un lote: `row` es su estado actual (None si se borró), `inserted` si no existía antes"""
+    paper_id: int
+    inserted: bool
+    row: Optional[object]
+
+def latest_seq(db: Session) -> int:
+    """Último número de secuencia del change log (0 si está vacío)"""
+    return db.query(func.max(PaperChange.seq)).scalar() or 0
+
+def change_fingerprint(db: Session, seq: int) -> Optional[List]:
+    """Huella (paper_id, op, fecha) del cambio `seq`: distingue la misma posición en otra base"""
+    row = db.query(PaperChange.paper_id, PaperChange.op, PaperChange.changed_at).filter(PaperChange.seq == seq).first()
+    if row is None:
+        return None
+    return [row.paper_id, row.op, row.changed_at.isoformat() if row.changed_at else None]
+
+def log_position(db: Session, seq: Optional[int] = None) -> Dict:
+    """Posición del change log (la última si no se indica) que guardan las estructuras persistidas"""
+    seq = latest_seq(db) if seq is None else seq
+    return {"seq": seq, "change": change_fingerprint(db, seq)}
+
+def resumable(db: Session, position: Optional[Dict], same_table: Callable[[], bool]) -> bool:
+    """
+    Si una estructura persistida en `position` puede ponerse al día reaplicando el log: el cambio de esa
+    posición sigue en el log con la misma huella. Si el log estaba vacío al guardarla, debe seguir vacío
+    y la tabla coincidir (`same_table`)
+    """
+    if not position:
+        return False
+    if position.get("change") is None:
+        return position.get("seq") == 0 and latest_seq(db) == 0 and same_table()
+    return change_fingerprint(db, position["seq"]) == position["change"]
+
+def read_changes(db: Session, after_seq: int, limit: int) -> List[Tuple[int, int, str]]:
+    """Cambios (seq, paper_id, op) posteriores a `after_seq`, en orden: la API para seguir el log"""
+    return db.query(PaperChange.seq, PaperChange.paper_id, PaperChange.op).filter(
+        PaperChange.seq > after_seq
+    ).order_by(PaperChange.seq).limit(limit).all()
+
+def load_deltas(db: Session, changes: List[Tuple[int, int, str]]) -> List[PaperDelta]:
+    """Colapsar un lote de cambios a un delta por paper con su estado actual (una sola consulta)"""
+    first_op: Dict[int, str] = {}
+    for _, paper_id, op in changes:
+        first_op.setdefault(paper_id, op)
+    rows = {row.id: row for row in db.query(*DELTA_COLUMNS).filter(DBPaper.id.in_(list(first_op)))}
+    return [PaperDelta(paper_id, op == "insert", rows.get(paper_id)) for paper_id, op in first_op.items()]
+
+def replay_changes(
+    db: Session, after_seq: int, apply: Callable[[List[PaperDelta]], None],
+    until_seq: Optional[int] = None, batch_size: int = MAX_BATCH_SIZE
+) -> Tuple[int, int]:
+    """Aplicar a una estructura los cambios posteriores a `after_seq` (hasta `until_seq`); retorna (posición, cambios)"""
+    position, total = after_seq, 0
+    while until_seq is None or position < until_seq:
+        changes = read_changes(db, position, batch_size)
+        if until_seq is not None:
+            changes = [change for change in changes if change.seq <= until_seq]
+        if not changes:
+            break
+        if changes[0].seq != position + 1:
+            raise LookupError(f"El change log ya no tiene los cambios posteriores a {position}")
+        apply(load_deltas(db, changes))
+        position = changes[-1].seq
+        total += len(changes)
+    return position, total
+
+def prune_changes(db: Session, retention: int) -> int:
+    """Borrar los cambios más viejos que los últimos `retention`"""
+    deleted = db.query(PaperChange).filter(
+        PaperChange.seq <= latest_seq(db) - retention
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+Consumer = Tuple[str, Callable[[List[PaperDelta]], None], Callable[[], None]]
+
+class ChangeFeed:
+    """
+    Sigue el change log de papers y aplica los cambios, en lotes y en orden, a las estructuras derivadas
+    del proceso (cache e índices de búsqueda). El proceso que escribe lo consulta al hacer commit y un
+    hilo lo consulta cada `poll_seconds` para recibir las escrituras de los demás workers. Si el log se
+    recortó más allá de la posición (worker muy atrasado), los consumidores se reinician y reconstruyen.
+    """
+
+    def __init__(self, poll_seconds: float, batch_size: int, retention: int):
+        self.poll_seconds = poll_seconds
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.retention = retention
+        # Último cambio aplicado; None = se desconoce qué reflejan las estructuras
+        self.position: Optional[int] = None
+        self.consumers: List[Consumer] = []
+        self.applied = 0
+        self.resets = 0
+        self.polled_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Sesiones del hilo del feed (y de otras tareas de fondo): las mismas que usan los endpoints
+        self.session_factory: Optional[Callable[[], ContextManager[Session]]] = None
+
+    def subscribe(self, name: str, apply: Callable[[List[PaperDelta]], None], reset: Callable[[], None]):
+        """Registrar un consumidor: `apply` recibe cada lote de deltas y `reset` descarta la estructura"""
+        self.consumers.append((name, apply, reset))
+
+    def _reset(self, db: Session):
+        self.position = latest_seq(db)
+        for _, _, reset in self.consumers:
+            reset()
+        self.resets += 1
+
+    def _apply(self, deltas: List[PaperDelta]):
+        for _, apply, _ in self.consumers:
+            apply(deltas)
+
+    def _poll(self, db: Session) -> int:
+        self.polled_at = time.time()
+        if self.position is None:
+            self._reset(db)
+            return 0
+        try:
+            self.position, total = replay_changes(db, self.position, self._apply, batch_size=self.batch_size)
+        except LookupError:
+            logger.warning(
+                f"Change log recortado después de la posición {self.position}: se reconstruyen las estructuras derivadas"
+            )
+            self._reset(db)
+            return 0
+        self.applied += total
+        return total
+
+    def poll(self, db: Session) -> int:
+        """Aplicar los cambios nuevos del log a los consumidores; retorna cuántos se leyeron"""
+        with self._lock:
+            return self._poll(db)
+
+    @contextmanager
+    def paused(self, db: Session) -> Iterator[int]:
+        """Aplicar lo pendiente y retener el feed mientras dura el bloque; entrega la posición (fija)"""
+        with self._lock:
+            self._poll(db)
+            yield self.position
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], ContextManager[Session]]):
+        """Fijar la posición inicial y lanzar el hilo que sigue las escrituras de los demás workers"""
+        self.session_factory = session_factory
+        with session_factory() as db:
+            with self._lock:
+                if self.position is None:
+                    self._reset(db)
+        if self.poll_seconds > 0 and not self.running:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        pruned_at = time.monotonic()
+        while not self._stopped.wait(self.poll_seconds):
+            try:
+                with self.session_factory() as db:
+                    self.poll(db)
+                    if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                        pruned_at = time.monotonic()
+                        prune_changes(db, self.retention)
+            except Exception:
+                logger.exception("Error al seguir el change log de papers")
+
+    def stats(self) -> Dict:
+        return {
+            "position": self.position,
+            "applied": self.applied,
+            "resets": self.resets,
+            "consumers": [name for name, _, _ in self.consumers],
+            "polling": self.running,
+            "poll_seconds": self.poll_seconds,
+            "polled_at": self.polled_at,
+        }
+
+change_feed = ChangeFeed(settings.change_feed_poll_seconds, settings.change_feed_batch_size, settings.change_log_retention)
+
+def background_sessions() -> Callable[[], ContextManager[Session]]:
+    """Sesiones de las tareas de fondo: las del feed (mismas que los endpoints) o las de get_db"""
+    return change_feed.session_factory or contextmanager(get_db)
@@ -0,0 +1,106 @@
+from ..config import settings
+from typing import Dict, List, Optional
+import zlib
+
+# Codecs opcionales: brotli y zstandard solo se ofrecen si están instalados
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+# Orden de preferencia del servidor cuando el cliente acepta varias con igual peso
+PREFERRED_ENCODINGS = ("br", "zstd", "gzip")
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/vnd.apache.arrow.stream",
+)
+
+def available_encodings() -> List[str]:
+    """Codificaciones soportadas en este entorno"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    weights = {}
+    for item in header.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Negociar la codificación a partir del header Accept-Encoding"""
+    if not settings.compression_enabled or not accept_encoding:
+        return None
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for coding in available_encodings():
+        weight = weights.get(coding, wildcard)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    """Solo se comprimen tipos de texto/JSON (Parquet, imágenes, etc. ya vienen comprimidos)"""
+    if not content_type:
+        return False
+    content_type = content_type.lower()
+    return any(content_type.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+class StreamCompressor:
+    """Compresor incremental para respuestas en streaming"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=settings.brotli_quality)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=settings.zstd_level).compressobj()
+        else:
+            # wbits=31 produce formato gzip (cabecera + CRC)
+            self._compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    """Comprimir un cuerpo completo con niveles orientados a latencia"""
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.brotli_quality)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.zstd_level).compress(data)
+    compressor = StreamCompressor(encoding)
+    return compressor.compress(data) + compressor.flush()
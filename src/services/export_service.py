@@ -0,0 +1,248 @@
+from sqlalchemy import Boolean, DateTime, Integer, String, func, literal, select, type_coerce
+from sqlalchemy.orm import Session
+from ..database.models import Paper as DBPaper, SearchLog
+from ..config import settings
+from typing import Iterator, List, Optional, Tuple
+from datetime import datetime
+from json.encoder import encode_basestring
+import csv
+import io
+import json
+
+# pyarrow es opcional: solo se necesita para exportar en Parquet/Arrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet", "arrow")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Columnas exportadas por tabla; las marcadas como JSON ya están serializadas en la BD
+PAPER_COLUMNS = [
+    "id", "title", "abstract", "authors", "publication_year", "doi", "pdf_url",
+    "keywords", "citation_count", "created_at", "updated_at", "creator_id",
+]
+PAPER_JSON_COLUMNS = {"authors", "keywords"}
+SEARCH_LOG_COLUMNS = ["id", "query", "user_id", "results_count", "search_type", "created_at"]
+
+EXPORT_TABLES = {
+    "papers": (DBPaper.__table__, PAPER_COLUMNS, PAPER_JSON_COLUMNS),
+    "search_logs": (SearchLog.__table__, SEARCH_LOG_COLUMNS, set()),
+}
+
+def arrow_available() -> bool:
+    """Indica si pyarrow está instalado"""
+    return pa is not None
+
+def validate_export_format(fmt: str) -> str:
+    """Validar el formato solicitado"""
+    fmt = (fmt or "ndjson").lower()
+    if fmt == "jsonl":
+        fmt = "ndjson"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    if fmt in ("parquet", "arrow") and not arrow_available():
+        raise RuntimeError("Exportar en Parquet/Arrow requiere instalar pyarrow")
+    return fmt
+
+def _column_kind(column, json_columns: set) -> str:
+    if column.name in json_columns:
+        return "json"
+    if isinstance(column.type, DateTime):
+        return "datetime"
+    if isinstance(column.type, (Integer, Boolean)):
+        return "int"
+    return "str"
+
+def iter_row_batches(db: Session, table_name: str, chunk_size: Optional[int] = None, raw_datetimes: bool = False) -> Iterator[List[Tuple]]:
+    """Recorrer la tabla con un cursor del lado del servidor (yield_per) en lotes de tuplas"""
+    table, columns, _ = EXPORT_TABLES[table_name]
+    chunk_size = chunk_size or settings.export_chunk_size
+    selected = []
+    for name in columns:
+        column = table.c[name]
+        # Leer fechas como texto evita parsear y re-serializar cada datetime
+        if raw_datetimes and isinstance(column.type, DateTime):
+            column = type_coerce(column, String).label(name)
+        selected.append(column)
+    stmt = select(*selected).order_by(table.c.id)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def _encode_int(value) -> str:
+    return "null" if value is None else str(value)
+
+def _encode_str(value) -> str:
+    return "null" if value is None else encode_basestring(value)
+
+def _encode_json(value) -> str:
+    return value or "[]"
+
+def _encode_datetime(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, datetime):
+        return '"' + value.isoformat() + '"'
+    # SQLite almacena "YYYY-MM-DD HH:MM:SS.ffffff"; se emite en formato ISO 8601
+    return '"' + value.replace(" ", "T", 1) + '"'
+
+_ENCODERS = {"int": _encode_int, "str": _encode_str, "json": _encode_json, "datetime": _encode_datetime}
+
+def _sqlite_json_object(table, columns: List[str], json_columns: set):
+    """Expresión json_object() para que SQLite serialice cada fila en C"""
+    arguments = []
+    for name in columns:
+        column = table.c[name]
+        if name in json_columns:
+            value = func.json(func.coalesce(column, "[]"))
+        elif isinstance(column.type, DateTime):
+            value = func.replace(type_coerce(column, String), " ", "T")
+        else:
+            value = column
+        arguments.extend([literal(name), value])
+    return func.json_object(*arguments)
+
+def _iter_ndjson_sqlite(db: Session, table_name: str, chunk_size: int) -> Iterator[bytes]:
+    table, columns, json_columns = EXPORT_TABLES[table_name]
+    stmt = select(_sqlite_json_object(table, columns, json_columns)).order_by(table.c.id)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    try:
+        for partition in result.scalars().partitions():
+            yield ("\n".join(partition) + "\n").encode("utf-8")
+    finally:
+        result.close()
+
+def iter_ndjson(db: Session, table_name: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Serializar a NDJSON reutilizando las columnas JSON tal como están almacenadas"""
+    chunk_size = chunk_size or settings.export_chunk_size
+    if db.get_bind().dialect.name == "sqlite":
+        yield from _iter_ndjson_sqlite(db, table_name, chunk_size)
+        return
+    
+    table, columns, json_columns = EXPORT_TABLES[table_name]
+    template = "{" + ",".join(json.dumps(name) + ":%s" for name in columns) + "}\n"
+    encoders = [_ENCODERS[_column_kind(table.c[name], json_columns)] for name in columns]
+    for batch in iter_row_batches(db, table_name, chunk_size, raw_datetimes=True):
+        lines = [
+            template % tuple([encode(value) for encode, value in zip(encoders, row)])
+            for row in batch
+        ]
+        yield "".join(lines).encode("utf-8")
+
+def iter_csv(db: Session, table_name: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Serializar a CSV; las listas se escriben como JSON (compatible con la carga masiva)"""
+    _, columns, _ = EXPORT_TABLES[table_name]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in iter_row_batches(db, table_name, chunk_size, raw_datetimes=True):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _arrow_schema(table_name: str):
+    if table_name == "papers":
+        return pa.schema([
+            ("id", pa.int64()), ("title", pa.string()), ("abstract", pa.string()),
+            ("authors", pa.list_(pa.string())), ("publication_year", pa.int32()),
+            ("doi", pa.string()), ("pdf_url", pa.string()), ("keywords", pa.list_(pa.string())),
+            ("citation_count", pa.int64()), ("created_at", pa.timestamp("us")),
+            ("updated_at", pa.timestamp("us")), ("creator_id", pa.int64()),
+        ])
+    return pa.schema([
+        ("id", pa.int64()), ("query", pa.string()), ("user_id", pa.int64()),
+        ("results_count", pa.int64()), ("search_type", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+def _record_batch(batch: List[Tuple], columns: List[str], json_columns: set, schema):
+    arrays = []
+    for index, name in enumerate(columns):
+        values = [row[index] for row in batch]
+        field_type = schema.field(name).type
+        if name in json_columns:
+            values = [json.loads(value) if value else [] for value in values]
+        elif pa.types.is_timestamp(field_type):
+            # Arrow convierte el texto de SQLite a timestamp en C
+            arrays.append(pa.array(values, type=pa.string()).cast(field_type))
+            continue
+        arrays.append(pa.array(values, type=field_type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura que acumula bytes para entregarlos por partes"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_arrow(db: Session, table_name: str, fmt: str = "parquet", chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Serializar a Parquet (un row group por lote) o Arrow IPC stream"""
+    _, columns, json_columns = EXPORT_TABLES[table_name]
+    schema = _arrow_schema(table_name)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in iter_row_batches(db, table_name, chunk_size, raw_datetimes=True):
+            record_batch = _record_batch(batch, columns, json_columns, schema)
+            if fmt == "parquet":
+                writer.write_table(pa.Table.from_batches([record_batch]))
+            else:
+                writer.write_batch(record_batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+def export_rows(db: Session, table_name: str, fmt: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """Generador de bytes para el formato solicitado"""
+    if fmt == "csv":
+        return iter_csv(db, table_name, chunk_size)
+    if fmt in ("parquet", "arrow"):
+        return iter_arrow(db, table_name, fmt, chunk_size)
+    return iter_ndjson(db, table_name, chunk_size)
+
+def export_filename(table_name: str, fmt: str) -> str:
+    """Nombre de archivo sugerido para la descarga"""
+    extension = {"ndjson": "ndjson", "csv": "csv", "parquet": "parquet", "arrow": "arrows"}[fmt]
+    return f"{table_name}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
@@ -0,0 +1,43 @@
+from fastapi import Response
+from typing import Dict, Iterable, Optional
+import hashlib
+
+def make_etag(*parts) -> str:
+    """Generar un ETag débil a partir de bytes o valores serializables"""
+    digest = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        digest.update(part)
+        digest.update(b"\x1f")
+    # Débil (W/) porque el mismo contenido puede enviarse con distinta codificación
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+def etag_for_papers(db_papers: Iterable, *extra) -> str:
+    """ETag de un conjunto de papers basado en sus ids y updated_at"""
+    versions = [f"{paper.id}:{paper.updated_at.timestamp() if paper.updated_at else 0}" for paper in db_papers]
+    return make_etag(",".join(versions), *extra)
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match contra el ETag actual (RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = _opaque(etag)
+    return any(_opaque(tag) == current for tag in if_none_match.split(","))
+
+def cache_headers(etag: str, cache_control: Optional[str]) -> Dict[str, str]:
+    """Headers de validación y cache para la respuesta"""
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return headers
+
+def not_modified(etag: str, cache_control: Optional[str]) -> Response:
+    """Respuesta 304 sin cuerpo"""
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
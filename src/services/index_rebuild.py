@@ -0,0 +1,220 @@
+from sqlalchemy.orm import Session
+from .search_index import SearchIndex, search_index, read_papers, corpus_signature
+from .change_feed import background_sessions, change_feed, latest_seq, log_position, replay_changes
+from .search_service import clear_search_cache
+from .index_store import file_identity
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, Optional, Tuple
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Intentos de verificación si entran escrituras entre el conteo de la tabla y la lectura del change log
+VERIFY_ATTEMPTS = 5
+
+class RebuildError(RuntimeError):
+    """Reconstrucción en curso, sin versión anterior, o versión nueva que no coincide con la tabla"""
+
+def previous_path(path: str) -> str:
+    """Archivo publicado antes de la última reconstrucción (para volver a publicarlo con rollback)"""
+    return f"{path}.previous"
+
+def _link_or_copy(source: str, target: str):
+    """`target` con el contenido de `source` sin dejar de publicar `source` (enlace duro o copia)"""
+    temporary = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copy2(source, temporary)
+    os.replace(temporary, target)
+
+def keep_published(path: str):
+    """Conservar el archivo publicado como versión anterior antes de publicar otro encima"""
+    if file_identity(path) is not None:
+        _link_or_copy(path, previous_path(path))
+    elif os.path.exists(previous_path(path)):
+        os.remove(previous_path(path))
+
+def exchange_published(path: str) -> bool:
+    """Volver a publicar la versión anterior y conservar la vigente en su lugar (False si no hay anterior)"""
+    previous = previous_path(path)
+    if file_identity(previous) is None:
+        return False
+    if file_identity(path) is None:
+        os.replace(previous, path)
+        return True
+    current = f"{path}.{os.getpid()}.current"
+    _link_or_copy(path, current)
+    os.replace(previous, path)
+    os.replace(current, previous)
+    return True
+
+class IndexRebuild:
+    """
+    Reconstrucción del índice de búsqueda en segundo plano, sin dejar de servir con la versión vigente:
+    1. anota la posición del change log y construye una versión nueva en paralelo
+    2. le aplica los cambios que llegaron durante la construcción
+    3. verifica que tenga tantos papers como la tabla en ese mismo punto del log y la publica en disco
+       (el archivo anterior queda en `<path>.previous`)
+    4. con el feed retenido aplica lo último y cambia a los lectores de una sola vez (SearchIndex.swap)
+    La versión reemplazada se conserva para volver a ella con `rollback`. La versión nueva usa el analizador
+    (tokenize/fold_text) y la configuración del código desplegado: son del módulo y también los usan las
+    consultas, así que cambiarlos requiere un deploy y esta reconstrucción los aplica sin cortar la búsqueda.
+    """
+
+    def __init__(self, index: SearchIndex):
+        self.index = index
+        self.status = "idle"
+        self.error: Optional[str] = None
+        self.total = 0
+        self.processed = 0
+        self.replayed = 0
+        self.verified_papers: Optional[int] = None
+        self.previous_papers: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.build_seconds = 0.0
+        # Versión reemplazada y posición del log hasta la que está al día
+        self.previous: Optional[SearchIndex] = None
+        self.previous_position = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> Dict:
+        """Lanzar la reconstrucción en un hilo; falla si ya hay una en curso"""
+        with self._lock:
+            if self.running:
+                raise RebuildError("Ya hay una reconstrucción del índice en curso")
+            self.status, self.error = "building", None
+            self.total = self.processed = self.replayed = 0
+            self.verified_papers = self.previous_papers = None
+            self.started_at, self.finished_at = time.time(), None
+            self.build_seconds = 0.0
+            self._thread = threading.Thread(target=self._run, name="search-index-rebuild", daemon=True)
+            self._thread.start()
+        return self.progress()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que termine la reconstrucción en curso (True si terminó)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.running
+
+    def _counted(self, papers: Iterable) -> Iterator:
+        for paper in papers:
+            self.processed += 1
+            yield paper
+
+    def _run(self):
+        sessions = background_sessions()
+        try:
+            fresh = SearchIndex(self.index.max_distance, self.index.min_similarity, self.index.path)
+            with sessions() as db:
+                position = latest_seq(db)
+                self.total = corpus_signature(db)["papers"]
+                started = time.perf_counter()
+                fresh.load(self._counted(read_papers(db)))
+                self.build_seconds = time.perf_counter() - started
+                self.status = "replaying"
+                position, self.replayed = replay_changes(db, position, fresh.apply_changes)
+                self.status = "verifying"
+                position, signature = self._verify(db, fresh, position)
+                if self.index.path:
+                    self.status = "publishing"
+                    keep_published(self.index.path)
+                    fresh.save(self.index.path, signature, log_position(db, position))
+            fresh.prepare_spelling()
+            self._swap(sessions, fresh, position)
+            self.status = "swapped"
+            logger.info(
+                f"Índice de búsqueda reconstruido: {self.verified_papers} papers en {self.build_seconds:.2f}s, "
+                f"{self.replayed} cambios reaplicados"
+            )
+        except Exception as e:
+            self.status, self.error = "failed", str(e)
+            logger.exception("Falló la reconstrucción del índice de búsqueda; se mantiene la versión vigente")
+        finally:
+            self.finished_at = time.time()
+
+    def _verify(self, db: Session, fresh: SearchIndex, position: int) -> Tuple[int, Dict]:
+        """Comparar la cantidad de papers con la tabla leída en la misma posición del log que la versión nueva"""
+        for _ in range(VERIFY_ATTEMPTS):
+            signature = corpus_signature(db)
+            head = latest_seq(db)
+            if head != position:
+                position, replayed = replay_changes(db, position, fresh.apply_changes)
+                self.replayed += replayed
+                continue
+            self.verified_papers = len(fresh.all_ids)
+            if self.verified_papers != signature["papers"]:
+                raise RebuildError(
+                    f"La versión nueva tiene {self.verified_papers} papers y la tabla {signature['papers']}"
+                )
+            return position, signature
+        raise RebuildError("No se pudo verificar la versión nueva: la tabla siguió cambiando")
+
+    def _swap(self, sessions: Callable[[], ContextManager[Session]], fresh: SearchIndex, position: int):
+        with sessions() as db, change_feed.paused(db) as feed_position:
+            # El feed ya aplicó a la versión vigente todo hasta feed_position: la nueva se pone al día igual
+            _, replayed = replay_changes(db, position, fresh.apply_changes, until_seq=feed_position)
+            self.replayed += replayed
+            self.previous_papers = len(self.index.all_ids)
+            self.index.swap(fresh)
+            self.previous, self.previous_position = fresh, feed_position
+            clear_search_cache()
+
+    def rollback(self) -> Dict:
+        """
+        Volver a la versión reemplazada (al día con los cambios posteriores); repetirlo vuelve a la nueva.
+        El archivo anterior se vuelve a publicar, así los demás workers lo adoptan con `refresh` (reaplicando
+        el change log desde su posición)
+        """
+        with self._lock:
+            if self.running:
+                raise RebuildError("Hay una reconstrucción del índice en curso")
+            if self.previous is None:
+                raise RebuildError("No hay una versión anterior del índice")
+            with background_sessions()() as db, change_feed.paused(db) as position:
+                try:
+                    replay_changes(db, self.previous_position, self.previous.apply_changes, until_seq=position)
+                except LookupError as e:
+                    raise RebuildError(str(e))
+                self.index.swap(self.previous)
+                self.previous_position = position
+                clear_search_cache()
+            if self.index.path:
+                if not exchange_published(self.index.path):
+                    logger.warning(f"No hay archivo anterior en {previous_path(self.index.path)}: el rollback solo afecta a este worker")
+                self.index.identity = file_identity(self.index.path)
+            self.status = "rolled_back" if self.status != "rolled_back" else "swapped"
+        return self.progress()
+
+    def progress(self) -> Dict:
+        """Estado, avance y throughput de la última reconstrucción"""
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        building = self.build_seconds or (elapsed if self.status == "building" else 0.0)
+        return {
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "processed": self.processed,
+            "percent": round(100 * self.processed / self.total, 1) if self.total else (100.0 if self.finished_at else 0.0),
+            "papers_per_second": round(self.processed / building, 1) if building else 0.0,
+            "replayed_changes": self.replayed,
+            "verified_papers": self.verified_papers,
+            "previous_papers": self.previous_papers,
+            "elapsed_seconds": round(elapsed, 3),
+            "build_seconds": round(self.build_seconds, 3),
+            "rollback_available": self.previous is not None and not self.running,
+        }
+
+index_rebuilder = IndexRebuild(search_index)
@@ -0,0 +1,190 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import mmap
+import os
+import struct
+import sys
+
+# Formato en disco del índice de búsqueda, pensado para abrirse con mmap:
+#   MAGIC | largo del encabezado (uint32) | encabezado JSON | secciones alineadas a 8 bytes
+# Cada sección es un array empaquetado (ids uint32, citas int32, offsets uint64, bytes UTF-8) que se lee
+# sin copiar con memoryview.cast. Los grupos (posting lists por campo y valores de facetas) guardan las
+# claves ordenadas por bytes con sus offsets y las posting lists como ids uint32 ordenados: buscar un
+# término es una bisección sobre el diccionario y solo toca las páginas que necesita.
+MAGIC = b"PAPIDX01"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+# Año ausente en la columna de años
+NO_YEAR = -(2 ** 31)
+
+class IndexFormatError(ValueError):
+    """Archivo de índice inválido, de otra versión o de otra arquitectura"""
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % ALIGNMENT)
+
+class SnapshotWriter:
+    """Escribe las secciones en un archivo temporal y lo publica con os.replace (atómico)"""
+
+    def __init__(self, path: str, metadata: Dict):
+        self.path = path
+        self.metadata = metadata
+        self.sections: List[Tuple[str, str, bytes]] = []
+
+    def add(self, name: str, typecode: str, values: Iterable):
+        data = values if typecode == "B" and isinstance(values, (bytes, bytearray)) else array(typecode, values).tobytes()
+        self.sections.append((name, typecode, bytes(data)))
+
+    def add_strings(self, name: str, strings: Sequence[str]):
+        """Strings como blob UTF-8 + offsets (uint64, len + 1)"""
+        offsets = [0]
+        blob = bytearray()
+        for value in strings:
+            blob += value.encode("utf-8")
+            offsets.append(len(blob))
+        self.add(f"{name}.offsets", "Q", offsets)
+        self.add(f"{name}.data", "B", blob)
+
+    def add_group(self, name: str, postings: Dict[str, Iterable[int]]):
+        """Diccionario clave -> ids ordenados: claves ordenadas por bytes y posting lists concatenadas"""
+        keys = sorted(postings, key=lambda key: key.encode("utf-8"))
+        self.add_strings(f"{name}.keys", keys)
+        offsets = [0]
+        packed = array("I")
+        for key in keys:
+            packed.extend(sorted(postings[key]))
+            offsets.append(len(packed))
+        self.add(f"{name}.postings.offsets", "Q", offsets)
+        self.add(f"{name}.postings", "I", packed)
+
+    def write(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        layout = {}
+        offset = 0
+        for name, typecode, data in self.sections:
+            layout[name] = [offset, len(data), typecode]
+            offset += len(data) + len(_padding(len(data)))
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "byteorder": sys.byteorder,
+            "metadata": self.metadata,
+            "sections": layout,
+        }).encode("utf-8")
+        prefix = MAGIC + struct.pack("<I", len(header)) + header
+        prefix += _padding(len(prefix))
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(prefix)
+            for _, _, data in self.sections:
+                f.write(data)
+                f.write(_padding(len(data)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+class _Strings(Sequence):
+    """Vista perezosa de strings guardados como offsets + blob (bisectable por bytes)"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, position: int) -> bytes:
+        return bytes(self.data[self.offsets[position]:self.offsets[position + 1]])
+
+    def __getitem__(self, position: int) -> bytes:
+        return self.raw(position)
+
+    def text(self, position: int) -> str:
+        return self.raw(position).decode("utf-8")
+
+class _Group:
+    def __init__(self, keys: _Strings, offsets: memoryview, postings: memoryview):
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+
+    def lookup(self, key: str) -> Optional[memoryview]:
+        encoded = key.encode("utf-8")
+        position = bisect_left(self.keys, encoded)
+        if position == len(self.keys) or self.keys[position] != encoded:
+            return None
+        return self.postings[self.offsets[position]:self.offsets[position + 1]]
+
+    def items(self) -> Iterator[Tuple[str, memoryview]]:
+        for position in range(len(self.keys)):
+            yield self.keys.text(position), self.postings[self.offsets[position]:self.offsets[position + 1]]
+
+class IndexSnapshot:
+    """Índice persistido abierto con mmap (solo lectura; las páginas las comparte el page cache)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(f.fileno())
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        buffer = memoryview(self.mmap)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise IndexFormatError(f"{path} no es un índice de búsqueda")
+        (header_size,) = struct.unpack("<I", buffer[len(MAGIC):len(MAGIC) + 4])
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(buffer[start:start + header_size]))
+        if header["version"] != FORMAT_VERSION or header["byteorder"] != sys.byteorder:
+            raise IndexFormatError(f"{path}: versión o arquitectura incompatible")
+        base = start + header_size
+        base += -base % ALIGNMENT
+        self.metadata: Dict = header["metadata"]
+        self._sections: Dict[str, memoryview] = {}
+        for name, (offset, size, typecode) in header["sections"].items():
+            view = buffer[base + offset:base + offset + size]
+            self._sections[name] = view if typecode == "B" else view.cast(typecode)
+
+        self.ids = self._sections["ids"]
+        self.years = self._sections["years"]
+        self.citations = self._sections["citations"]
+        self.texts = {
+            field: _Strings(self._sections[f"text.{field}.offsets"], self._sections[f"text.{field}.data"])
+            for field in self.metadata["text_fields"]
+        }
+        self.groups = {
+            name: _Group(
+                _Strings(self._sections[f"{name}.keys.offsets"], self._sections[f"{name}.keys.data"]),
+                self._sections[f"{name}.postings.offsets"],
+                self._sections[f"{name}.postings"],
+            )
+            for name in self.metadata["groups"]
+        }
+        self.vocabulary = _Strings(self._sections["vocabulary.offsets"], self._sections["vocabulary.data"])
+        self.vocabulary_counts = self._sections["vocabulary.counts"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, paper_id: int) -> Optional[int]:
+        """Fila del paper (los ids están ordenados)"""
+        position = bisect_left(self.ids, paper_id)
+        if position < len(self.ids) and self.ids[position] == paper_id:
+            return position
+        return None
+
+    def lookup(self, group: str, key: str) -> Optional[memoryview]:
+        return self.groups[group].lookup(key)
+
+    def section(self, name: str) -> memoryview:
+        return self._sections[name]
+
+def file_identity(path: str) -> Optional[Tuple[int, int, int]]:
+    """(inodo, mtime, tamaño) del archivo publicado; cambia con cada os.replace"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
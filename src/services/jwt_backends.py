@@ -0,0 +1,81 @@
+from jose import JWTError, jwk, jwt as jose_jwt
+from ..config import settings
+from typing import Optional
+
+# PyJWT es opcional: backend más rápido y con soporte EdDSA (requiere cryptography)
+try:
+    import jwt as pyjwt
+except ImportError:  # pragma: no cover - depende del entorno
+    pyjwt = None
+
+ASYMMETRIC_PREFIXES = ("RS", "PS", "ES", "EdDSA")
+
+class TokenError(Exception):
+    """Token inválido, expirado o con firma incorrecta"""
+
+def _is_asymmetric(algorithm: str) -> bool:
+    return algorithm.startswith(ASYMMETRIC_PREFIXES)
+
+def _signing_material(algorithm: str):
+    """Clave privada (o secreto) para firmar y clave pública (o secreto) para verificar"""
+    if _is_asymmetric(algorithm):
+        if not settings.jwt_private_key or not settings.jwt_public_key:
+            raise ValueError(f"{algorithm} requiere JWT_PRIVATE_KEY y JWT_PUBLIC_KEY (PEM)")
+        return settings.jwt_private_key, settings.jwt_public_key
+    return settings.jwt_secret_key, settings.jwt_secret_key
+
+class JoseBackend:
+    """Backend python-jose con las claves construidas una sola vez"""
+    name = "jose"
+
+    def __init__(self, algorithm: str):
+        if algorithm == "EdDSA":
+            raise ValueError("python-jose no soporta EdDSA; usar JWT_BACKEND=pyjwt")
+        self.algorithm = algorithm
+        signing, verifying = _signing_material(algorithm)
+        self._signing_key = jwk.construct(signing, algorithm)
+        self._verifying_key = jwk.construct(verifying, algorithm)
+
+    def encode(self, claims: dict) -> str:
+        return jose_jwt.encode(claims, self._signing_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jose_jwt.decode(token, self._verifying_key, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise TokenError(str(e))
+
+class PyJWTBackend:
+    """Backend PyJWT: HS256 y EdDSA con claves precargadas"""
+    name = "pyjwt"
+
+    def __init__(self, algorithm: str):
+        if pyjwt is None:
+            raise ValueError("JWT_BACKEND=pyjwt requiere instalar PyJWT")
+        self.algorithm = algorithm
+        signing, verifying = _signing_material(algorithm)
+        if _is_asymmetric(algorithm):
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+            signing = load_pem_private_key(signing.encode(), password=None)
+            verifying = load_pem_public_key(verifying.encode())
+        self._signing_key = signing
+        self._verifying_key = verifying
+        self._algorithms = [algorithm]
+
+    def encode(self, claims: dict) -> str:
+        return pyjwt.encode(claims, self._signing_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return pyjwt.decode(token, self._verifying_key, algorithms=self._algorithms)
+        except pyjwt.PyJWTError as e:
+            raise TokenError(str(e))
+
+BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend}
+
+def create_backend(name: Optional[str] = None, algorithm: Optional[str] = None):
+    """Instanciar el backend configurado (JWT_BACKEND / JWT_ALGORITHM)"""
+    name = (name or settings.jwt_backend).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Backend JWT desconocido: {name}")
+    return BACKENDS[name](algorithm or settings.jwt_algorithm)
@@ -1,16 +1,49 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Query, Session, load_only
 from ..database.models import Paper as DBPaper, SearchLog
-from ..models.schemas import PaperCreate, PaperUpdate, SearchQuery
+from ..database.normalization import fold_text
+from .change_feed import change_feed
+from ..models.schemas import PaperCreate, PaperUpdate, SearchQuery, Paper, PaperPartial
 from typing import List, Optional
 import json
 
+# Campos disponibles para proyección (fields=); "id" siempre se incluye
+PAPER_FIELDS = (
+    "id", "title", "abstract", "authors", "publication_year", "doi", "pdf_url",
+    "keywords", "citation_count", "created_at", "updated_at", "creator_id",
+)
+JSON_FIELDS = ("authors", "keywords")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Convertir el parámetro fields=a,b,c en una lista validada de columnas"""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PAPER_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos no soportados: {', '.join(unknown)}")
+    # Mantener el orden del schema y evitar duplicados
+    return [field for field in PAPER_FIELDS if field == "id" or field in requested]
+
+def _project(query: Query, fields: Optional[List[str]]) -> Query:
+    """Restringir las columnas cargadas por la consulta (SELECT solo de los campos pedidos)"""
+    if not fields:
+        return query
+    return query.options(load_only(*[getattr(DBPaper, field) for field in fields]))
+
 def get_paper_by_doi(db: Session, doi: str) -> Optional[DBPaper]:
     """Obtener paper por DOI"""
     return db.query(DBPaper).filter(DBPaper.doi == doi).first()
 
-def get_papers(db: Session, skip: int = 0, limit: int = 100) -> List[DBPaper]:
+def get_papers(db: Session, skip: int = 0, limit: int = 100, fields: Optional[List[str]] = None) -> List[DBPaper]:
     """Obtener lista de papers"""
-    return db.query(DBPaper).offset(skip).limit(limit).all()
+    return _project(db.query(DBPaper), fields).offset(skip).limit(limit).all()
+
+def get_papers_by_ids(db: Session, paper_ids: List[int], fields: Optional[List[str]] = None) -> List[DBPaper]:
+    """Obtener papers por ID conservando el orden recibido"""
+    if not paper_ids:
+        return []
+    papers = {paper.id: paper for paper in _project(db.query(DBPaper), fields).filter(DBPaper.id.in_(paper_ids))}
+    return [papers[paper_id] for paper_id in paper_ids if paper_id in papers]
 
 def get_paper_by_id(db: Session, paper_id: int) -> Optional[DBPaper]:
     """Obtener paper por ID"""
@@ -39,6 +72,8 @@ def create_paper(db: Session, paper: PaperCreate, creator_id: Optional[int] = No
     db.add(db_paper)
     db.commit()
     db.refresh(db_paper)
+    # El trigger ya registró el cambio; aplicarlo enseguida a los índices y al cache de este proceso
+    change_feed.poll(db)
     return db_paper
 
 def update_paper(db: Session, paper_id: int, paper_update: PaperUpdate) -> Optional[DBPaper]:
@@ -60,6 +95,8 @@ def update_paper(db: Session, paper_id: int, paper_update: PaperUpdate) -> Optio
     
     db.commit()
     db.refresh(db_paper)
+    # El trigger ya registró el cambio; aplicarlo enseguida a los índices y al cache de este proceso
+    change_feed.poll(db)
     return db_paper
 
 def delete_paper(db: Session, paper_id: int) -> bool:
@@ -70,20 +107,27 @@ def delete_paper(db: Session, paper_id: int) -> bool:
     
     db.delete(db_paper)
     db.commit()
+    change_feed.poll(db)
     return True
 
-def search_papers(db: Session, query: str, skip: int = 0, limit: int = 10) -> List[DBPaper]:
-    """Buscar papers por título o contenido"""
-    return db.query(DBPaper).filter(
-        DBPaper.title.contains(query)
+def search_papers(db: Session, query: str, skip: int = 0, limit: int = 10, fields: Optional[List[str]] = None) -> List[DBPaper]:
+    """Buscar papers por título o contenido (sin distinguir acentos ni mayúsculas)"""
+    return _project(db.query(DBPaper), fields).filter(
+        DBPaper.title_norm.contains(fold_text(query), autoescape=True)
     ).offset(skip).limit(limit).all()
 
-def search_papers_by_author(db: Session, author_query: str, skip: int = 0, limit: int = 10) -> List[DBPaper]:
-    """Buscar papers por autor"""
-    return db.query(DBPaper).filter(
-        DBPaper.authors.contains(author_query)
+def search_papers_by_author(db: Session, author_query: str, skip: int = 0, limit: int = 10, fields: Optional[List[str]] = None) -> List[DBPaper]:
+    """Buscar papers por autor (sin distinguir acentos ni mayúsculas)"""
+    return _project(db.query(DBPaper), fields).filter(
+        DBPaper.authors_norm.contains(fold_text(author_query), autoescape=True)
     ).offset(skip).limit(limit).all()
 
+def search_paper_ids(db: Session, query: str, by_author: bool = False) -> List[int]:
+    """Ids de todas las coincidencias de la búsqueda simple (para calcular facetas)"""
+    column = DBPaper.authors_norm if by_author else DBPaper.title_norm
+    rows = db.query(DBPaper.id).filter(column.contains(fold_text(query), autoescape=True))
+    return [paper_id for paper_id, in rows]
+
 def log_search(db: Session, query: str, results_count: int, search_type: str = "papers", user_id: Optional[int] = None):
     """Registrar búsqueda en logs"""
     search_log = SearchLog(
@@ -95,12 +139,22 @@ def log_search(db: Session, query: str, results_count: int, search_type: str = "
     db.add(search_log)
     db.commit()
 
-def get_popular_papers(db: Session, limit: int = 10) -> List[DBPaper]:
+def get_popular_papers(db: Session, limit: int = 10, fields: Optional[List[str]] = None) -> List[DBPaper]:
     """Obtener papers más populares por citation_count"""
-    return db.query(DBPaper).order_by(DBPaper.citation_count.desc()).limit(limit).all()
+    return _project(db.query(DBPaper), fields).order_by(DBPaper.citation_count.desc()).limit(limit).all()
 
-def convert_db_paper_to_schema(db_paper: DBPaper):
+def convert_db_paper_to_schema(db_paper: DBPaper, fields: Optional[List[str]] = None):
     """Convertir DBPaper a schema Paper con parsing de JSON"""
+    if fields:
+        # Solo se accede a las columnas cargadas para no disparar lazy loads
+        paper_dict = {}
+        for field in fields:
+            value = getattr(db_paper, field)
+            if field in JSON_FIELDS:
+                value = json.loads(value) if value else []
+            paper_dict[field] = value
+        return paper_dict
+    
     authors = json.loads(db_paper.authors) if db_paper.authors else []
     keywords = json.loads(db_paper.keywords) if db_paper.keywords else []
     
@@ -118,3 +172,8 @@ def convert_db_paper_to_schema(db_paper: DBPaper):
         "updated_at": db_paper.updated_at,
         "creator_id": db_paper.creator_id
     }
+
+def papers_to_schemas(db_papers: List[DBPaper], fields: Optional[List[str]] = None) -> list:
+    """Convertir papers de la BD a Paper, o a PaperPartial si hay proyección"""
+    schema = PaperPartial if fields else Paper
+    return [schema(**convert_db_paper_to_schema(db_paper, fields)) for db_paper in db_papers]
@@ -0,0 +1,328 @@
+from ..config import settings
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence, Tuple
+import base64
+import hashlib
+import hmac
+import logging
+import math
+import os
+import time
+
+import bcrypt
+
+# argon2-cffi es opcional: el esquema argon2id solo se registra si está instalado
+try:
+    from argon2 import PasswordHasher as Argon2PasswordHasher
+    from argon2 import exceptions as argon2_exceptions
+    from argon2 import extract_parameters as argon2_extract_parameters
+except ImportError:  # pragma: no cover - depende del entorno
+    Argon2PasswordHasher = None
+
+logger = logging.getLogger(__name__)
+
+CALIBRATION_PASSWORD = "calibration-password"
+
+class PasswordHasher(ABC):
+    """Interfaz de un esquema de hashing con costo ajustable"""
+    scheme = ""
+    min_cost = 1
+    max_cost = 1
+
+    def __init__(self, cost: int):
+        self.cost = cost
+        # Costo configurado: la calibración solo puede subirlo
+        self.configured_cost = cost
+
+    @property
+    def floor_cost(self) -> int:
+        return max(self.min_cost, self.configured_cost)
+
+    @abstractmethod
+    def identify(self, hashed: str) -> bool:
+        """Si el hash fue generado por este esquema"""
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Hashear con el costo vigente"""
+
+    @abstractmethod
+    def verify(self, password: str, hashed: str) -> bool:
+        """Verificar una password contra un hash de este esquema"""
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        """Costo con el que se generó el hash (None si no aplica)"""
+        return None
+
+    def needs_rehash(self, hashed: str) -> bool:
+        # Solo se sube el costo: una calibración con ruido no debe degradar hashes existentes
+        cost = self.cost_of(hashed)
+        return cost is not None and cost < self.cost
+
+    def time_verify_ms(self, cost: int) -> float:
+        """Medir el tiempo de una verificación con el costo indicado"""
+        current = self.cost
+        self.cost = cost
+        try:
+            hashed = self.hash(CALIBRATION_PASSWORD)
+            start = time.perf_counter()
+            self.verify(CALIBRATION_PASSWORD, hashed)
+            return (time.perf_counter() - start) * 1000
+        finally:
+            self.cost = current
+
+    @abstractmethod
+    def calibrate(self, target_ms: float) -> int:
+        """Elegir el mayor costo (desde el configurado) cuyo tiempo de verificación no supere target_ms"""
+
+class BcryptHasher(PasswordHasher):
+    """bcrypt: el costo es log2 de las rondas (cada +1 duplica el tiempo)"""
+    scheme = "bcrypt"
+    min_cost = 10
+    max_cost = 16
+
+    @staticmethod
+    def _encode(password: str) -> bytes:
+        # bcrypt solo usa los primeros 72 bytes
+        return password.encode("utf-8")[:72]
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(self._encode(password), bcrypt.gensalt(rounds=self.cost)).decode("ascii")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(self._encode(password), hashed.encode("ascii"))
+        except ValueError:
+            return False
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        try:
+            return int(hashed.split("$")[2])
+        except (IndexError, ValueError):
+            return None
+
+    def calibrate(self, target_ms: float) -> int:
+        floor = self.floor_cost
+        elapsed = self.time_verify_ms(floor)
+        extra = math.floor(math.log2(target_ms / elapsed)) if elapsed < target_ms else 0
+        return max(floor, min(self.max_cost, floor + extra))
+
+class Pbkdf2Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256 con salt aleatorio por hash (formato $pbkdf2-sha256$iter$salt$hash)"""
+    scheme = "pbkdf2_sha256"
+    prefix = "$pbkdf2-sha256$"
+    min_cost = 100_000
+    max_cost = 10_000_000
+
+    @staticmethod
+    def _b64(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii").rstrip("=").replace("+", ".")
+
+    @staticmethod
+    def _unb64(data: str) -> bytes:
+        data = data.replace(".", "+")
+        return base64.b64decode(data + "=" * (-len(data) % 4))
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(self.prefix)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.cost)
+        return f"{self.prefix}{self.cost}${self._b64(salt)}${self._b64(digest)}"
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            iterations, salt, expected = hashed[len(self.prefix):].split("$")
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), self._unb64(salt), int(iterations))
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(digest, self._unb64(expected))
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        try:
+            return int(hashed[len(self.prefix):].split("$")[0])
+        except ValueError:
+            return None
+
+    def calibrate(self, target_ms: float) -> int:
+        floor = self.floor_cost
+        elapsed = self.time_verify_ms(floor)
+        iterations = int(floor * target_ms / elapsed) // 1000 * 1000
+        return max(floor, min(self.max_cost, iterations))
+
+class Argon2idHasher(PasswordHasher):
+    """argon2id (argon2-cffi): el costo es time_cost con memoria y paralelismo fijos"""
+    scheme = "argon2id"
+    min_cost = 2
+    max_cost = 20
+
+    def _hasher(self):
+        return Argon2PasswordHasher(
+            time_cost=self.cost,
+            memory_cost=settings.argon2_memory_kib,
+            parallelism=settings.argon2_parallelism,
+        )
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith("$argon2id$")
+
+    def hash(self, password: str) -> str:
+        return self._hasher().hash(password)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        try:
+            return self._hasher().verify(hashed, password)
+        except argon2_exceptions.VerificationError:
+            return False
+        except argon2_exceptions.InvalidHash:
+            return False
+
+    def cost_of(self, hashed: str) -> Optional[int]:
+        try:
+            return argon2_extract_parameters(hashed).time_cost
+        except argon2_exceptions.InvalidHash:
+            return None
+
+    def needs_rehash(self, hashed: str) -> bool:
+        try:
+            parameters = argon2_extract_parameters(hashed)
+        except argon2_exceptions.InvalidHash:
+            return True
+        return parameters.time_cost < self.cost or parameters.memory_cost < settings.argon2_memory_kib
+
+    def calibrate(self, target_ms: float) -> int:
+        floor = self.floor_cost
+        elapsed = self.time_verify_ms(floor)
+        time_cost = int(floor * target_ms / elapsed)
+        return max(floor, min(self.max_cost, time_cost))
+
+class LegacyHexHasher(PasswordHasher):
+    """
+    Hashes hexadecimales de versiones anteriores (solo verificación):
+    SHA-256 sin salt y PBKDF2 con el secreto JWT como salt. Siempre requieren rehash.
+    """
+    scheme = "legacy_hex"
+
+    def __init__(self):
+        super().__init__(cost=0)
+
+    def identify(self, hashed: str) -> bool:
+        if len(hashed) != 64:
+            return False
+        try:
+            int(hashed, 16)
+        except ValueError:
+            return False
+        return True
+
+    def hash(self, password: str) -> str:
+        raise ValueError("El esquema legacy_hex no se usa para generar hashes nuevos")
+
+    def verify(self, password: str, hashed: str) -> bool:
+        password_bytes = password.encode("utf-8")
+        candidates = (
+            hashlib.sha256(password_bytes).hexdigest(),
+            hashlib.pbkdf2_hmac("sha256", password_bytes, settings.jwt_secret_key.encode(), 100000).hex(),
+        )
+        return any(hmac.compare_digest(candidate, hashed) for candidate in candidates)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return True
+
+    def calibrate(self, target_ms: float) -> int:
+        return self.cost
+
+class HasherRegistry:
+    """Registro de esquemas: hashea con el esquema por defecto y verifica con el que corresponda"""
+
+    def __init__(self, default_scheme: str):
+        self._hashers: Dict[str, PasswordHasher] = {}
+        self.default_scheme = default_scheme
+        self.calibrated = False
+
+    def register(self, hasher: PasswordHasher):
+        self._hashers[hasher.scheme] = hasher
+
+    def schemes(self) -> List[str]:
+        return list(self._hashers)
+
+    def get(self, scheme: str) -> PasswordHasher:
+        return self._hashers[scheme]
+
+    @property
+    def default(self) -> PasswordHasher:
+        return self._hashers[self.default_scheme]
+
+    def identify(self, hashed: str) -> Optional[PasswordHasher]:
+        for hasher in self._hashers.values():
+            if hasher.identify(hashed):
+                return hasher
+        return None
+
+    def hash(self, password: str) -> str:
+        return self.default.hash(password)
+
+    def verify(self, password: str, hashed: Optional[str]) -> bool:
+        return self.verify_and_update(password, hashed)[0]
+
+    def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Verificar y, si el hash usa otro esquema o un costo menor, retornar uno nuevo"""
+        if not hashed:
+            return False, None
+        hasher = self.identify(hashed)
+        if hasher is None or not hasher.verify(password, hashed):
+            return False, None
+        if hasher is not self.default or hasher.needs_rehash(hashed):
+            return True, self.hash(password)
+        return True, None
+
+    def hash_many(self, passwords: Sequence[str], executor: Optional[Executor] = None, chunks: int = 1) -> List[str]:
+        """Hashear varias passwords, repartidas en `chunks` tareas del executor si se indica"""
+        if executor is None or len(passwords) < 2:
+            return [self.hash(password) for password in passwords]
+        hasher = self.default
+        size = max(1, -(-len(passwords) // max(1, chunks)))
+        tasks = [
+            (hasher.scheme, hasher.cost, list(passwords[i:i + size]))
+            for i in range(0, len(passwords), size)
+        ]
+        hashed: List[str] = []
+        for chunk in executor.map(_hash_chunk, tasks):
+            hashed.extend(chunk)
+        return hashed
+
+    def calibrate(self, target_ms: float) -> int:
+        """Ajustar el costo del esquema por defecto al tiempo objetivo en este host"""
+        hasher = self.default
+        cost = hasher.calibrate(target_ms)
+        hasher.cost = cost
+        self.calibrated = True
+        logger.info(f"Hasher {hasher.scheme} calibrado: costo={cost} (objetivo {target_ms:.0f}ms)")
+        return cost
+
+def create_registry() -> HasherRegistry:
+    """Crear el registro con los esquemas disponibles según la configuración"""
+    registry = HasherRegistry(settings.password_hash_scheme)
+    registry.register(BcryptHasher(settings.bcrypt_rounds))
+    registry.register(Pbkdf2Hasher(settings.pbkdf2_iterations))
+    if Argon2PasswordHasher is not None:
+        registry.register(Argon2idHasher(settings.argon2_time_cost))
+    registry.register(LegacyHexHasher())
+    if registry.default_scheme not in registry.schemes():
+        logger.warning(f"Esquema {registry.default_scheme} no disponible, usando bcrypt")
+        registry.default_scheme = "bcrypt"
+    return registry
+
+password_hashers = create_registry()
+
+def _hash_chunk(task: Tuple[str, int, List[str]]) -> List[str]:
+    """Tarea para un pool de procesos: el esquema y el costo viajan con la tarea"""
+    scheme, cost, passwords = task
+    hasher = password_hashers.get(scheme)
+    hasher.cost = cost
+    return [hasher.hash(password) for password in passwords]
@@ -0,0 +1,379 @@
+from ..database.normalization import fold_text
+from ..config import settings
+from .bitmaps import Bitmap, union_all
+from .search_index import FIELDS, SearchIndex, tokenize
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+
+# Campos sin calificador: título y keywords
+DEFAULT_FIELDS = ("title", "keyword")
+QUERY_FIELDS = set(FIELDS) | {"year", "cited"}
+OPERATORS = {"AND", "OR", "NOT"}
+
+# Niveles de paréntesis y NOT anidados: el parser y la ejecución del plan son recursivos
+MAX_QUERY_DEPTH = 32
+
+TOKEN_PATTERN = re.compile(
+    r'\s*(?:(?P<lparen>\()|(?P<rparen>\))|(?P<neg>-)(?=[^\s-])|'
+    r'(?:(?P<field>[A-Za-z]+):)?(?:"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))|(?P<error>"))'
+)
+RANGE_PATTERN = re.compile(r"^(?P<low>\d+)?\.\.(?P<high>\d+)?$")
+COMPARISON_PATTERN = re.compile(r"^(?P<op>>=|<=|>|<|=)?(?P<value>\d+)$")
+STRUCTURED_HINT = re.compile(r'"|\(|\)|(^|\s)-\S|\b(AND|OR|NOT)\b|\b(title|author|keyword|year|cited):')
+
+class QuerySyntaxError(ValueError):
+    """Consulta con sintaxis inválida (se responde 400)"""
+
+def is_structured_query(query: str) -> bool:
+    """Heurística para syntax=auto: operadores, comillas, paréntesis o calificadores de campo"""
+    return bool(STRUCTURED_HINT.search(query))
+
+# Nodos del plan
+
+class Node(ABC):
+    """Nodo del plan de una consulta"""
+
+    @abstractmethod
+    def estimate(self, index: SearchIndex) -> int:
+        """Cardinalidad estimada (para ordenar las intersecciones)"""
+
+    @abstractmethod
+    def evaluate(self, index: SearchIndex) -> Bitmap:
+        """Bitmap de los papers que cumplen el nodo"""
+
+    @abstractmethod
+    def describe(self, index: SearchIndex) -> Dict:
+        """Plan del nodo para /search/explain"""
+
+class TermNode(Node):
+    def __init__(self, fields: Tuple[str, ...], term: str):
+        self.fields = fields
+        self.term = term
+
+    def estimate(self, index):
+        return sum(len(index.term_bitmap(field, self.term)) for field in self.fields)
+
+    def evaluate(self, index):
+        return union_all(index.term_bitmap(field, self.term) for field in self.fields)
+
+    def describe(self, index):
+        return {"op": "term", "fields": list(self.fields), "term": self.term, "estimate": self.estimate(index)}
+
+class PhraseNode(Node):
+    """Frase: intersección de los términos y verificación sobre el texto normalizado guardado"""
+
+    def __init__(self, fields: Tuple[str, ...], phrase: str):
+        self.fields = fields
+        self.phrase = phrase
+        self.terms = [TermNode(fields, term) for term in tokenize(phrase)]
+
+    def estimate(self, index):
+        return min(term.estimate(index) for term in self.terms)
+
+    def evaluate(self, index):
+        candidates = _intersect(self.terms, index)
+        return Bitmap.from_ids(
+            paper_id for paper_id in candidates
+            if any(self.phrase in index.paper(paper_id).texts[field] for field in self.fields)
+        )
+
+    def describe(self, index):
+        return {"op": "phrase", "fields": list(self.fields), "phrase": self.phrase, "estimate": self.estimate(index)}
+
+class RangeNode(Node):
+    """year:2020..2024 o cited:>50 (extremos inclusivos, None = abierto)"""
+
+    def __init__(self, field: str, low: Optional[int], high: Optional[int]):
+        self.field = field
+        self.low = low
+        self.high = high
+
+    def estimate(self, index):
+        if self.field == "year":
+            return sum(len(bitmap) for bitmap in index.year_range(self.low, self.high))
+        return index.citation_estimate(self.low, self.high)
+
+    def evaluate(self, index):
+        if self.field == "year":
+            return union_all(index.year_range(self.low, self.high))
+        return Bitmap.from_ids(index.citation_ids(self.low, self.high))
+
+    def describe(self, index):
+        return {"op": "range", "field": self.field, "low": self.low, "high": self.high, "estimate": self.estimate(index)}
+
+class NotNode(Node):
+    def __init__(self, child: Node):
+        self.child = child
+
+    def estimate(self, index):
+        return len(index.all_ids) - self.child.estimate(index)
+
+    def evaluate(self, index):
+        return index.all_ids - self.child.evaluate(index)
+
+    def describe(self, index):
+        return {"op": "not", "child": self.child.describe(index)}
+
+class AndNode(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+
+    def _split(self) -> Tuple[List[Node], List[Node]]:
+        positives = [child for child in self.children if not isinstance(child, NotNode)]
+        negatives = [child.child for child in self.children if isinstance(child, NotNode)]
+        return positives, negatives
+
+    def estimate(self, index):
+        positives, _ = self._split()
+        if not positives:
+            return len(index.all_ids)
+        return min(child.estimate(index) for child in positives)
+
+    def evaluate(self, index):
+        positives, negatives = self._split()
+        result = _intersect(positives, index) if positives else index.all_ids
+        for child in negatives:
+            if not result:
+                break
+            result = result - child.evaluate(index)
+        return result
+
+    def describe(self, index):
+        positives, negatives = self._split()
+        ordered = sorted(positives, key=lambda child: child.estimate(index))
+        return {
+            "op": "and",
+            "estimate": self.estimate(index),
+            "children": [child.describe(index) for child in ordered],
+            "exclude": [child.describe(index) for child in negatives],
+        }
+
+class OrNode(Node):
+    def __init__(self, children: List[Node]):
+        self.children = children
+
+    def estimate(self, index):
+        return min(len(index.all_ids), sum(child.estimate(index) for child in self.children))
+
+    def evaluate(self, index):
+        return union_all(child.evaluate(index) for child in self.children)
+
+    def describe(self, index):
+        return {"op": "or", "estimate": self.estimate(index), "children": [child.describe(index) for child in self.children]}
+
+def _intersect(nodes: List[Node], index: SearchIndex) -> Bitmap:
+    """Intersectar empezando por el índice más selectivo y cortar en cuanto queda vacío"""
+    ordered = sorted(nodes, key=lambda node: node.estimate(index))
+    result = ordered[0].evaluate(index)
+    for node in ordered[1:]:
+        if not result:
+            break
+        result = result & node.evaluate(index)
+    return result
+
+# Parser
+
+def _lex(query: str) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """Tokens (tipo, campo, valor): lparen, rparen, neg, op, phrase, word"""
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None or match.end() == position:
+            raise QuerySyntaxError(f"Carácter inesperado en la posición {position}")
+        position = match.end()
+        if match.group("error"):
+            raise QuerySyntaxError("Comillas sin cerrar")
+        if match.group("lparen"):
+            tokens.append(("lparen", None, None))
+        elif match.group("rparen"):
+            tokens.append(("rparen", None, None))
+        elif match.group("neg"):
+            tokens.append(("neg", None, None))
+        else:
+            field = match.group("field")
+            phrase = match.group("phrase")
+            word = match.group("word")
+            if field and field.lower() not in QUERY_FIELDS:
+                # No es un calificador conocido (ej. "c++:"): se trata como texto
+                word = f"{field}:{word if word is not None else phrase}"
+                field, phrase = None, None
+            if field is None and phrase is None and word in OPERATORS:
+                tokens.append(("op", None, word))
+            elif phrase is not None:
+                tokens.append(("phrase", field and field.lower(), phrase))
+            else:
+                tokens.append(("word", field and field.lower(), word))
+    return tokens
+
+class _Parser:
+    """
+    query   := or
+    or      := and ("OR" and)*
+    and     := unary (["AND"] unary)*
+    unary   := ("NOT" | "-") unary | "(" or ")" | [campo:] (palabra | "frase" | rango)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QuerySyntaxError("Consulta vacía")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QuerySyntaxError("Paréntesis de cierre sin abrir")
+        return node
+
+    def nested(self, parse) -> Optional[Node]:
+        self.depth += 1
+        if self.depth > MAX_QUERY_DEPTH:
+            raise QuerySyntaxError(f"Más de {MAX_QUERY_DEPTH} niveles de paréntesis o NOT anidados")
+        try:
+            return parse()
+        finally:
+            self.depth -= 1
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self.peek() == ("op", None, "OR"):
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else OrNode(children)
+
+    def parse_and(self) -> Node:
+        children = [self.parse_unary()]
+        while True:
+            token = self.peek()
+            if token is None or token[0] == "rparen" or token == ("op", None, "OR"):
+                break
+            if token == ("op", None, "AND"):
+                self.take()
+            children.append(self.parse_unary())
+        children = [child for child in children if child is not None]
+        if not children:
+            raise QuerySyntaxError("La consulta no contiene términos")
+        return children[0] if len(children) == 1 else AndNode(children)
+
+    def parse_unary(self) -> Optional[Node]:
+        token = self.take()
+        if token is None:
+            raise QuerySyntaxError("Consulta incompleta")
+        kind, field, value = token
+        if kind in ("neg", "op") and (kind == "neg" or value == "NOT"):
+            child = self.nested(self.parse_unary)
+            if child is None:
+                raise QuerySyntaxError("NOT sin término")
+            return NotNode(child)
+        if kind == "op":
+            raise QuerySyntaxError(f"Operador {value} fuera de lugar")
+        if kind == "lparen":
+            node = self.nested(self.parse_or)
+            if self.take() != ("rparen", None, None):
+                raise QuerySyntaxError("Falta el paréntesis de cierre")
+            return node
+        if kind == "rparen":
+            raise QuerySyntaxError("Paréntesis de cierre sin abrir")
+        return _leaf(field, value, kind == "phrase")
+
+def _parse_bound(field: str, value: str) -> Tuple[Optional[int], Optional[int]]:
+    match = RANGE_PATTERN.match(value)
+    if match and (match.group("low") or match.group("high")):
+        low = int(match.group("low")) if match.group("low") else None
+        high = int(match.group("high")) if match.group("high") else None
+        return low, high
+    match = COMPARISON_PATTERN.match(value)
+    if match is None:
+        raise QuerySyntaxError(f"Valor inválido para {field}: {value} (usar N, a..b, >N, >=N, <N o <=N)")
+    number = int(match.group("value"))
+    op = match.group("op") or "="
+    return {
+        "=": (number, number), ">": (number + 1, None), ">=": (number, None),
+        "<": (None, number - 1), "<=": (None, number),
+    }[op]
+
+def _leaf(field: Optional[str], value: str, is_phrase: bool) -> Optional[Node]:
+    if field in ("year", "cited"):
+        return RangeNode(field, *_parse_bound(field, value))
+    fields = (field,) if field else DEFAULT_FIELDS
+    folded = fold_text(value)
+    terms = tokenize(folded)
+    if not terms:
+        return None
+    if len(terms) == 1 and not is_phrase:
+        return TermNode(fields, terms[0])
+    # Una palabra con separadores ("state-of-the-art") se trata como frase
+    return PhraseNode(fields, folded)
+
+def parse_query(query: str) -> Node:
+    """Parsear la consulta a un árbol de plan"""
+    if len(query) > settings.query_max_length:
+        raise QuerySyntaxError(f"La consulta supera los {settings.query_max_length} caracteres")
+    return _Parser(_lex(query)).parse()
+
+def normalize_query(query: str) -> str:
+    """Clave de cache del plan: espacios colapsados (los operadores distinguen mayúsculas)"""
+    return " ".join(query.split())
+
+class QueryPlanCache:
+    """Planes parseados por consulta normalizada (LRU); el orden de intersección se decide al ejecutar"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._plans: "OrderedDict[str, Node]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Node:
+        key = normalize_query(query)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+        plan = parse_query(key)
+        with self._lock:
+            self.misses += 1
+            self._plans[key] = plan
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+plan_cache = QueryPlanCache(settings.query_plan_cache_size)
+
+def match_query(index: SearchIndex, query: str) -> Bitmap:
+    """Bitmap con todas las coincidencias (el llamador sostiene index.lock)"""
+    return plan_cache.get(query).evaluate(index)
+
+def execute_query(index: SearchIndex, query: str, offset: int = 0, limit: int = 10) -> Tuple[int, List[int]]:
+    """Ejecutar la consulta sobre el índice: (total de coincidencias, ids de la página)"""
+    plan = plan_cache.get(query)
+    with index.lock:
+        matches = plan.evaluate(index)
+        return len(matches), index.rank(matches, offset, limit)
+
+def explain_query(index: SearchIndex, query: str) -> Dict:
+    """Plan compilado con las estimaciones de cardinalidad de cada nodo"""
+    plan = plan_cache.get(query)
+    with index.lock:
+        return plan.describe(index)
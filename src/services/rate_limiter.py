@@ -0,0 +1,222 @@
+from ..config import settings
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+class TooManyRequests(Exception):
+    """Se agotaron los tokens del bucket; retry_after en segundos"""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Límite de requests excedido ({scope})")
+        self.scope = scope
+        self.retry_after = retry_after
+
+class ServerBusy(Exception):
+    """No hay capacidad para más operaciones de hashing en curso"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Servidor ocupado")
+        self.retry_after = retry_after
+
+def retry_after_header(seconds: float) -> dict:
+    """Header Retry-After en segundos enteros (mínimo 1)"""
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+# Bucket a consumir: (clave, capacidad, tokens por segundo)
+Bucket = Tuple[str, float, float]
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+def _take_all(levels: List[float], buckets: Sequence[Bucket]) -> Tuple[Optional[int], float, List[float]]:
+    """
+    Consumir un token de cada bucket solo si todos tienen uno: (índice del primer bucket agotado o None,
+    segundos hasta su próximo token, tokens restantes); si alguno está agotado no se descuenta ninguno
+    """
+    for index, (tokens, (_, _, rate)) in enumerate(zip(levels, buckets)):
+        if tokens < 1:
+            return index, (1 - tokens) / rate, levels
+    return None, 0.0, [tokens - 1 for tokens in levels]
+
+class MemoryBucketStore:
+    """Buckets en memoria del proceso (LRU acotado)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, buckets: Sequence[Bucket], now: float) -> Tuple[Optional[int], float]:
+        with self._lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels.append(_refill(tokens, updated, now, capacity, rate))
+            rejected, retry_after, levels = _take_all(levels, buckets)
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return rejected, retry_after
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+class SqliteBucketStore:
+    """
+    Buckets en un archivo SQLite local compartido por todos los workers del host.
+    BEGIN IMMEDIATE serializa el read-modify-write entre procesos. Cada `prune_every` consumos se borran
+    los buckets que ya se recargaron por completo (equivalen a un bucket nuevo).
+    """
+
+    def __init__(self, path: str, prune_every: int = 1000):
+        self.path = path
+        self.prune_every = prune_every
+        self._consumed = itertools.count(1)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL DEFAULT 0)"
+        )
+        # Archivos creados antes de full_at: sus filas quedan como recargadas y se borran en la próxima poda
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(rate_limit_buckets)")}
+        if "full_at" not in columns:
+            conn.execute("ALTER TABLE rate_limit_buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo, en modo autocommit para controlar la transacción
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def consume(self, buckets: Sequence[Bucket], now: float) -> Tuple[Optional[int], float]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            for key, capacity, rate in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row is not None else (capacity, now)
+                levels.append(_refill(tokens, updated, now, capacity, rate))
+            rejected, retry_after, levels = _take_all(levels, buckets)
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                [
+                    (key, tokens, now, now + (capacity - tokens) / rate)
+                    for (key, capacity, rate), tokens in zip(buckets, levels)
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if next(self._consumed) % self.prune_every == 0:
+            self.prune(now)
+        return rejected, retry_after
+
+    def prune(self, now: float) -> int:
+        """Borrar los buckets recargados por completo; retorna cuántos"""
+        return self._connection().execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,)).rowcount
+
+    def clear(self):
+        self._connection().execute("DELETE FROM rate_limit_buckets")
+
+class RateLimiter:
+    """Token bucket: ráfagas de hasta `capacity` requests y recarga de `per_minute` por minuto"""
+
+    def __init__(self, store, scope: str, capacity: int, per_minute: float):
+        self.store = store
+        self.scope = scope
+        self.capacity = capacity
+        self.per_minute = per_minute
+
+    def bucket(self, identity: str) -> Bucket:
+        return f"{self.scope}:{identity}", self.capacity, self.per_minute / 60.0
+
+    def hit(self, identity: str):
+        """Consumir un token de la identidad o lanzar TooManyRequests"""
+        hit_all([(self, identity)])
+
+def hit_all(limits: Sequence[Tuple[RateLimiter, str]]):
+    """
+    Consumir un token de cada (limitador, identidad) en una sola operación del store: si alguno está
+    agotado se lanza TooManyRequests sin descontar de los demás (los limitadores comparten store)
+    """
+    limits = [(limiter, identity) for limiter, identity in limits if limiter.capacity > 0]
+    if not limits:
+        return
+    rejected, retry_after = limits[0][0].store.consume(
+        [limiter.bucket(identity) for limiter, identity in limits], time.time()
+    )
+    if rejected is not None:
+        raise TooManyRequests(limits[rejected][0].scope, retry_after)
+
+class HashAdmission:
+    """
+    Límite de operaciones de hashing simultáneas en el proceso.
+    Si no hay cupo se rechaza de inmediato en lugar de encolar.
+    """
+
+    def __init__(self, max_in_flight: int, retry_after: float = 1.0):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, count: int = 1):
+        """Reservar `count` cupos (ej. un alta masiva que hashea en varios procesos)"""
+        with self._lock:
+            if self.in_flight + count > self.max_in_flight:
+                self.rejected += 1
+                raise ServerBusy(self.retry_after)
+            self.in_flight += count
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= count
+
+def create_bucket_store(kind: Optional[str] = None):
+    """Crear el store configurado (RATE_LIMIT_STORE=memory|sqlite)"""
+    kind = (kind or settings.rate_limit_store).lower()
+    if kind == "sqlite":
+        return SqliteBucketStore(settings.rate_limit_sqlite_path)
+    if kind != "memory":
+        raise ValueError(f"Store de rate limit desconocido: {kind}")
+    return MemoryBucketStore()
+
+bucket_store = create_bucket_store()
+auth_ip_limiter = RateLimiter(
+    bucket_store, "auth-ip", settings.auth_rate_limit_ip_burst, settings.auth_rate_limit_ip_per_minute
+)
+auth_username_limiter = RateLimiter(
+    bucket_store, "auth-user", settings.auth_rate_limit_user_burst, settings.auth_rate_limit_user_per_minute
+)
+hash_admission = HashAdmission(settings.auth_max_concurrent_hashes)
+
+def check_auth_rate_limits(client_ip: Optional[str], username: Optional[str]):
+    """Aplicar los buckets por IP y por username; si uno rechaza no se descuenta del otro (lanza TooManyRequests)"""
+    if not settings.rate_limit_enabled:
+        return
+    limits = [(auth_ip_limiter, client_ip or "unknown")]
+    if username:
+        limits.append((auth_username_limiter, username.strip().lower()))
+    hit_all(limits)
@@ -0,0 +1,111 @@
+from sqlalchemy.orm import Session
+from ..database.models import UserSession
+from ..config import settings
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+import hashlib
+import math
+import threading
+import time
+
+# Solapamiento entre sincronizaciones: cubre revocaciones confirmadas después de la consulta anterior
+SYNC_OVERLAP = timedelta(seconds=60)
+
+class BloomFilter:
+    """Bloom filter sobre un bytearray con doble hashing (blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str):
+        if item in self:
+            return
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class RevocationList:
+    """
+    Sesiones revocadas: el Bloom filter responde "no revocada" sin consultar la BD;
+    solo los positivos (revocadas o falsos positivos) se confirman con una consulta.
+    Cada worker incorpora periódicamente las revocaciones hechas por otros procesos.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, sync_seconds: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.db_checks = 0
+        self._watermark: Optional[datetime] = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, session_id: str):
+        with self._lock:
+            self.bloom.add(session_id)
+
+    def sync(self, db: Session):
+        """Agregar las sesiones revocadas desde la última sincronización"""
+        now = datetime.utcnow()
+        query = db.query(UserSession.id, UserSession.revoked_at).filter(
+            UserSession.revoked_at.isnot(None), UserSession.expires_at > now
+        )
+        with self._lock:
+            rebuild = self._watermark is None or self.bloom.count > self.capacity
+            if not rebuild:
+                query = query.filter(UserSession.revoked_at >= self._watermark - SYNC_OVERLAP)
+            rows = query.all()
+            if rebuild:
+                # Reconstruir descarta las sesiones ya expiradas y ajusta la capacidad
+                self.capacity = max(self.capacity, 2 * len(rows))
+                self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for session_id, revoked_at in rows:
+                self.bloom.add(session_id)
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            if self._watermark is None:
+                self._watermark = now
+            self._next_sync = time.monotonic() + self.sync_seconds
+
+    def is_revoked(self, db: Session, session_id: str) -> bool:
+        if time.monotonic() >= self._next_sync:
+            self.sync(db)
+        if session_id not in self.bloom:
+            return False
+        # Positivo del filtro: confirmar en la BD para descartar falsos positivos
+        self.db_checks += 1
+        row = db.query(UserSession.revoked_at).filter(UserSession.id == session_id).first()
+        return row is None or row.revoked_at is not None
+
+    def reset(self):
+        with self._lock:
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            self._watermark = None
+            self._next_sync = 0.0
+
+revocation_list = RevocationList(
+    settings.revocation_bloom_capacity,
+    settings.revocation_bloom_error_rate,
+    settings.revocation_sync_seconds,
+)
+
+def is_session_revoked(db: Session, session_id: Optional[str]) -> bool:
+    """Verificar si la sesión del access token fue revocada (tokens sin sid no se revocan)"""
+    if not session_id:
+        return False
+    return revocation_list.is_revoked(db, session_id)
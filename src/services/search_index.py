@@ -0,0 +1,767 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..database.models import Paper as DBPaper
+from ..database.normalization import fold_text, normalized_paper_columns
+from ..config import settings
+from .bitmaps import Bitmap, union_all
+from .index_store import IndexSnapshot, SnapshotWriter, NO_YEAR, file_identity
+from .change_feed import background_sessions, change_feed, log_position, replay_changes, resumable
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Campos indexados (calificadores del lenguaje de consultas: title:, author:, keyword:)
+FIELDS = ("title", "author", "keyword")
+
+# Facetas: valores completos (año, keyword y autor normalizados) con un bitmap de papers cada uno
+FACETS = ("year", "keyword", "author")
+
+def tokenize(folded: str) -> List[str]:
+    """Términos de un texto ya normalizado (fold_text)"""
+    return TOKEN_PATTERN.findall(folded)
+
+def _texts(title: Optional[str], authors: Optional[str], keywords: Optional[str]) -> Dict[str, str]:
+    """Textos normalizados por campo (columnas *_norm)"""
+    return {"title": title or "", "author": authors or "", "keyword": keywords or ""}
+
+def trigrams(term: str) -> Set[str]:
+    """Trigramas del término con bordes marcados ("red" -> "$re", "red", "ed$")"""
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Distancia Damerau-Levenshtein (OSA); retorna max_distance + 1 si la supera"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class TrigramIndex:
+    """Índice de trigramas sobre el vocabulario para recuperar términos parecidos"""
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+
+    def add(self, term: str):
+        for gram in trigrams(term):
+            self.postings.setdefault(gram, set()).add(term)
+
+    def remove(self, term: str):
+        for gram in trigrams(term):
+            terms = self.postings.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.postings[gram]
+
+    def candidates(self, word: str, min_similarity: float, limit: int = 10) -> List[Tuple[str, float]]:
+        """Términos con similitud de Jaccard sobre trigramas >= min_similarity"""
+        grams = trigrams(word)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for term in self.postings.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+        scored = []
+        for term, count in shared.items():
+            similarity = count / (len(grams) + len(trigrams(term)) - count)
+            if similarity >= min_similarity:
+                scored.append((term, similarity))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+class SymSpellDictionary:
+    """Diccionario de borrados precalculados (SymSpell) para corrección ortográfica"""
+
+    def __init__(self, max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.deletes: Dict[str, Set[str]] = {}
+
+    def _variants(self, word: str) -> Set[str]:
+        """El prefijo del término y todas sus variantes con hasta max_distance borrados"""
+        word = word[:self.prefix_length]
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {
+                candidate[:i] + candidate[i + 1:]
+                for candidate in frontier if len(candidate) > 1
+                for i in range(len(candidate))
+            }
+            variants |= frontier
+        return variants
+
+    def add(self, term: str):
+        for variant in self._variants(term):
+            self.deletes.setdefault(variant, set()).add(term)
+
+    def remove(self, term: str):
+        for variant in self._variants(term):
+            terms = self.deletes.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.deletes[variant]
+
+    def lookup(self, word: str, frequencies: Dict[str, int]) -> Optional[Tuple[str, int]]:
+        """Término más cercano (menor distancia, luego más frecuente) o None"""
+        best: Optional[Tuple[str, int]] = None
+        seen: Set[str] = set()
+        for variant in self._variants(word):
+            for term in self.deletes.get(variant, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                distance = edit_distance(word, term, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                if best is None or (distance, -frequencies[term]) < (best[1], -frequencies[best[0]]):
+                    best = (term, distance)
+        return best
+
+class IndexedPaper:
+    """Lo que el índice guarda de cada paper: textos normalizados, términos por campo y metadatos"""
+
+    __slots__ = ("texts", "terms", "year", "citations")
+
+    def __init__(self, texts: Dict[str, str], year: Optional[int], citations: int):
+        self.texts = texts
+        self.terms = {field: set(tokenize(text)) for field, text in texts.items()}
+        self.year = year
+        self.citations = citations
+
+    def vocabulary(self) -> Set[str]:
+        return set().union(*self.terms.values())
+
+    def facet(self, facet: str) -> Set:
+        """Valores de una faceta (authors_norm/keywords_norm separan los elementos con "\n")"""
+        if facet == "year":
+            return set() if self.year is None else {self.year}
+        return {value for value in self.texts[facet].split("\n") if value}
+
+    def facet_values(self) -> Dict[str, Set]:
+        return {facet: self.facet(facet) for facet in FACETS}
+
+# Atributos de configuración y sincronización que no se intercambian en SearchIndex.swap
+INSTANCE_SETTINGS = (
+    "max_distance", "min_similarity", "path", "lock", "checked_at", "_tasks_lock", "_spelling_thread", "_reload_thread"
+)
+
+class SearchIndex:
+    """
+    Índice invertido de títulos, autores y keywords: posting lists como bitmaps por campo y término,
+    bitmaps por valor de faceta (año, keyword, autor) y orden por citas, más el vocabulario con índice
+    de trigramas y diccionario SymSpell. Se construye desde la BD o se abre desde el archivo persistido
+    (mmap); en ese caso las posting lists, facetas y textos se materializan a medida que se usan y las
+    escrituras posteriores quedan en memoria por encima del archivo.
+    """
+
+    def __init__(self, max_distance: int, min_similarity: float, path: str = ""):
+        self.min_similarity = min_similarity
+        self.max_distance = max_distance
+        self.path = path
+        # Lectores (ejecución de consultas) y escritores comparten el lock: los bitmaps cambian en su lugar
+        self.lock = threading.RLock()
+        self.built = False
+        self.build_seconds = 0.0
+        # Archivo publicado que refleja el estado actual y cuándo se revisó por última vez
+        self.identity: Optional[Tuple[int, int, int]] = None
+        self.checked_at = 0.0
+        # Tareas de fondo: corrector ortográfico y recarga del archivo publicado por otro proceso
+        self._tasks_lock = threading.Lock()
+        self._spelling_thread: Optional[threading.Thread] = None
+        self._reload_thread: Optional[threading.Thread] = None
+        self._clear()
+
+    def _clear(self):
+        self.snapshot: Optional[IndexSnapshot] = None
+        self.frequencies: Dict[str, int] = {}
+        self.vocabulary_loaded = True
+        self.papers: Dict[int, IndexedPaper] = {}
+        # Citas y orden por citas: con archivo persistido se leen de sus secciones (mmap) y estos solo guardan
+        # los papers indexados después; `shadowed` son las filas del archivo que ya no valen
+        self.citations: Dict[int, int] = {}
+        self.shadowed: Set[int] = set()
+        self.postings: Dict[str, Dict[str, Bitmap]] = {field: {} for field in FIELDS}
+        self.facets: Dict[str, Dict[object, Bitmap]] = {facet: {} for facet in FACETS}
+        self.complete_facets: Set[str] = set(FACETS)
+        self.by_citations: List[Tuple[int, int]] = []
+        self.all_ids = Bitmap()
+        self.trigram_index = TrigramIndex()
+        self.symspell = SymSpellDictionary(self.max_distance)
+        # El corrector ortográfico se arma fuera del lock (prepare_spelling); `state` identifica esta versión
+        self.spelling_ready = False
+        self.state = object()
+
+    def ensure_built(self, db: Session):
+        """
+        Abrir el índice persistido y ponerlo al día con el change log, o construirlo desde la BD y publicarlo
+        con la posición del log leída antes de la carga
+        """
+        if self.built:
+            return
+        with self.lock:
+            if self.built:
+                return
+            started = time.perf_counter()
+            if self._open_published(db) is not None:
+                source = f"abierto desde {self.path}"
+            else:
+                position = log_position(db)
+                self.load(read_papers(db))
+                source = "construido desde la BD"
+                if self.path:
+                    self.save(self.path, corpus_signature(db), position)
+            self.build_seconds = time.perf_counter() - started
+            logger.info(
+                f"Índice de búsqueda {source}: {len(self.all_ids)} papers en {self.build_seconds:.2f}s"
+            )
+
+    def _open_published(self, db: Session) -> Optional[int]:
+        """
+        Usar el archivo publicado si su posición del change log sigue en el log, reaplicando los cambios
+        posteriores (también los que no tocan updated_at); retorna la posición alcanzada, o None si no hay
+        archivo utilizable o falta parte del log
+        """
+        if not self.path or file_identity(self.path) is None:
+            return None
+        try:
+            snapshot = IndexSnapshot(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Índice persistido inválido en {self.path}: {e}")
+            return None
+        position = snapshot.metadata.get("position")
+        if not resumable(db, position, lambda: snapshot.metadata.get("signature") == corpus_signature(db)):
+            return None
+        self.open_snapshot(snapshot)
+        try:
+            seq, _ = replay_changes(db, position["seq"], self.apply_changes)
+        except LookupError:
+            logger.info(f"Faltan cambios posteriores al índice persistido en {self.path}: se reconstruye")
+            self.reset()
+            return None
+        return seq
+
+    def refresh(self, interval: float):
+        """
+        Si otro proceso publicó un índice (os.replace cambia el inodo), adoptarlo en segundo plano; se revisa
+        a lo sumo cada `interval` segundos y el request no espera la apertura ni la reaplicación del log
+        """
+        now = time.monotonic()
+        if not self.path or now - self.checked_at < interval:
+            return
+        self.checked_at = now
+        identity = file_identity(self.path)
+        if identity is None or identity == self.identity:
+            return
+        with self._tasks_lock:
+            if self._reload_thread is None or not self._reload_thread.is_alive():
+                self._reload_thread = threading.Thread(target=self._reload, name="search-index-reload", daemon=True)
+                self._reload_thread.start()
+
+    def _reload(self):
+        """Abrir el archivo publicado en una versión aparte, ponerla al día y cambiarla con el feed retenido"""
+        sessions = background_sessions()
+        try:
+            fresh = SearchIndex(self.max_distance, self.min_similarity, self.path)
+            with sessions() as db:
+                position = fresh._open_published(db)
+            if position is None:
+                return
+            fresh.prepare_spelling()
+            with sessions() as db, change_feed.paused(db) as feed_position:
+                # El feed ya aplicó a la versión vigente todo hasta feed_position
+                replay_changes(db, position, fresh.apply_changes, until_seq=feed_position)
+                self.swap(fresh)
+            logger.info(f"Índice de búsqueda recargado desde {self.path}: {len(self.all_ids)} papers")
+        except Exception:
+            logger.exception(f"No se pudo recargar el índice publicado en {self.path}")
+
+    def open_snapshot(self, snapshot: IndexSnapshot):
+        """Reemplazar el estado por el índice persistido; solo se cargan los ids (las citas se leen del mmap)"""
+        with self.lock:
+            self._clear()
+            self.snapshot = snapshot
+            self.identity = snapshot.identity
+            self.all_ids = Bitmap.from_sorted(snapshot.ids)
+            self.vocabulary_loaded = False
+            self.complete_facets = set()
+            self.built = True
+
+    def load(self, papers: Iterable[Tuple[int, IndexedPaper]]):
+        """Cargar todos los papers de una vez: los bitmaps se arman al final, no id por id"""
+        with self.lock:
+            self._clear()
+            ids: Dict[str, Dict[str, List[int]]] = {field: {} for field in FIELDS}
+            facet_ids: Dict[str, Dict[object, List[int]]] = {facet: {} for facet in FACETS}
+            for paper_id, paper in papers:
+                self.papers[paper_id] = paper
+                self.citations[paper_id] = paper.citations
+                for field, terms in paper.terms.items():
+                    for term in terms:
+                        ids[field].setdefault(term, []).append(paper_id)
+                for facet, values in paper.facet_values().items():
+                    for value in values:
+                        facet_ids[facet].setdefault(value, []).append(paper_id)
+                self._add_vocabulary(paper.vocabulary())
+            for field, terms in ids.items():
+                self.postings[field] = {term: Bitmap.from_ids(values) for term, values in terms.items()}
+            for facet, values in facet_ids.items():
+                self.facets[facet] = {value: Bitmap.from_ids(paper_ids) for value, paper_ids in values.items()}
+            self.by_citations = sorted((citations, paper_id) for paper_id, citations in self.citations.items())
+            self.all_ids = Bitmap.from_ids(self.papers)
+            self.identity = None
+            self.built = True
+
+    def save(self, path: str, signature: Dict, position: Dict):
+        """
+        Escribir el índice (construido en memoria) en el formato mmap y publicarlo con un reemplazo atómico;
+        `position` es la posición del change log que refleja (ver change_feed.log_position)
+        """
+        with self.lock:
+            if self.snapshot is not None:
+                raise ValueError("Solo se puede persistir un índice construido en memoria")
+            ids = sorted(self.papers)
+            writer = SnapshotWriter(path, {
+                "signature": signature,
+                "position": position,
+                "papers": len(ids),
+                "text_fields": list(FIELDS),
+                "groups": list(FIELDS) + [f"facet.{facet}" for facet in FACETS],
+            })
+            writer.add("ids", "I", ids)
+            writer.add("citations", "i", (self.citations[paper_id] for paper_id in ids))
+            writer.add("years", "i", (
+                NO_YEAR if self.papers[paper_id].year is None else self.papers[paper_id].year for paper_id in ids
+            ))
+            writer.add("by_citations.values", "i", (citations for citations, _ in self.by_citations))
+            writer.add("by_citations.ids", "I", (paper_id for _, paper_id in self.by_citations))
+            for field in FIELDS:
+                writer.add_strings(f"text.{field}", [self.papers[paper_id].texts[field] for paper_id in ids])
+                writer.add_group(field, self.postings[field])
+            for facet in FACETS:
+                writer.add_group(f"facet.{facet}", {str(value): bitmap for value, bitmap in self.facets[facet].items()})
+            terms = list(self.frequencies)
+            writer.add_strings("vocabulary", terms)
+            writer.add("vocabulary.counts", "I", (self.frequencies[term] for term in terms))
+            writer.write()
+            self.identity = file_identity(path)
+
+    # Materialización desde el archivo persistido
+    def paper(self, paper_id: int) -> Optional[IndexedPaper]:
+        paper = self.papers.get(paper_id)
+        if paper is None and self.snapshot is not None and paper_id in self.all_ids:
+            position = self.snapshot.position(paper_id)
+            if position is not None:
+                year = self.snapshot.years[position]
+                paper = IndexedPaper(
+                    {field: self.snapshot.texts[field].text(position) for field in FIELDS},
+                    None if year == NO_YEAR else year, self.snapshot.citations[position]
+                )
+        return paper
+
+    def _posting(self, field: str, term: str) -> Optional[Bitmap]:
+        bitmap = self.postings[field].get(term)
+        if bitmap is None and self.snapshot is not None:
+            packed = self.snapshot.lookup(field, term)
+            if packed is not None:
+                bitmap = self.postings[field][term] = Bitmap.from_sorted(packed)
+        return bitmap
+
+    def _facet_bitmap(self, facet: str, value) -> Optional[Bitmap]:
+        bitmap = self.facets[facet].get(value)
+        if bitmap is None and self.snapshot is not None and facet not in self.complete_facets:
+            packed = self.snapshot.lookup(f"facet.{facet}", str(value))
+            if packed is not None:
+                bitmap = self.facets[facet][value] = Bitmap.from_sorted(packed)
+        return bitmap
+
+    def _facet_group(self, facet: str) -> Dict[object, Bitmap]:
+        """Todos los valores de la faceta (se materializan una vez desde el archivo)"""
+        bitmaps = self.facets[facet]
+        if facet not in self.complete_facets:
+            for key, packed in self.snapshot.groups[f"facet.{facet}"].items():
+                value = int(key) if facet == "year" else key
+                if value not in bitmaps:
+                    bitmaps[value] = Bitmap.from_sorted(packed)
+            self.complete_facets.add(facet)
+        return bitmaps
+
+    def _ensure_vocabulary(self):
+        if not self.vocabulary_loaded:
+            vocabulary = self.snapshot.vocabulary
+            self.frequencies = {
+                vocabulary.text(position): count for position, count in enumerate(self.snapshot.vocabulary_counts)
+            }
+            self.vocabulary_loaded = True
+
+    def prepare_spelling(self):
+        """
+        Armar el índice de trigramas y SymSpell del vocabulario sin retener el lock (con vocabularios grandes
+        tarda segundos) y adoptarlos con las altas y bajas de términos que llegaron mientras tanto
+        """
+        with self.lock:
+            if self.spelling_ready:
+                return
+            self._ensure_vocabulary()
+            state, terms = self.state, list(self.frequencies)
+        trigram_index, symspell = TrigramIndex(), SymSpellDictionary(self.max_distance)
+        for term in terms:
+            trigram_index.add(term)
+            symspell.add(term)
+        with self.lock:
+            if self.spelling_ready or self.state is not state:
+                return
+            indexed = set(terms)
+            for term in self.frequencies.keys() - indexed:
+                trigram_index.add(term)
+                symspell.add(term)
+            for term in indexed - self.frequencies.keys():
+                trigram_index.remove(term)
+                symspell.remove(term)
+            self.trigram_index, self.symspell = trigram_index, symspell
+            self.spelling_ready = True
+
+    def _spelling_in_background(self):
+        with self._tasks_lock:
+            if self._spelling_thread is None or not self._spelling_thread.is_alive():
+                self._spelling_thread = threading.Thread(target=self.prepare_spelling, name="search-spelling", daemon=True)
+                self._spelling_thread.start()
+
+    def _add_vocabulary(self, terms: Iterable[str]):
+        for term in terms:
+            count = self.frequencies.get(term, 0)
+            if count == 0 and self.spelling_ready:
+                self.trigram_index.add(term)
+                self.symspell.add(term)
+            self.frequencies[term] = count + 1
+
+    def _remove_vocabulary(self, terms: Iterable[str]):
+        for term in terms:
+            count = self.frequencies[term] - 1
+            if count == 0:
+                del self.frequencies[term]
+                if self.spelling_ready:
+                    self.trigram_index.remove(term)
+                    self.symspell.remove(term)
+            else:
+                self.frequencies[term] = count
+
+    def _add(self, paper_id: int, paper: IndexedPaper):
+        self.papers[paper_id] = paper
+        self.citations[paper_id] = paper.citations
+        for field, terms in paper.terms.items():
+            for term in terms:
+                bitmap = self._posting(field, term)
+                if bitmap is None:
+                    bitmap = self.postings[field][term] = Bitmap()
+                bitmap.add(paper_id)
+        for facet, values in paper.facet_values().items():
+            for value in values:
+                bitmap = self._facet_bitmap(facet, value)
+                if bitmap is None:
+                    bitmap = self.facets[facet][value] = Bitmap()
+                bitmap.add(paper_id)
+        bisect.insort(self.by_citations, (paper.citations, paper_id))
+        self.all_ids.add(paper_id)
+        self._ensure_vocabulary()
+        self._add_vocabulary(paper.vocabulary())
+
+    def _remove(self, paper_id: int):
+        paper = self.paper(paper_id)
+        if paper is None:
+            return
+        self.papers.pop(paper_id, None)
+        # Con archivo persistido los bitmaps vacíos quedan como marca: no se vuelven a leer del archivo
+        keep_empty = self.snapshot is not None
+        for field, terms in paper.terms.items():
+            postings = self.postings[field]
+            for term in terms:
+                bitmap = self._posting(field, term)
+                bitmap.discard(paper_id)
+                if not bitmap and not keep_empty:
+                    del postings[term]
+        for facet, values in paper.facet_values().items():
+            bitmaps = self.facets[facet]
+            for value in values:
+                bitmap = self._facet_bitmap(facet, value)
+                bitmap.discard(paper_id)
+                if not bitmap and not keep_empty:
+                    del bitmaps[value]
+        citations = self.citations.pop(paper_id, None)
+        if citations is None:
+            self.shadowed.add(paper_id)
+        else:
+            del self.by_citations[bisect.bisect_left(self.by_citations, (citations, paper_id))]
+        self.all_ids.discard(paper_id)
+        self._ensure_vocabulary()
+        self._remove_vocabulary(paper.vocabulary())
+
+    def index_paper(
+        self, paper_id: int, title: Optional[str], authors_json: Optional[str], keywords_json: Optional[str],
+        year: Optional[int] = None, citations: Optional[int] = 0
+    ):
+        """Agregar o reindexar un paper (valores tal como se guardan: authors/keywords en JSON)"""
+        with self.lock:
+            # Sin construir: la construcción perezosa ya leerá este paper de la BD
+            if not self.built:
+                return
+            columns = normalized_paper_columns(title, authors_json, keywords_json)
+            paper = IndexedPaper(
+                _texts(columns["title_norm"], columns["authors_norm"], columns["keywords_norm"]),
+                year, citations or 0
+            )
+            self._remove(paper_id)
+            self._add(paper_id, paper)
+
+    def remove_paper(self, paper_id: int):
+        with self.lock:
+            if self.built:
+                self._remove(paper_id)
+
+    def apply_changes(self, deltas: Iterable):
+        """Consumidor del change log: reindexar los papers modificados y quitar los borrados"""
+        for delta in deltas:
+            row = delta.row
+            if row is None:
+                self.remove_paper(delta.paper_id)
+            else:
+                self.index_paper(row.id, row.title, row.authors, row.keywords, row.publication_year, row.citation_count)
+
+    def term_bitmap(self, field: str, term: str) -> Bitmap:
+        return self._posting(field, term) or Bitmap()
+
+    def year_range(self, low: Optional[int], high: Optional[int]) -> List[Bitmap]:
+        """Bitmaps de los años dentro del rango (extremos inclusivos, None = abierto)"""
+        return [
+            bitmap for year, bitmap in self._facet_group("year").items()
+            if (low is None or year >= low) and (high is None or year <= high)
+        ]
+
+    def _citation_slices(self, low: Optional[int], high: Optional[int]) -> Tuple[Sequence[int], List[Tuple[int, int]]]:
+        """Ids del archivo (bisect sobre la sección mmap) y pares (citas, id) en memoria con citas dentro del rango"""
+        start = 0 if low is None else bisect.bisect_left(self.by_citations, (low, -1))
+        end = len(self.by_citations) if high is None else bisect.bisect_right(self.by_citations, (high, float("inf")))
+        indexed = self.by_citations[start:end]
+        if self.snapshot is None:
+            return (), indexed
+        values = self.snapshot.section("by_citations.values")
+        start = 0 if low is None else bisect.bisect_left(values, low)
+        end = len(values) if high is None else bisect.bisect_right(values, high)
+        return self.snapshot.section("by_citations.ids")[start:max(start, end)], indexed
+
+    def citation_estimate(self, low: Optional[int], high: Optional[int]) -> int:
+        """Cantidad de papers con citas dentro del rango (cuenta también filas del archivo ya reemplazadas)"""
+        stored, indexed = self._citation_slices(low, high)
+        return len(stored) + len(indexed)
+
+    def citation_ids(self, low: Optional[int], high: Optional[int]) -> Iterator[int]:
+        stored, indexed = self._citation_slices(low, high)
+        shadowed = self.shadowed
+        for paper_id in stored:
+            if paper_id not in shadowed:
+                yield paper_id
+        for _, paper_id in indexed:
+            yield paper_id
+
+    def _citation_keys(self, matches: Bitmap) -> Iterator[Tuple[int, int]]:
+        """(-citas, id) de cada id; los ids llegan en orden, así que la fila del archivo se busca desde la anterior"""
+        citations = self.citations
+        stored_ids = self.snapshot.ids if self.snapshot is not None else ()
+        position = 0
+        for paper_id in matches:
+            count = citations.get(paper_id)
+            if count is None:
+                position = bisect.bisect_left(stored_ids, paper_id, position)
+                count = self.snapshot.citations[position]
+            yield -count, paper_id
+
+    def rank(self, matches: Bitmap, offset: int, limit: int) -> List[int]:
+        """Página de ids ordenada por citas (desc) e id"""
+        return [paper_id for _, paper_id in heapq.nsmallest(offset + limit, self._citation_keys(matches))[offset:]]
+
+    def keyword_scores(self, query: str, limit: int, extra_ids: Iterable[int] = ()) -> Dict[int, float]:
+        """
+        Puntaje por keywords en [0, 1]: fracción del IDF de los términos de la consulta presentes en
+        título, autores o keywords. Puntúa los `limit` papers más citados que contienen todos los
+        términos (o alguno, si ninguno los tiene todos) y los ids extra (candidatos semánticos).
+        """
+        terms = set(tokenize(fold_text(query)))
+        with self.lock:
+            bitmaps = [union_all(self.term_bitmap(field, term) for field in FIELDS) for term in terms]
+            bitmaps = [bitmap for bitmap in bitmaps if bitmap]
+            if not bitmaps:
+                return {}
+            total_papers = len(self.all_ids)
+            weights = [math.log(1 + total_papers / len(bitmap)) for bitmap in bitmaps]
+            # Los términos sin coincidencias cuentan con el IDF máximo: la consulta no se cubre entera
+            total_weight = sum(weights) + (len(terms) - len(bitmaps)) * math.log(1 + total_papers)
+            matches = bitmaps[0]
+            for bitmap in bitmaps[1:]:
+                matches = matches & bitmap
+            if not matches:
+                matches = union_all(bitmaps)
+            candidates = set(self.rank(matches, 0, limit))
+            candidates.update(extra_ids)
+            return {
+                paper_id: score for paper_id, score in (
+                    (paper_id, sum(weight for weight, bitmap in zip(weights, bitmaps) if paper_id in bitmap) / total_weight)
+                    for paper_id in candidates
+                ) if score > 0
+            }
+
+    def facet_counts(self, matches: Bitmap, facet: str, limit: int) -> List[Tuple[object, int]]:
+        """
+        Valores más frecuentes de la faceta dentro de las coincidencias. Con pocas coincidencias
+        se cuentan sus valores paper por paper; si no, una intersección de bitmaps por valor.
+        """
+        bitmaps = self._facet_group(facet)
+        if len(matches) < len(bitmaps):
+            counts: Dict[object, int] = {}
+            for paper_id in matches:
+                paper = self.paper(paper_id)
+                if paper is None:
+                    continue
+                for value in paper.facet(facet):
+                    counts[value] = counts.get(value, 0) + 1
+        else:
+            counts = {value: matches.intersection_size(bitmap) for value, bitmap in bitmaps.items()}
+        return heapq.nsmallest(
+            limit, ((value, count) for value, count in counts.items() if count),
+            key=lambda item: (-item[1], str(item[0]))
+        )
+
+    def facet_summary(self, matches: Bitmap, facets: Iterable[str], limit: int) -> Dict[str, List[Dict]]:
+        """Conteos de las facetas pedidas para el conjunto completo de coincidencias"""
+        with self.lock:
+            return {
+                facet: [{"value": value, "count": count} for value, count in self.facet_counts(matches, facet, limit)]
+                for facet in facets
+            }
+
+    def correct_term(self, term: str) -> Optional[str]:
+        """Término del vocabulario más probable para una palabra desconocida"""
+        match = self.symspell.lookup(term, self.frequencies)
+        if match is not None:
+            return match[0]
+        # Errores más allá de la distancia de SymSpell: candidatos por trigramas
+        candidates = self.trigram_index.candidates(term, self.min_similarity, limit=1)
+        return candidates[0][0] if candidates else None
+
+    def suggest(self, query: str) -> Optional[str]:
+        """
+        Consulta corregida ("did you mean") o None si no hay nada que corregir; mientras el corrector no
+        está listo (se arma al arrancar o en segundo plano tras recargar el índice) tampoco hay sugerencia
+        """
+        terms = tokenize(fold_text(query))
+        if not terms:
+            return None
+        with self.lock:
+            if not self.spelling_ready:
+                self._spelling_in_background()
+                return None
+            corrected = [
+                term if term in self.frequencies or term.isdigit() else (self.correct_term(term) or term)
+                for term in terms
+            ]
+        if corrected == terms:
+            return None
+        return " ".join(corrected)
+
+    def fuzzy_terms(self, word: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Términos del vocabulario parecidos a la palabra (por trigramas; vacío si el corrector no está listo)"""
+        with self.lock:
+            if not self.spelling_ready:
+                self._spelling_in_background()
+                return []
+            return self.trigram_index.candidates(fold_text(word), self.min_similarity, limit)
+
+    def stats(self) -> Dict:
+        """Estado del índice; con archivo persistido, postings y facetas son las ya materializadas"""
+        return {
+            "built": self.built,
+            "papers": len(self.all_ids),
+            "snapshot": None if self.snapshot is None else {
+                "path": self.snapshot.path, "papers": len(self.snapshot), "signature": self.snapshot.metadata["signature"]
+            },
+            "terms": len(self.frequencies),
+            "postings": {field: len(postings) for field, postings in self.postings.items()},
+            "facet_values": {facet: len(values) for facet, values in self.facets.items()},
+            "bitmap_bytes": sum(
+                bitmap.memory_bytes()
+                for groups in (self.postings, self.facets) for bitmaps in groups.values() for bitmap in bitmaps.values()
+            ),
+            "trigrams": len(self.trigram_index.postings),
+            "deletes": len(self.symspell.deletes),
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+    def swap(self, other: "SearchIndex"):
+        """
+        Intercambiar el contenido con otro índice (versión nueva o anterior) de una sola vez bajo ambos locks:
+        los lectores ven la versión vieja o la nueva completa, y `other` queda con la que se reemplazó
+        """
+        with self.lock, other.lock:
+            mine = {name: value for name, value in vars(self).items() if name not in INSTANCE_SETTINGS}
+            theirs = {name: value for name, value in vars(other).items() if name not in INSTANCE_SETTINGS}
+            vars(self).update(theirs)
+            vars(other).update(mine)
+
+    def reset(self):
+        """Descartar el índice; se reconstruye en el próximo ensure_built"""
+        with self.lock:
+            self._clear()
+            self.built = False
+
+def read_papers(db: Session, batch_size: int = 1000) -> Iterator[Tuple[int, IndexedPaper]]:
+    """
+    Papers de la tabla tal como los guarda el índice (columnas normalizadas, año y citas), por páginas de
+    ids: cada página es una consulta corta, así una construcción larga no bloquea a los escritores de SQLite
+    """
+    query = db.query(
+        DBPaper.id, DBPaper.title_norm, DBPaper.authors_norm, DBPaper.keywords_norm,
+        DBPaper.publication_year, DBPaper.citation_count
+    )
+    last_id = 0
+    while True:
+        rows = query.filter(DBPaper.id > last_id).order_by(DBPaper.id).limit(batch_size).all()
+        for paper_id, title, authors, keywords, year, citations in rows:
+            yield paper_id, IndexedPaper(_texts(title, authors, keywords), year, citations or 0)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+def corpus_signature(db: Session) -> Dict:
+    """Huella de la tabla papers: cantidad y última modificación (invalida los índices persistidos)"""
+    count, last_update = db.query(func.count(DBPaper.id), func.max(DBPaper.updated_at)).one()
+    return {"papers": count, "updated_at": last_update.isoformat() if last_update else None}
+
+search_index = SearchIndex(settings.search_max_edit_distance, settings.search_trigram_similarity, settings.search_index_path)
+
+def get_search_index(db: Session) -> SearchIndex:
+    """Índice de búsqueda del proceso (abierto al arrancar; tras un reset del feed se reconstruye con esta sesión)"""
+    search_index.ensure_built(db)
+    search_index.refresh(settings.search_index_reload_seconds)
+    return search_index
@@ -1,88 +1,231 @@
 from sqlalchemy.orm import Session
-from .paper_service import search_papers, search_papers_by_author, log_search, convert_db_paper_to_schema
-from ..models.schemas import SearchQuery, SearchResponse, Paper
-from typing import List, Optional
+from .paper_service import (
+    search_papers, search_papers_by_author, search_paper_ids, get_papers_by_ids, log_search, papers_to_schemas
+)
+from .search_index import search_index, get_search_index
+from .semantic_index import semantic_index, get_semantic_index
+from .change_feed import change_feed, PaperDelta
+from .trending import trending_searches
+from .query_language import match_query
+from .bitmaps import Bitmap
+from ..config import settings
+from .http_cache import make_etag
+from .compression import compress_body
+from ..database.normalization import fold_text
+from ..models.schemas import SearchQuery, SearchResponse
+from typing import Callable, ContextManager, List, Optional, Tuple
 
 # Cache simple en memoria para resultados de búsqueda
+# Cada entrada guarda los datos, el cuerpo JSON ya serializado, su ETag,
+# las versiones comprimidas (gzip/br/zstd) a medida que se solicitan y, para la
+# búsqueda simple, el campo y texto normalizado que filtra (invalidación por change log)
 search_cache = {}
 
-def search_papers_service(db: Session, search_query: SearchQuery, user_id: Optional[int] = None) -> SearchResponse:
-    """Servicio principal de búsqueda de papers"""
+# Columna normalizada que filtra cada tipo de búsqueda simple (campos de texto del índice)
+SIMPLE_SEARCH_FIELDS = {"papers": "title", "authors": "author"}
+
+def _cache_key(search_type: str, search_query: SearchQuery) -> str:
+    """Clave de cache que incluye la proyección de campos y las facetas solicitadas"""
+    fields = ",".join(search_query.fields) if search_query.fields else "*"
+    facets = ",".join(search_query.facets) if search_query.facets else ""
+    return f"{search_type}_{search_query.q}_{search_query.offset}_{search_query.limit}_{fields}_{facets}"
+
+def _build_cache_entry(response_data: dict, match: Optional[Tuple[str, str]] = None) -> dict:
+    """Serializar la respuesta una sola vez y calcular su ETag para guardarlos en cache"""
+    body = SearchResponse(**response_data).model_dump_json(exclude_unset=True).encode("utf-8")
+    return {
+        "data": response_data,
+        "body": body,
+        "etag": make_etag(body),
+        "encoded": {},
+        "match": match
+    }
+
+def get_encoded_body(entry: dict, encoding: str) -> bytes:
+    """Cuerpo precomprimido de la entrada de cache; se comprime una sola vez por codificación"""
+    encoded = entry["encoded"].get(encoding)
+    if encoded is None:
+        encoded = compress_body(entry["body"], encoding)
+        entry["encoded"][encoding] = encoded
+    return encoded
+
+def _record_search(
+    db: Session, q: str, results: int, search_type: str, user_id: Optional[int], client: Optional[str]
+):
+    """Registrar la búsqueda en search_logs y, si tuvo resultados, en las tendencias (buscador = usuario o cliente)"""
+    log_search(db, q, results, search_type, user_id)
+    if results:
+        trending_searches.record(q, f"user:{user_id}" if user_id is not None else client)
+
+def _execute_search(
+    db: Session, search_type: str, search_query: SearchQuery, user_id: Optional[int] = None, log: bool = True,
+    client: Optional[str] = None
+) -> dict:
+    """Ejecutar una búsqueda (o leerla de cache) y retornar la entrada de cache"""
     
     # Verificar cache simple
-    cache_key = f"papers_{search_query.q}_{search_query.offset}_{search_query.limit}"
-    if cache_key in search_cache:
-        cached_result = search_cache[cache_key]
-        # Log de búsqueda
-        log_search(db, search_query.q, len(cached_result["results"]), "papers", user_id)
-        return SearchResponse(**cached_result)
-    
-    # Buscar en base de datos
-    db_papers = search_papers(
-        db, 
-        search_query.q, 
-        search_query.offset, 
-        search_query.limit
-    )
+    cache_key = _cache_key(search_type, search_query)
+    entry = search_cache.get(cache_key)
+    if entry is None:
+        finder = search_papers if search_type == "papers" else search_papers_by_author
+        db_papers = finder(
+            db, 
+            search_query.q, 
+            search_query.offset, 
+            search_query.limit,
+            search_query.fields
+        )
+        
+        # Convertir a schemas
+        papers = papers_to_schemas(db_papers, search_query.fields)
+        
+        response_data = {
+            "query": search_query.q,
+            "total": len(papers),
+            "results": papers
+        }
+        if search_query.facets:
+            # Las facetas cubren todas las coincidencias, no solo la página
+            matches = Bitmap.from_ids(search_paper_ids(db, search_query.q, by_author=search_type == "authors"))
+            response_data["facets"] = get_search_index(db).facet_summary(
+                matches, search_query.facets, settings.search_facet_limit
+            )
+        if papers:
+            entry = _build_cache_entry(response_data, (SIMPLE_SEARCH_FIELDS[search_type], fold_text(search_query.q)))
+            search_cache[cache_key] = entry
+        else:
+            # Sin resultados (típicamente un error de tipeo): sugerir corrección y no cachear,
+            # así la consulta encuentra los papers que se agreguen después
+            suggestion = get_search_index(db).suggest(search_query.q)
+            if suggestion:
+                response_data["suggestion"] = suggestion
+            entry = _build_cache_entry(response_data)
     
-    # Convertir a schemas
-    papers = []
-    for db_paper in db_papers:
-        paper_dict = convert_db_paper_to_schema(db_paper)
-        papers.append(Paper(**paper_dict))
-    
-    # Crear respuesta
-    response_data = {
-        "query": search_query.q,
-        "total": len(papers),
-        "results": papers
-    }
+    # Log de búsqueda
+    if log:
+        _record_search(db, search_query.q, len(entry["data"]["results"]), search_type, user_id, client)
     
-    # Guardar en cache
-    search_cache[cache_key] = response_data
+    return entry
+
+def search_query_cached(
+    db: Session, search_query: SearchQuery, user_id: Optional[int] = None, log: bool = True, client: Optional[str] = None
+) -> dict:
+    """
+    Búsqueda con el lenguaje de consultas (author:, year:a..b, cited:>N, frases, AND/OR/NOT)
+    resuelta sobre el índice invertido; total es el número de coincidencias, no el tamaño de la página
+    """
+    cache_key = _cache_key("query", search_query)
+    entry = search_cache.get(cache_key)
+    if entry is None:
+        index = get_search_index(db)
+        with index.lock:
+            matches = match_query(index, search_query.q)
+            total = len(matches)
+            paper_ids = index.rank(matches, search_query.offset, search_query.limit)
+            facets = index.facet_summary(matches, search_query.facets, settings.search_facet_limit) if search_query.facets else None
+        papers = papers_to_schemas(get_papers_by_ids(db, paper_ids, search_query.fields), search_query.fields)
+        response_data = {
+            "query": search_query.q,
+            "total": total,
+            "results": papers
+        }
+        if facets is not None:
+            response_data["facets"] = facets
+        entry = _build_cache_entry(response_data)
+        if total:
+            search_cache[cache_key] = entry
     
-    # Log de búsqueda
-    log_search(db, search_query.q, len(papers), "papers", user_id)
+    if log:
+        _record_search(db, search_query.q, entry["data"]["total"], "query", user_id, client)
+    return entry
+
+def _semantic_type(keyword_weight: float) -> str:
+    return f"semantic{keyword_weight:g}"
+
+def search_semantic_cached(
+    db: Session, search_query: SearchQuery, keyword_weight: float, user_id: Optional[int] = None, log: bool = True,
+    client: Optional[str] = None
+) -> dict:
+    """
+    Búsqueda semántica (coseno en el espacio LSA de título + abstract) con ranking híbrido:
+    puntaje = (1 - keyword_weight) * coseno + keyword_weight * puntaje por keywords
+    """
+    cache_key = _cache_key(_semantic_type(keyword_weight), search_query)
+    entry = search_cache.get(cache_key)
+    if entry is None:
+        semantic = get_semantic_index(db)
+        vector = semantic.embed(search_query.q)
+        wanted = max(search_query.offset + search_query.limit, settings.semantic_candidates)
+        similarities = dict(semantic.nearest(vector, wanted))
+        keyword = {}
+        if keyword_weight > 0:
+            keyword = get_search_index(db).keyword_scores(search_query.q, settings.semantic_candidates, similarities)
+            similarities.update(semantic.similarities(vector, [pid for pid in keyword if pid not in similarities]))
+        scores = {
+            paper_id: (1 - keyword_weight) * max(similarities.get(paper_id, 0.0), 0.0) + keyword_weight * keyword.get(paper_id, 0.0)
+            for paper_id in set(similarities) | set(keyword)
+        }
+        ranked = sorted((paper_id for paper_id, score in scores.items() if score > 0), key=lambda pid: (-scores[pid], pid))
+        paper_ids = ranked[search_query.offset:search_query.offset + search_query.limit]
+        papers = papers_to_schemas(get_papers_by_ids(db, paper_ids, search_query.fields), search_query.fields)
+        entry = _build_cache_entry({
+            "query": search_query.q,
+            "total": len(ranked),
+            "results": papers
+        })
+        if ranked:
+            search_cache[cache_key] = entry
     
-    return SearchResponse(**response_data)
+    if log:
+        _record_search(db, search_query.q, entry["data"]["total"], "semantic", user_id, client)
+    return entry
+
+def search_papers_cached(
+    db: Session, search_query: SearchQuery, user_id: Optional[int] = None, client: Optional[str] = None
+) -> dict:
+    """Búsqueda de papers retornando la entrada de cache (data, body serializado y etag)"""
+    return _execute_search(db, "papers", search_query, user_id, client=client)
+
+def search_authors_cached(
+    db: Session, search_query: SearchQuery, user_id: Optional[int] = None, client: Optional[str] = None
+) -> dict:
+    """Búsqueda por autores retornando la entrada de cache (data, body serializado y etag)"""
+    return _execute_search(db, "authors", search_query, user_id, client=client)
+
+def warm_search(db: Session, search_type: str, q: str) -> bool:
+    """
+    Precalcular la primera página de una búsqueda con los parámetros por defecto de su endpoint, sin
+    registrarla en search_logs; retorna True si quedó en cache (las búsquedas sin resultados no se cachean)
+    """
+    search_query = SearchQuery(q=q)
+    if search_type == "query":
+        entry = search_query_cached(db, search_query, log=False)
+    elif search_type == "semantic":
+        search_type = _semantic_type(settings.semantic_keyword_weight)
+        entry = search_semantic_cached(db, search_query, settings.semantic_keyword_weight, log=False)
+    elif search_type in SIMPLE_SEARCH_FIELDS:
+        entry = _execute_search(db, search_type, search_query, log=False)
+    else:
+        return False
+    return search_cache.get(_cache_key(search_type, search_query)) is entry
+
+def prepare_search_indexes(sessions: Callable[[], ContextManager[Session]]):
+    """
+    Abrir (o construir) el índice de búsqueda y el semántico, y armar el corrector ortográfico, al arrancar
+    en un hilo: así el primer request no los arma dentro del event loop ni retiene sus locks mientras tanto
+    """
+    with sessions() as db:
+        search_index.ensure_built(db)
+        semantic_index.ensure_built(db)
+    search_index.prepare_spelling()
+
+def search_papers_service(db: Session, search_query: SearchQuery, user_id: Optional[int] = None) -> SearchResponse:
+    """Servicio principal de búsqueda de papers"""
+    return SearchResponse(**search_papers_cached(db, search_query, user_id)["data"])
 
 def search_authors_service(db: Session, search_query: SearchQuery, user_id: Optional[int] = None) -> SearchResponse:
     """Servicio de búsqueda por autores"""
-    
-    # Verificar cache
-    cache_key = f"authors_{search_query.q}_{search_query.offset}_{search_query.limit}"
-    if cache_key in search_cache:
-        cached_result = search_cache[cache_key]
-        log_search(db, search_query.q, len(cached_result["results"]), "authors", user_id)
-        return SearchResponse(**cached_result)
-    
-    # Buscar por autor
-    db_papers = search_papers_by_author(
-        db, 
-        search_query.q, 
-        search_query.offset, 
-        search_query.limit
-    )
-    
-    # Convertir a schemas
-    papers = []
-    for db_paper in db_papers:
-        paper_dict = convert_db_paper_to_schema(db_paper)
-        papers.append(Paper(**paper_dict))
-    
-    response_data = {
-        "query": search_query.q,
-        "total": len(papers),
-        "results": papers
-    }
-    
-    # Guardar en cache
-    search_cache[cache_key] = response_data
-    
-    # Log de búsqueda
-    log_search(db, search_query.q, len(papers), "authors", user_id)
-    
-    return SearchResponse(**response_data)
+    return SearchResponse(**search_authors_cached(db, search_query, user_id)["data"])
 
 def get_search_suggestions(query: str) -> List[str]:
     """Obtener sugerencias de búsqueda simples"""
@@ -100,3 +243,34 @@ def clear_search_cache():
     """Limpiar cache de búsquedas"""
     global search_cache
     search_cache.clear()
+
+def invalidate_search_cache(deltas: List[PaperDelta]):
+    """
+    Consumidor del change log: descartar solo las búsquedas simples cuyo texto aparece en el título o
+    autores de un paper modificado, antes o después del cambio (los textos previos salen del índice).
+    Las del lenguaje de consultas y semánticas dependen de todo el índice y se descartan siempre
+    """
+    texts = {"title": [], "author": []}
+    previous_unknown = False
+    with search_index.lock:
+        for delta in deltas:
+            if delta.row is not None:
+                texts["title"].append(delta.row.title_norm or "")
+                texts["author"].append(delta.row.authors_norm or "")
+            if not delta.inserted:
+                previous = search_index.paper(delta.paper_id) if search_index.built else None
+                if previous is None:
+                    previous_unknown = True
+                else:
+                    texts["title"].append(previous.texts["title"])
+                    texts["author"].append(previous.texts["author"])
+    for key, entry in list(search_cache.items()):
+        match = entry["match"]
+        if match is None or previous_unknown or any(match[1] in text for text in texts[match[0]]):
+            search_cache.pop(key, None)
+
+# Consumidores del change log en orden: el cache primero, porque compara con los textos que el índice
+# tiene antes de aplicar el lote
+change_feed.subscribe("search_cache", invalidate_search_cache, clear_search_cache)
+change_feed.subscribe("search_index", search_index.apply_changes, search_index.reset)
+change_feed.subscribe("semantic_index", semantic_index.apply_changes, semantic_index.reset)
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..database.models import SearchLog
+from ..config import settings
+from .search_service import warm_search
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Las búsquedas se agregan por hora: la recencia se pondera con la hora del bucket
+HOUR_FORMAT = "%Y-%m-%d %H:00:00"
+
+def top_queries(
+    db: Session, limit: int, lookback_days: int, half_life_hours: float, now: Optional[datetime] = None
+) -> Tuple[List[Tuple[Tuple[str, str], float]], float]:
+    """
+    Las `limit` búsquedas (consulta, tipo) con más peso en search_logs de los últimos días, donde cada
+    búsqueda pesa 0.5 ** (antigüedad / vida media); retorna también el peso total del período
+    """
+    now = now or datetime.utcnow()
+    hour = func.strftime(HOUR_FORMAT, SearchLog.created_at)
+    rows = db.query(SearchLog.query, SearchLog.search_type, hour, func.count()).filter(
+        SearchLog.created_at >= now - timedelta(days=lookback_days)
+    ).group_by(SearchLog.query, SearchLog.search_type, hour)
+    weights: Dict[Tuple[str, str], float] = {}
+    for query, search_type, bucket, count in rows:
+        age_hours = max((now - datetime.strptime(bucket, HOUR_FORMAT)).total_seconds() / 3600, 0.0)
+        key = (query, search_type)
+        weights[key] = weights.get(key, 0.0) + count * 0.5 ** (age_hours / half_life_hours)
+    ranked = heapq.nlargest(limit, weights.items(), key=lambda item: (item[1], item[0]))
+    return ranked, sum(weights.values())
+
+class SearchWarmup:
+    """
+    Warm-up del cache de búsquedas al iniciar: precalcula en un hilo la primera página de las consultas
+    más pesadas del historial (en orden de peso y dentro de un presupuesto de tiempo). El hit ratio es la
+    fracción del tráfico reciente ponderado que ya puede servirse del cache; `ready` se activa al alcanzar
+    el objetivo o al terminar.
+    """
+
+    def __init__(self, max_queries: int, lookback_days: int, half_life_hours: float, time_budget_seconds: float):
+        self.max_queries = max_queries
+        self.lookback_days = lookback_days
+        self.half_life_hours = half_life_hours
+        self.time_budget = time_budget_seconds
+        self.target_hit_ratio = 0.0
+        self.status = "idle"
+        self.planned = 0
+        self.warmed = 0
+        self.cached = 0
+        self.failed = 0
+        self.covered_weight = 0.0
+        self.total_weight = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.covered_weight / self.total_weight if self.total_weight else 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], ContextManager[Session]], target_hit_ratio: float = 0.0):
+        if self.running:
+            return
+        self.target_hit_ratio = target_hit_ratio
+        self.status = "running"
+        self.planned = self.warmed = self.cached = self.failed = 0
+        self.covered_weight = self.total_weight = 0.0
+        self.started_at, self.finished_at = time.time(), None
+        self.ready.clear()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, args=(session_factory,), name="search-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Esperar el hit ratio objetivo (o el fin del warm-up) hasta `timeout` segundos"""
+        return self.ready.wait(timeout)
+
+    def run(self, session_factory: Callable[[], ContextManager[Session]]):
+        deadline = time.monotonic() + self.time_budget
+        try:
+            with session_factory() as db:
+                ranked, self.total_weight = top_queries(db, self.max_queries, self.lookback_days, self.half_life_hours)
+                self.planned = len(ranked)
+                for (query, search_type), weight in ranked:
+                    if self._stopped.is_set() or time.monotonic() > deadline:
+                        self.status = "stopped" if self._stopped.is_set() else "budget_exhausted"
+                        break
+                    try:
+                        cached = warm_search(db, search_type, query)
+                    except Exception as e:
+                        # Consultas del historial que ya no son válidas (ej. sintaxis) no frenan el warm-up
+                        db.rollback()
+                        self.failed += 1
+                        logger.debug(f"Warm-up: no se pudo precalcular {search_type} '{query}': {e}")
+                        continue
+                    self.warmed += 1
+                    if cached:
+                        self.cached += 1
+                        self.covered_weight += weight
+                    if self.target_hit_ratio and self.hit_ratio >= self.target_hit_ratio:
+                        self.ready.set()
+                else:
+                    self.status = "done"
+        except Exception:
+            self.status = "failed"
+            logger.exception("Falló el warm-up del cache de búsquedas")
+        finally:
+            self.finished_at = time.time()
+            self.ready.set()
+            logger.info(
+                f"Warm-up de búsquedas: {self.cached}/{self.planned} consultas en cache, "
+                f"hit ratio estimado {self.hit_ratio:.2f}"
+            )
+
+    def stats(self) -> Dict:
+        now = self.finished_at or time.time()
+        return {
+            "status": self.status,
+            "ready": self.ready.is_set(),
+            "planned": self.planned,
+            "warmed": self.warmed,
+            "cached": self.cached,
+            "failed": self.failed,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "target_hit_ratio": self.target_hit_ratio,
+            "elapsed_seconds": round(now - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+search_warmup = SearchWarmup(
+    settings.search_warmup_queries, settings.search_warmup_lookback_days,
+    settings.search_warmup_half_life_hours, settings.search_warmup_time_budget_seconds
+)
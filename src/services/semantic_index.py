@@ -0,0 +1,534 @@
+from sqlalchemy.orm import Session
+from ..database.models import Paper as DBPaper
+from ..database.normalization import fold_text
+from ..config import settings
+from .search_index import tokenize, corpus_signature
+from .change_feed import background_sessions, change_feed, log_position, replay_changes, resumable
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Palabras vacías (inglés/español) que no aportan al espacio semántico
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this to "
+    "was we were which with our using via based new al con de del el en es la las lo los para por "
+    "se su sus un una uno y que".split()
+)
+
+# Archivos del índice persistido: cada ajuste en su propio directorio de versión y el manifiesto, que se
+# reemplaza último y de forma atómica, es el único puntero a la versión vigente
+ARRAY_FILES = ("vectors", "ids", "components", "idf")
+MANIFEST_FILE = "manifest.json"
+VERSION_PREFIX = "version-"
+
+# Las versiones reemplazadas se borran pasado este tiempo (lectores que ya leyeron el manifiesto, escrituras en curso)
+VERSION_RETENTION_SECONDS = 600
+
+# Papers (muestra aleatoria) sobre los que se calculan los componentes de la SVD; luego se proyectan todos
+SVD_SAMPLE_SIZE = 20000
+
+# Similitudes menores son ruido numérico de la proyección, no papers relacionados
+MIN_SIMILARITY = 1e-4
+
+# Se reajusta el modelo cuando los papers agregados después del ajuste superan esta fracción
+REFIT_RATIO = 0.5
+REFIT_MIN_ADDED = 1000
+
+# Atributos de configuración y sincronización que no se reemplazan al adoptar un reajuste
+INSTANCE_SETTINGS = (
+    "dimensions", "n_features", "directory", "ann_min_docs", "lsh_tables", "lsh_bits", "lock", "_refit_lock", "_refit_thread"
+)
+
+def paper_text(title: Optional[str], abstract: Optional[str]) -> str:
+    return f"{title or ''}\n{abstract or ''}"
+
+@lru_cache(maxsize=200000)
+def _term_feature(term: str, n_features: int) -> int:
+    """Feature del término (crc32: estable entre procesos, a diferencia de hash()); -1 si se descarta"""
+    if len(term) < 2 or term in STOPWORDS or term.isdigit():
+        return -1
+    return zlib.crc32(term.encode("utf-8")) % n_features
+
+def hashed_features(text: str, n_features: int) -> Dict[int, int]:
+    """Frecuencia de cada término del texto en el espacio de features"""
+    counts: Dict[int, int] = {}
+    for term in tokenize(fold_text(text)):
+        feature = _term_feature(term, n_features)
+        if feature >= 0:
+            counts[feature] = counts.get(feature, 0) + 1
+    return counts
+
+def _sparse_matmul(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, dense: np.ndarray,
+                   block_nnz: int = 1 << 18) -> np.ndarray:
+    """Matriz dispersa (CSR) por densa, por bloques de filas para acotar la memoria temporal"""
+    rows = len(indptr) - 1
+    out = np.zeros((rows, dense.shape[1]), dtype=np.float32)
+    start = 0
+    while start < rows:
+        end = int(np.searchsorted(indptr, indptr[start] + block_nnz, side="right")) - 1
+        end = min(max(end, start + 1), rows)
+        low, high = indptr[start], indptr[end]
+        if high > low:
+            products = data[low:high, None] * dense[indices[low:high]]
+            nonempty = indptr[start + 1:end + 1] > indptr[start:end]
+            out[start:end][nonempty] = np.add.reduceat(products, indptr[start:end][nonempty] - low, axis=0)
+        start = end
+    return out
+
+def _take_rows(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, rows: np.ndarray):
+    """CSR con un subconjunto de filas"""
+    lengths = indptr[rows + 1] - indptr[rows]
+    positions = np.concatenate([np.arange(indptr[row], indptr[row + 1]) for row in rows]) if len(rows) else np.empty(0, dtype=np.int64)
+    return np.concatenate(([0], np.cumsum(lengths))), indices[positions], data[positions]
+
+def _transpose(indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, columns: int):
+    """CSR de la transpuesta (para X.T @ Q con el mismo producto por bloques)"""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    transposed_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=columns))))
+    return transposed_indptr, rows[order], data[order]
+
+class RandomProjectionLSH:
+    """
+    Índice aproximado por hiperplanos aleatorios: cada tabla asigna a cada vector un código de
+    `bits` signos; la consulta revisa su cubeta y las que difieren en un bit (multi-probe).
+    """
+
+    def __init__(self, vectors: np.ndarray, tables: int, bits: int, seed: int = 0):
+        self.tables = tables
+        self.bits = bits
+        self.planes = np.random.default_rng(seed).standard_normal((vectors.shape[1], tables * bits)).astype(np.float32)
+        self.weights = 1 << np.arange(bits, dtype=np.int64)
+        codes = np.concatenate([self._codes(vectors[i:i + 65536]) for i in range(0, len(vectors), 65536)])
+        # Por tabla: filas ordenadas por código, para buscar cubetas con searchsorted
+        self.order = np.argsort(codes, axis=0, kind="stable")
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=0)
+
+    def _codes(self, vectors: np.ndarray) -> np.ndarray:
+        signs = (np.asarray(vectors) @ self.planes) > 0
+        return (signs.reshape(len(signs), self.tables, self.bits) * self.weights).sum(axis=2)
+
+    def candidates(self, vector: np.ndarray) -> np.ndarray:
+        code = self._codes(vector[None, :])[0]
+        flips = np.concatenate(([0], self.weights))
+        rows = []
+        for table in range(self.tables):
+            keys = code[table] ^ flips
+            column = self.sorted_codes[:, table]
+            lows = np.searchsorted(column, keys, side="left")
+            highs = np.searchsorted(column, keys, side="right")
+            rows.extend(self.order[low:high, table] for low, high in zip(lows, highs) if high > low)
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+
+class SemanticIndex:
+    """
+    Búsqueda semántica local sobre título + abstract: TF-IDF con hashing de términos proyectado por
+    SVD truncada (LSA) a `dimensions` dimensiones. Los vectores del ajuste se guardan en disco y se
+    abren como memmap de NumPy; los papers nuevos se proyectan con el modelo vigente y quedan en un
+    delta en memoria. Top-k por coseno exacto o, con muchos papers, candidatos por LSH.
+    """
+
+    def __init__(self, dimensions: int, n_features: int, directory: str,
+                 ann_min_docs: int, lsh_tables: int, lsh_bits: int):
+        self.dimensions = dimensions
+        self.n_features = n_features
+        self.directory = directory
+        self.ann_min_docs = ann_min_docs
+        self.lsh_tables = lsh_tables
+        self.lsh_bits = lsh_bits
+        self.lock = threading.RLock()
+        self._refit_lock = threading.Lock()
+        self._refit_thread: Optional[threading.Thread] = None
+        self.built = False
+        self.build_seconds = 0.0
+        self._clear()
+
+    def _clear(self):
+        self.components: Optional[np.ndarray] = None
+        self.idf: Optional[np.ndarray] = None
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.delta_vectors: List[np.ndarray] = []
+        self.delta_ids: List[int] = []
+        self.delta_alive: List[bool] = []
+        self.rows: Dict[int, int] = {}
+        self.lsh: Optional[RandomProjectionLSH] = None
+        self.memory_mapped = False
+        # Papers escritos cuando aún no había modelo (tabla vacía al ajustar)
+        self.stale = False
+
+    # Construcción
+    def ensure_built(self, db: Session):
+        """
+        Abrir el índice persistido y ponerlo al día con el change log, o ajustarlo desde la BD (al arrancar,
+        fuera del event loop). Los reajustes posteriores corren en segundo plano con el modelo vigente
+        """
+        if self.built:
+            if self._needs_refit():
+                self.refit_in_background()
+            return
+        with self.lock:
+            if self.built:
+                return
+            started = time.perf_counter()
+            if not self._open(db):
+                self._fit_from(db)
+            self.build_seconds = time.perf_counter() - started
+            logger.info(
+                f"Índice semántico listo: {len(self.ids)} papers, {self.vectors.shape[1]} dimensiones "
+                f"({'memmap' if self.memory_mapped else 'ajustado'}) en {self.build_seconds:.2f}s"
+            )
+
+    def _fit_from(self, db: Session) -> int:
+        """Ajustar sobre la tabla y persistirlo; retorna la posición del change log leída antes de ajustar"""
+        position = log_position(db)
+        rows = db.query(DBPaper.id, DBPaper.title, DBPaper.abstract).yield_per(1000)
+        self.fit((paper_id, paper_text(title, abstract)) for paper_id, title, abstract in rows)
+        self._save(position, corpus_signature(db))
+        return position["seq"]
+
+    @property
+    def refitting(self) -> bool:
+        return self._refit_thread is not None and self._refit_thread.is_alive()
+
+    def refit_in_background(self) -> bool:
+        """Lanzar un reajuste en un hilo (False si ya hay uno en curso); mientras tanto se sirve el modelo vigente"""
+        with self._refit_lock:
+            if self.refitting:
+                return False
+            self._refit_thread = threading.Thread(target=self._refit, name="semantic-refit", daemon=True)
+            self._refit_thread.start()
+            return True
+
+    def _refit(self):
+        """Ajustar una versión nueva, ponerla al día con el log y adoptarla con el feed retenido"""
+        sessions = background_sessions()
+        try:
+            started = time.perf_counter()
+            fresh = SemanticIndex(
+                self.dimensions, self.n_features, self.directory, self.ann_min_docs, self.lsh_tables, self.lsh_bits
+            )
+            with sessions() as db:
+                position = fresh._fit_from(db)
+                position, _ = replay_changes(db, position, fresh.apply_changes)
+            with sessions() as db, change_feed.paused(db) as feed_position:
+                # El feed ya aplicó al modelo vigente todo hasta feed_position: la versión nueva se pone al día igual
+                replay_changes(db, position, fresh.apply_changes, until_seq=feed_position)
+                fresh.build_seconds = time.perf_counter() - started
+                with self.lock:
+                    vars(self).update({name: value for name, value in vars(fresh).items() if name not in INSTANCE_SETTINGS})
+            logger.info(f"Índice semántico reajustado: {len(self.ids)} papers en {self.build_seconds:.2f}s")
+        except Exception:
+            logger.exception("Falló el reajuste del índice semántico; se mantiene el modelo vigente")
+
+    def _needs_refit(self) -> bool:
+        added = len(self.delta_ids)
+        return self.stale or (added >= REFIT_MIN_ADDED and added > REFIT_RATIO * len(self.ids))
+
+    def fit(self, documents: Iterable[Tuple[int, str]]):
+        """Ajustar TF-IDF + SVD truncada (aleatorizada) sobre todos los documentos"""
+        with self.lock:
+            self._clear()
+            ids: List[int] = []
+            indptr = [0]
+            indices: List[int] = []
+            counts: List[int] = []
+            for paper_id, text in documents:
+                features = hashed_features(text, self.n_features)
+                ids.append(paper_id)
+                indices.extend(features)
+                counts.extend(features.values())
+                indptr.append(len(indices))
+            self.built = True
+            if not ids:
+                return
+
+            total = len(ids)
+            indptr_array = np.array(indptr, dtype=np.int64)
+            indices_array = np.array(indices, dtype=np.int64)
+            document_frequency = np.bincount(indices_array, minlength=self.n_features)
+            self.idf = (np.log((1 + total) / (1 + document_frequency)) + 1).astype(np.float32)
+            data = ((1 + np.log(np.array(counts, dtype=np.float32))) * self.idf[indices_array]).astype(np.float32)
+            row_of_value = np.repeat(np.arange(total), np.diff(indptr_array))
+            norms = np.sqrt(np.bincount(row_of_value, weights=data * data, minlength=total)).astype(np.float32)
+            norms[norms == 0] = 1
+            data /= norms[row_of_value]
+
+            self.components = self._truncated_svd(indptr_array, indices_array, data, total)
+            self.ids = np.array(ids, dtype=np.int64)
+            self.vectors = _normalize(_sparse_matmul(indptr_array, indices_array, data, self.components.T))
+            self.alive = np.ones(total, dtype=bool)
+            self.rows = {paper_id: row for row, paper_id in enumerate(ids)}
+            self._build_lsh()
+
+    def _truncated_svd(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, total: int) -> np.ndarray:
+        """Componentes principales (rank x n_features) por SVD aleatorizada con 2 iteraciones de potencia"""
+        if total > SVD_SAMPLE_SIZE:
+            sample_rows = np.sort(np.random.default_rng(0).choice(total, SVD_SAMPLE_SIZE, replace=False))
+            indptr, indices, data = _take_rows(indptr, indices, data, sample_rows)
+            total = SVD_SAMPLE_SIZE
+        rank = min(self.dimensions, total, self.n_features)
+        width = min(rank + 10, total, self.n_features)
+        transposed = _transpose(indptr, indices, data, self.n_features)
+        rng = np.random.default_rng(0)
+        sample = _sparse_matmul(indptr, indices, data, rng.standard_normal((self.n_features, width)).astype(np.float32))
+        for _ in range(2):
+            basis, _ = np.linalg.qr(sample)
+            projected, _ = np.linalg.qr(_sparse_matmul(*transposed, basis))
+            sample = _sparse_matmul(indptr, indices, data, projected)
+        basis, _ = np.linalg.qr(sample)
+        reduced = _sparse_matmul(*transposed, basis).T.astype(np.float64)
+        # SVD de la matriz chica (width x n_features) vía autovalores de reduced @ reduced.T
+        eigenvalues, vectors = np.linalg.eigh(reduced @ reduced.T)
+        order = np.argsort(eigenvalues)[::-1][:rank]
+        order = order[eigenvalues[order] > eigenvalues.max() * 1e-8]
+        components = (vectors[:, order].T @ reduced) / np.sqrt(eigenvalues[order])[:, None]
+        return np.ascontiguousarray(components, dtype=np.float32)
+
+    def _build_lsh(self):
+        self.lsh = None
+        if len(self.ids) >= self.ann_min_docs and self.vectors.shape[1]:
+            self.lsh = RandomProjectionLSH(self.vectors, self.lsh_tables, self.lsh_bits)
+
+    # Persistencia
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _save(self, position: Dict, signature: Dict):
+        """Persistir el ajuste (sin el delta) con la posición del change log leída antes de ajustar"""
+        if not self.directory or self.components is None:
+            return
+        # Nombres únicos por proceso e hilo: reajustes concurrentes no escriben sobre los mismos archivos
+        unique = f"{time.time_ns()}.{os.getpid()}.{threading.get_ident()}"
+        version = f"{VERSION_PREFIX}{unique}"
+        os.makedirs(self._path(version))
+        arrays = {"vectors": self.vectors, "ids": self.ids, "components": self.components, "idf": self.idf}
+        for name, array in arrays.items():
+            with open(self._path(os.path.join(version, f"{name}.npy")), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+        manifest = {
+            "signature": signature,
+            "position": position,
+            "dimensions": self.dimensions,
+            "n_features": self.n_features,
+            "papers": len(self.ids),
+            "version": version,
+        }
+        temporary = self._path(f"{MANIFEST_FILE}.{unique}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._path(MANIFEST_FILE))
+        self._prune_versions(version)
+
+    def _prune_versions(self, current: str):
+        """Borrar las versiones reemplazadas hace más de VERSION_RETENTION_SECONDS (los memmaps abiertos siguen válidos)"""
+        cutoff = time.time() - VERSION_RETENTION_SECONDS
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if name == current or not name.startswith(VERSION_PREFIX) or not os.path.isdir(path):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path)
+            except OSError:
+                continue
+
+    def _read_manifest(self) -> Optional[Dict]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _open(self, db: Session) -> bool:
+        """
+        Abrir el ajuste persistido si su posición del change log sigue en el log, y reaplicar los cambios
+        posteriores como delta (también los que no tocan updated_at)
+        """
+        manifest = self._read_manifest()
+        if manifest is None or not resumable(
+            db, manifest.get("position"), lambda: manifest.get("signature") == corpus_signature(db)
+        ):
+            return False
+        if not self._map(manifest):
+            return False
+        try:
+            replay_changes(db, manifest["position"]["seq"], self.apply_changes)
+        except LookupError:
+            logger.info(f"Faltan cambios posteriores al índice semántico en {self.directory}: se reajusta")
+            self.reset()
+            return False
+        return True
+
+    def _map(self, manifest: Dict) -> bool:
+        """Abrir los vectores de la versión del manifiesto como memmap si corresponde a la configuración"""
+        if (manifest.get("dimensions"), manifest.get("n_features")) != (self.dimensions, self.n_features):
+            return False
+        version = manifest.get("version")
+        if not isinstance(version, str) or not version.startswith(VERSION_PREFIX) or os.path.basename(version) != version:
+            return False
+        try:
+            arrays = {name: np.load(self._path(os.path.join(version, f"{name}.npy")), mmap_mode="r") for name in ARRAY_FILES}
+        except (OSError, ValueError):
+            return False
+        if len(arrays["ids"]) != manifest.get("papers") or len(arrays["vectors"]) != manifest.get("papers"):
+            return False
+        self._clear()
+        self.vectors = arrays["vectors"]
+        self.ids = np.array(arrays["ids"])
+        self.components = np.array(arrays["components"])
+        self.idf = np.array(arrays["idf"])
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.rows = {int(paper_id): row for row, paper_id in enumerate(self.ids)}
+        self.memory_mapped = True
+        self._build_lsh()
+        self.built = True
+        return True
+
+    # Actualización incremental
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Vector unitario del texto en el espacio del modelo (None si no comparte términos)"""
+        if self.components is None:
+            return None
+        features = hashed_features(text, self.n_features)
+        if not features:
+            return None
+        columns = np.fromiter(features, dtype=np.int64, count=len(features))
+        weights = (1 + np.log(np.fromiter(features.values(), dtype=np.float32, count=len(features)))) * self.idf[columns]
+        vector = self.components[:, columns] @ weights
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def index_paper(self, paper_id: int, title: Optional[str], abstract: Optional[str]):
+        """Agregar o reproyectar un paper (el modelo no se reajusta por cada escritura)"""
+        with self.lock:
+            if not self.built:
+                return
+            self._remove(paper_id)
+            if self.components is None:
+                self.stale = True
+                return
+            vector = self.embed(paper_text(title, abstract))
+            if vector is None:
+                return
+            self.rows[paper_id] = len(self.ids) + len(self.delta_ids)
+            self.delta_vectors.append(vector.astype(np.float32))
+            self.delta_ids.append(paper_id)
+            self.delta_alive.append(True)
+
+    def _remove(self, paper_id: int):
+        row = self.rows.pop(paper_id, None)
+        if row is None:
+            return
+        if row < len(self.ids):
+            self.alive[row] = False
+        else:
+            self.delta_alive[row - len(self.ids)] = False
+
+    def remove_paper(self, paper_id: int):
+        with self.lock:
+            if self.built:
+                self._remove(paper_id)
+
+    def apply_changes(self, deltas: Iterable):
+        """Consumidor del change log: reproyectar los papers modificados y quitar los borrados"""
+        for delta in deltas:
+            if delta.row is None:
+                self.remove_paper(delta.paper_id)
+            else:
+                self.index_paper(delta.row.id, delta.row.title, delta.row.abstract)
+
+    # Consultas
+    def _delta_scores(self, vector: np.ndarray) -> np.ndarray:
+        if not self.delta_vectors:
+            return np.empty(0, dtype=np.float32)
+        scores = np.vstack(self.delta_vectors) @ vector
+        scores[~np.array(self.delta_alive)] = -np.inf
+        return scores
+
+    def nearest(self, vector: Optional[np.ndarray], k: int) -> List[Tuple[int, float]]:
+        """Papers más similares (id, coseno), descartando similitudes nulas"""
+        if vector is None or k <= 0:
+            return []
+        with self.lock:
+            rows = np.arange(len(self.ids))
+            if self.lsh is not None:
+                candidates = self.lsh.candidates(vector)
+                if len(candidates) >= k:
+                    rows = candidates
+            scores = np.asarray(self.vectors[rows] @ vector) if len(rows) else np.empty(0, dtype=np.float32)
+            scores[~self.alive[rows]] = -np.inf
+            ids = np.concatenate((self.ids[rows], np.array(self.delta_ids, dtype=np.int64)))
+            scores = np.concatenate((scores, self._delta_scores(vector)))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > MIN_SIMILARITY]
+
+    def similarities(self, vector: Optional[np.ndarray], paper_ids: Iterable[int]) -> Dict[int, float]:
+        """Coseno exacto contra papers puntuales (candidatos que vienen de la búsqueda por keywords)"""
+        if vector is None:
+            return {}
+        result = {}
+        with self.lock:
+            base = len(self.ids)
+            for paper_id in paper_ids:
+                row = self.rows.get(paper_id)
+                if row is None:
+                    continue
+                row_vector = self.vectors[row] if row < base else self.delta_vectors[row - base]
+                result[paper_id] = float(np.dot(row_vector, vector))
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "built": self.built,
+            "papers": len(self.rows),
+            "fitted_papers": len(self.ids),
+            "added_since_fit": len(self.delta_ids),
+            "dimensions": int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            "memory_mapped": self.memory_mapped,
+            "ann": self.lsh is not None,
+            "refitting": self.refitting,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+    def reset(self):
+        """Descartar el índice en memoria; se reabre o reajusta en el próximo ensure_built"""
+        with self.lock:
+            self._clear()
+            self.built = False
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+semantic_index = SemanticIndex(
+    settings.semantic_dimensions, settings.semantic_hash_features, settings.semantic_index_dir,
+    settings.semantic_ann_min_docs, settings.semantic_lsh_tables, settings.semantic_lsh_bits
+)
+
+def get_semantic_index(db: Session) -> SemanticIndex:
+    """Índice semántico del proceso (abierto al arrancar; tras un reset del feed se reabre con esta sesión)"""
+    semantic_index.ensure_built(db)
+    return semantic_index
@@ -0,0 +1,98 @@
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..database.models import User as DBUser, UserSession
+from ..config import settings
+from .revocation import revocation_list
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import hashlib
+import hmac
+import secrets
+
+def _hash_secret(secret: str) -> str:
+    # El refresh token es aleatorio de 256 bits: SHA-256 basta, no necesita bcrypt
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+def _split_refresh_token(refresh_token: str) -> Tuple[Optional[str], Optional[str]]:
+    session_id, _, secret = refresh_token.partition(".")
+    if not session_id or not secret:
+        return None, None
+    return session_id, secret
+
+def create_session(db: Session, user: DBUser) -> Tuple[UserSession, str]:
+    """Crear sesión y retornar el refresh token (formato <sid>.<secreto>)"""
+    secret = secrets.token_urlsafe(32)
+    session = UserSession(
+        id=secrets.token_hex(16),
+        user_id=user.id,
+        refresh_hash=_hash_secret(secret),
+        expires_at=datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days),
+    )
+    db.add(session)
+    db.commit()
+    return session, f"{session.id}.{secret}"
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> Optional[Tuple[UserSession, str]]:
+    """
+    Validar el refresh token y reemplazarlo por uno nuevo (rotación atómica: de dos usos concurrentes
+    solo uno rota). Reusar el refresh token ya rotado revoca la sesión completa; un secreto que nunca fue
+    de la sesión solo se rechaza (el sid es visible en los access tokens).
+    """
+    session_id, secret = _split_refresh_token(refresh_token)
+    if session_id is None:
+        return None
+    session = db.query(UserSession).filter(UserSession.id == session_id).first()
+    if session is None or session.revoked_at is not None or session.expires_at <= datetime.utcnow():
+        return None
+
+    presented = _hash_secret(secret)
+    new_secret = secrets.token_urlsafe(32)
+    rotated = db.query(UserSession).filter(
+        UserSession.id == session_id,
+        UserSession.refresh_hash == presented,
+        UserSession.revoked_at.is_(None),
+    ).update(
+        {UserSession.refresh_hash: _hash_secret(new_secret), UserSession.previous_hash: presented},
+        synchronize_session=False,
+    )
+    db.commit()
+    if rotated == 1:
+        return session, f"{session.id}.{new_secret}"
+
+    # Tras el commit la sesión se relee: previous_hash incluye una rotación concurrente
+    if session.previous_hash is not None and hmac.compare_digest(session.previous_hash, presented):
+        revoke_session(db, session_id)
+    return None
+
+def revoke_session(db: Session, session_id: str) -> bool:
+    """Revocar una sesión: su refresh token y sus access tokens dejan de ser válidos"""
+    updated = db.query(UserSession).filter(
+        UserSession.id == session_id, UserSession.revoked_at.is_(None)
+    ).update({UserSession.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    revocation_list.add(session_id)
+    return updated > 0
+
+def _revoke_active_sessions(connection: Connection, user_id: int) -> List[str]:
+    """Marcar revocadas las sesiones activas del usuario (sin commit) y agregarlas al filtro"""
+    active = (UserSession.user_id == user_id) & UserSession.revoked_at.is_(None)
+    session_ids: List[str] = list(connection.execute(select(UserSession.id).where(active)).scalars())
+    connection.execute(update(UserSession).where(active).values(revoked_at=datetime.utcnow()))
+    # Un positivo del filtro se confirma en la BD: si la transacción se revierte solo cuesta una consulta
+    for session_id in session_ids:
+        revocation_list.add(session_id)
+    return session_ids
+
+def revoke_user_sessions(db: Session, user_id: int) -> int:
+    """Revocar todas las sesiones activas de un usuario"""
+    session_ids = _revoke_active_sessions(db.connection(), user_id)
+    db.commit()
+    return len(session_ids)
+
+# Desactivar un usuario a través del ORM revoca sus sesiones en la misma transacción: sus refresh tokens
+# no vuelven a servir aunque se lo reactive
+@event.listens_for(DBUser, "after_update")
+def _revoke_on_deactivation(mapper, connection, target):
+    if inspect(target).attrs.is_active.history.has_changes() and not target.is_active:
+        _revoke_active_sessions(connection, target.id)
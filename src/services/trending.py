@@ -0,0 +1,406 @@
+from ..database.normalization import fold_text
+from ..config import settings
+from .sketches import CountMinSketch, HyperLogLog, cms_columns, hll_position
+from typing import Dict, List, Optional, Tuple
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Ventanas deslizantes: nombre -> (duración en segundos, buckets). Al cerrar un bucket se resta del sketch
+# de la ventana el bucket más viejo, así que la ventana avanza de a un bucket (1 minuto / 1 hora)
+TRENDING_WINDOWS = {"1h": (3600, 60), "24h": (86400, 24)}
+
+class SlidingHeavyHitters:
+    """
+    Consultas más frecuentes de una ventana deslizante: un Count-Min sketch por bucket más uno con la suma
+    de la ventana, y un heap con las `top_k` consultas de mayor frecuencia estimada (los candidatos se
+    reestiman al cerrar cada bucket). Los buscadores distintos se cuentan con un HyperLogLog por bucket
+    """
+
+    def __init__(self, window_seconds: int, buckets: int, top_k: int, width: int, depth: int, precision: int):
+        self.window_seconds = window_seconds
+        self.buckets = buckets
+        self.bucket_seconds = window_seconds / buckets
+        self.top_k = top_k
+        self.bucket_counters = np.zeros((buckets, depth, width), dtype=np.uint32)
+        self.window = CountMinSketch(width, depth)
+        self.registers = np.zeros((buckets, 1 << precision), dtype=np.uint8)
+        # Máximo de los registros de los buckets ya cerrados (se recalcula al rotar)
+        self.closed = HyperLogLog(precision)
+        self.searches = np.zeros(buckets, dtype=np.int64)
+        # Bucket vigente (tiempo // bucket_seconds); None = vacío
+        self.epoch: Optional[int] = None
+        self.top: Dict[str, int] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def _slot(self) -> int:
+        return self.epoch % self.buckets
+
+    def advance(self, now: float):
+        """Cerrar los buckets vencidos: restarlos de la ventana y reestimar los candidatos"""
+        self._advance_to(int(now // self.bucket_seconds))
+
+    def _advance_to(self, epoch: int):
+        if self.epoch is None:
+            self.epoch = epoch
+            return
+        if epoch <= self.epoch:
+            return
+        if epoch - self.epoch >= self.buckets:
+            self.bucket_counters[:] = 0
+            self.window.clear()
+            self.registers[:] = 0
+            self.searches[:] = 0
+        else:
+            for expired in range(self.epoch + 1, epoch + 1):
+                slot = expired % self.buckets
+                self.window.counters -= self.bucket_counters[slot]
+                self.bucket_counters[slot] = 0
+                self.registers[slot] = 0
+                self.searches[slot] = 0
+        self.epoch = epoch
+        self._close()
+        self._reestimate(self.columns)
+
+    def _close(self):
+        """Registros de los buckets cerrados (todos menos el vigente)"""
+        current = self.registers[self._slot()].copy()
+        self.registers[self._slot()] = 0
+        self.registers.max(axis=0, out=self.closed.registers)
+        self.registers[self._slot()] = current
+
+    def _reestimate(self, candidates: Dict[str, np.ndarray]):
+        estimates = {key: self.window.estimate(columns) for key, columns in candidates.items()}
+        ranked = heapq.nlargest(self.top_k, ((key, count) for key, count in estimates.items() if count), key=lambda item: item[1])
+        self.top = dict(ranked)
+        self.columns = {key: candidates[key] for key in self.top}
+        self._heap = [(count, key) for key, count in self.top.items()]
+        heapq.heapify(self._heap)
+
+    def restore(self, counters: np.ndarray, registers: np.ndarray, searches: np.ndarray, epoch: Optional[int], candidates: List[str]):
+        """Cargar el estado de un snapshot; la ventana es la suma de los buckets"""
+        self.bucket_counters[:] = counters
+        self.window.counters[:] = counters.sum(axis=0, dtype=np.uint32)
+        self.registers[:] = registers
+        self.searches[:] = searches
+        self.epoch = epoch
+        if epoch is not None:
+            self._close()
+        self._reestimate({key: self.window.columns(key) for key in candidates})
+
+    def record(self, key: str, columns: np.ndarray, searcher: Optional[Tuple[int, int]], now: float):
+        self.advance(now)
+        slot = self._slot()
+        self.bucket_counters[slot][self.window.rows, columns] += 1
+        self.window.add(columns)
+        self.searches[slot] += 1
+        if searcher is not None:
+            index, rank = searcher
+            if rank > self.registers[slot, index]:
+                self.registers[slot, index] = rank
+        self._offer(key, columns, self.window.estimate(columns))
+
+    def _offer(self, key: str, columns: np.ndarray, count: int):
+        if key not in self.top and len(self.top) >= self.top_k:
+            # Descartar las entradas del heap que ya no reflejan la estimación vigente de su consulta
+            while self._heap[0][0] != self.top.get(self._heap[0][1]):
+                heapq.heappop(self._heap)
+            if count <= self._heap[0][0]:
+                return
+            _, evicted = heapq.heappop(self._heap)
+            del self.top[evicted], self.columns[evicted]
+        self.top[key] = count
+        self.columns[key] = columns
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.top_k:
+            self._heap = [(count, key) for key, count in self.top.items()]
+            heapq.heapify(self._heap)
+
+    def merge(self, other: "SlidingHeavyHitters"):
+        """Sumar la ventana de otro worker (misma configuración): ambas se alinean al bucket más reciente"""
+        if other.epoch is None:
+            return
+        epoch = other.epoch if self.epoch is None else max(self.epoch, other.epoch)
+        self._advance_to(epoch)
+        other._advance_to(epoch)
+        self.bucket_counters += other.bucket_counters
+        self.window.counters += other.window.counters
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self.searches += other.searches
+        self._close()
+        self._reestimate({**other.columns, **self.columns})
+
+    def searchers(self) -> HyperLogLog:
+        """HyperLogLog de los buscadores de toda la ventana (buckets cerrados y vigente)"""
+        merged = HyperLogLog(self.closed.precision, self.closed.registers.copy())
+        if self.epoch is not None:
+            np.maximum(merged.registers, self.registers[self._slot()], out=merged.registers)
+        return merged
+
+    def distinct_searchers(self) -> int:
+        return self.searchers().count()
+
+    def summary(self, limit: int, now: float) -> Dict:
+        """Top `limit` consultas (frecuencia estimada, cota superior), búsquedas y buscadores distintos"""
+        self.advance(now)
+        ranked = heapq.nsmallest(limit, self.top.items(), key=lambda item: (-item[1], item[0]))
+        return {
+            "queries": [{"query": key, "count": count} for key, count in ranked],
+            "searches": int(self.searches.sum()),
+            "distinct_searchers": self.distinct_searchers(),
+        }
+
+def merged_summary(windows: List[SlidingHeavyHitters], limit: int, now: float) -> Dict:
+    """Resumen de la suma de las ventanas de varios workers: los sketches se suman y los HyperLogLog se unen"""
+    for window in windows:
+        window.advance(now)
+    counters = np.sum([window.window.counters for window in windows], axis=0, dtype=np.uint32)
+    total = CountMinSketch(windows[0].window.width, windows[0].window.depth, counters)
+    candidates = {key: columns for window in windows for key, columns in window.columns.items()}
+    estimates = [(key, total.estimate(columns)) for key, columns in candidates.items()]
+    ranked = heapq.nsmallest(limit, (item for item in estimates if item[1]), key=lambda item: (-item[1], item[0]))
+    searchers = windows[0].searchers()
+    for window in windows[1:]:
+        searchers.merge(window.searchers())
+    return {
+        "queries": [{"query": key, "count": count} for key, count in ranked],
+        "searches": int(sum(window.searches.sum() for window in windows)),
+        "distinct_searchers": searchers.count(),
+    }
+
+def _process_alive(worker_id: str) -> bool:
+    """Si el worker dueño de un snapshot (su pid) sigue corriendo"""
+    if not worker_id.isdigit():
+        return False
+    try:
+        os.kill(int(worker_id), 0)
+    except PermissionError:
+        return True
+    except (ProcessLookupError, OverflowError):
+        return False
+    return True
+
+class TrendingSearches:
+    """
+    Búsquedas en tendencia alimentadas desde el camino de búsqueda: cada búsqueda con resultados suma su
+    consulta normalizada a los sketches de cada ventana (memoria fija, sin leer search_logs). Cada worker
+    agrega sus búsquedas y un hilo las guarda en su propio snapshot (`<ruta>.<pid>.npz`); las consultas
+    suman los snapshots de los demás workers. Al arrancar, un worker adopta los snapshots de procesos que
+    ya no existen (renombrándolos, así cada uno se suma una sola vez)
+    """
+
+    def __init__(self, top_k: int, width: int, depth: int, precision: int, snapshot_path: str, snapshot_seconds: float,
+                 worker_id: Optional[str] = None):
+        self.config = {"top_k": top_k, "width": width, "depth": depth, "precision": precision}
+        self.snapshot_path = snapshot_path
+        self.snapshot_seconds = snapshot_seconds
+        self.worker_id = worker_id or str(os.getpid())
+        self.windows = self._new_windows()
+        self.snapshot_at: Optional[float] = None
+        # Snapshots de los demás workers: ruta -> (mtime, ventanas), releídos cada `snapshot_seconds`
+        self.peers: Dict[str, Tuple[int, Dict[str, SlidingHeavyHitters]]] = {}
+        self.peers_checked_at = 0.0
+        self._lock = threading.Lock()
+        self._peers_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, query: str, searcher: Optional[str] = None, now: Optional[float] = None):
+        """Sumar una búsqueda (consulta sin acentos/mayúsculas ni espacios repetidos) a todas las ventanas"""
+        key = " ".join(fold_text(query).split())
+        if not key:
+            return
+        columns = cms_columns(key, self.config["width"], self.config["depth"])
+        position = hll_position(searcher, self.config["precision"]) if searcher else None
+        now = time.time() if now is None else now
+        with self._lock:
+            for window in self.windows.values():
+                window.record(key, columns, position, now)
+
+    def trending(self, window: str, limit: int, now: Optional[float] = None) -> Dict:
+        """Top de la ventana sumando las búsquedas de este worker y los últimos snapshots de los demás"""
+        now = time.time() if now is None else now
+        with self._peers_lock:
+            self._refresh_peers()
+            peers = [windows[window] for _, windows in self.peers.values()]
+            with self._lock:
+                if peers:
+                    summary = merged_summary([self.windows[window]] + peers, limit, now)
+                else:
+                    summary = self.windows[window].summary(limit, now)
+        return {"window": window, **summary}
+
+    def _new_windows(self) -> Dict[str, SlidingHeavyHitters]:
+        return {
+            name: SlidingHeavyHitters(seconds, buckets, **self.config)
+            for name, (seconds, buckets) in TRENDING_WINDOWS.items()
+        }
+
+    def clear(self):
+        with self._lock:
+            self.windows = self._new_windows()
+
+    # Snapshots: un .npz por worker con los buckets de cada ventana y un encabezado JSON (configuración,
+    # bucket vigente y candidatos)
+    @property
+    def worker_path(self) -> Optional[str]:
+        if not self.snapshot_path:
+            return None
+        root, extension = os.path.splitext(self.snapshot_path)
+        return f"{root}.{self.worker_id}{extension}"
+
+    def _snapshot_files(self) -> Dict[str, str]:
+        """Snapshots de todos los workers (worker -> ruta), incluido el archivo único de versiones anteriores"""
+        root, extension = os.path.splitext(self.snapshot_path)
+        directory, prefix = os.path.dirname(root) or ".", os.path.basename(root) + "."
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return {}
+        files = {
+            name[len(prefix):-len(extension) if extension else None]: os.path.join(os.path.dirname(root), name)
+            for name in names if name.startswith(prefix) and name.endswith(extension)
+        }
+        files = {worker: path for worker, path in files.items() if worker and "." not in worker}
+        if os.path.exists(self.snapshot_path):
+            files[""] = self.snapshot_path
+        return files
+
+    def _refresh_peers(self):
+        if not self.snapshot_path or time.monotonic() - self.peers_checked_at < self.snapshot_seconds:
+            return
+        self.peers_checked_at = time.monotonic()
+        peers = {}
+        for worker, path in self._snapshot_files().items():
+            if worker == self.worker_id:
+                continue
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            cached = self.peers.get(path)
+            if cached is not None and cached[0] == mtime:
+                peers[path] = cached
+                continue
+            windows = self._read(path)
+            if windows is not None:
+                peers[path] = (mtime, windows)
+        self.peers = peers
+
+    def adopt_orphans(self) -> int:
+        """
+        Sumar a este worker su snapshot anterior y los de procesos que ya no existen, y guardarlo; los
+        adoptados se renombran antes de leerlos para que otro worker que arranca a la vez no los sume también
+        """
+        if not self.snapshot_path:
+            return 0
+        adopted = 0
+        for worker, path in self._snapshot_files().items():
+            if worker != self.worker_id and _process_alive(worker):
+                continue
+            claimed = f"{path}.{self.worker_id}.claim"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            adopted += self.load(claimed)
+            os.remove(claimed)
+        if adopted:
+            self.save()
+        return adopted
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.worker_path
+        if not path:
+            return
+        with self._lock:
+            arrays = {}
+            header = {"config": self.config, "windows": {}}
+            for name, window in self.windows.items():
+                arrays[f"{name}_counters"] = window.bucket_counters.copy()
+                arrays[f"{name}_registers"] = window.registers.copy()
+                arrays[f"{name}_searches"] = window.searches.copy()
+                header["windows"][name] = {"epoch": window.epoch, "top": list(window.top)}
+        arrays["header"] = np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporary, path)
+        self.snapshot_at = time.time()
+
+    def _read(self, path: str) -> Optional[Dict[str, SlidingHeavyHitters]]:
+        """Ventanas de un snapshot con la misma configuración (None si no existe o no corresponde)"""
+        if not os.path.exists(path):
+            return None
+        windows = self._new_windows()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                header = json.loads(data["header"].tobytes().decode("utf-8"))
+                if header["config"] != self.config or set(header["windows"]) != set(windows):
+                    logger.info(f"Snapshot de tendencias {path} con otra configuración: se descarta")
+                    return None
+                for name, window in windows.items():
+                    state = header["windows"][name]
+                    window.restore(
+                        data[f"{name}_counters"], data[f"{name}_registers"], data[f"{name}_searches"],
+                        state["epoch"], state["top"]
+                    )
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"No se pudo leer el snapshot de tendencias {path}: {e}")
+            return None
+        return windows
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Sumar a las ventanas las de un snapshot (por defecto el de este worker); los buckets vencidos se cierran al usarlas"""
+        windows = self._read(path or self.worker_path or "")
+        if windows is None:
+            return False
+        with self._lock:
+            for name, window in self.windows.items():
+                window.merge(windows[name])
+        return True
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Adoptar los snapshots sin dueño y guardar el de este worker cada `snapshot_seconds`"""
+        self.adopt_orphans()
+        if self.snapshot_path and self.snapshot_seconds > 0 and not self.running:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="trending-snapshots", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.save()
+        except OSError:
+            logger.exception("No se pudo guardar el snapshot de tendencias")
+
+    def _run(self):
+        while not self._stopped.wait(self.snapshot_seconds):
+            try:
+                self.save()
+            except OSError:
+                logger.exception("No se pudo guardar el snapshot de tendencias")
+
+trending_searches = TrendingSearches(
+    settings.trending_top_k, settings.trending_cms_width, settings.trending_cms_depth,
+    settings.trending_hll_precision, settings.trending_snapshot_path, settings.trending_snapshot_seconds
+)
@@ -0,0 +1,81 @@
+from sqlalchemy import event
+from ..database.models import User as DBUser
+from ..models.schemas import User
+from ..config import settings
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+
+class UserCache:
+    """Cache en memoria (LRU con TTL) de usuarios autenticados, indexado por user_id"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def put(self, user: User):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+user_cache = UserCache(settings.user_cache_ttl_seconds, settings.user_cache_max_entries)
+
+def cache_user(db_user: DBUser) -> User:
+    """Guardar un snapshot del usuario (sin hash de password) en el cache"""
+    user = User.model_validate(db_user)
+    user_cache.put(user)
+    return user
+
+def get_cached_user(user_id: int) -> Optional[User]:
+    """Obtener usuario del cache si no expiró"""
+    return user_cache.get(user_id)
+
+def invalidate_user(user_id: int):
+    """Eliminar usuario del cache (se llama automáticamente al actualizar o borrar)"""
+    user_cache.invalidate(user_id)
+
+def clear_user_cache():
+    """Limpiar cache de usuarios"""
+    user_cache.clear()
+
+# Invalidar en cualquier UPDATE/DELETE hecho a través del ORM
+@event.listens_for(DBUser, "after_update")
+@event.listens_for(DBUser, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_user(target.id)
@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Session
 from ..database.models import User as DBUser
 from ..models.schemas import UserCreate, UserLogin
-from .auth_service import get_password_hash, verify_password
+from .auth_service import get_password_hash, verify_and_update_password
 from typing import Optional
 
 def get_user_by_username(db: Session, username: str) -> Optional[DBUser]:
@@ -35,8 +35,14 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[DBU
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash is not None:
+        # Rehash transparente al esquema/costo actual
+        user.hashed_password = new_hash
+        db.commit()
+        db.refresh(user)
     return user
 
 def update_user_activity(db: Session, user_id: int):
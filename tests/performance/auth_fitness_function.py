@@ -13,6 +13,9 @@ from typing import List, Dict
 import os
 import sys
 
+from loop_lag_report import fetch_loop_lag, print_loop_lag, reset_loop_lag
+from flamegraph_report import print_flamegraph, reset_flamegraph, save_flamegraph
+
 # Asegurar que el directorio reports existe
 os.makedirs("reports", exist_ok=True)
 
@@ -386,15 +389,29 @@ async def main():
     tester = AuthPerformanceTester(args.base_url)
     
     try:
+        reset_loop_lag(args.base_url)
+        reset_flamegraph(args.base_url)
         results = await tester.run_concurrent_test(args.users, duration_seconds)
         analysis = tester.analyze_results(results, args.max_latency, args.scenario)
         
+        # Handlers que bloquearon el event loop durante la prueba (si ADMIN_TOKEN está configurado)
+        loop_lag = fetch_loop_lag(args.base_url)
+        if loop_lag is not None:
+            analysis["loop_lag"] = loop_lag
+        
+        # Flamegraph del profiler continuo, guardado junto a los reportes
+        flamegraph = save_flamegraph(args.base_url, f"auth_{args.scenario}")
+        if flamegraph is not None:
+            analysis["flamegraph"] = flamegraph
+        
         print(f"\n📊 Results:")
         print(f"   Status: {analysis['status']}")
         print(f"   Reason: {analysis['reason']}")
         print(f"   Success Rate: {analysis['success_rate']:.1f}%")
         print(f"   Avg Latency: {analysis['avg_latency_ms']:.1f}ms")
         print(f"   P95 Latency: {analysis['p95_latency_ms']:.1f}ms")
+        print_loop_lag(loop_lag)
+        print_flamegraph(flamegraph)
         
         save_results(results, analysis, args.scenario)
         
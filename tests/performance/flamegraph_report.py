@@ -0,0 +1,70 @@
+"""
+Flamegraph del profiler continuo durante las fitness functions
+Consulta /api/v1/admin/flamegraph (requiere ADMIN_TOKEN) y lo guarda junto a los reportes
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Stacks de interés para el análisis de CPU
+FOCUS = ("search_service", "paper_service", "pydantic")
+
+def _request(url: str, method: str = "GET") -> Optional[bytes]:
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return None
+    request = urllib.request.Request(url, method=method, headers={"X-Admin-Token": token})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read()
+    except urllib.error.URLError as e:
+        print(f"⚠️  No se pudo consultar el profiler continuo: {e}")
+        return None
+
+def reset_flamegraph(base_url: str):
+    """Descartar los stacks acumulados antes de la prueba"""
+    _request(f"{base_url}/api/v1/admin/flamegraph/reset", method="POST")
+
+def save_flamegraph(base_url: str, name: str, output_dir: str = "reports") -> Optional[Dict]:
+    """Guardar reports/flamegraph_<name>_<timestamp>.* y retornar las funciones más calientes"""
+    collapsed = _request(f"{base_url}/api/v1/admin/flamegraph?format=collapsed")
+    speedscope = _request(f"{base_url}/api/v1/admin/flamegraph?format=speedscope")
+    top = _request(f"{base_url}/api/v1/admin/flamegraph?format=top")
+    if collapsed is None or speedscope is None or top is None:
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"flamegraph_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    with open(f"{base}.collapsed", "wb") as f:
+        f.write(collapsed)
+    with open(f"{base}.speedscope.json", "wb") as f:
+        f.write(speedscope)
+
+    report = json.loads(top)
+    report["files"] = [f"{base}.collapsed", f"{base}.speedscope.json"]
+    report["focus"] = focus_samples(collapsed.decode())
+    return report
+
+def focus_samples(collapsed: str) -> Dict[str, int]:
+    """Muestras cuyo stack pasa por cada área de interés (FOCUS)"""
+    totals = {area: 0 for area in FOCUS}
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(" ")
+        for area in FOCUS:
+            if area in stack:
+                totals[area] += int(count)
+    return totals
+
+def print_flamegraph(report: Optional[Dict], limit: int = 10):
+    if not report:
+        return
+    stats = report["stats"]
+    print(f"\n🔥 Profiler continuo: {stats['samples']} muestras cada {stats['interval_ms']:.0f}ms")
+    focus: List[str] = [f"{area} {count}" for area, count in report["focus"].items()]
+    print(f"   Muestras por área: {', '.join(focus)}")
+    for function in report["functions"][:limit]:
+        print(f"   - {function['function']}: {function['inclusive_samples']} inclusivas, {function['own_samples']} propias")
+    print(f"   Flamegraph: {report['files'][1]}")
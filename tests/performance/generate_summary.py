@@ -80,6 +80,17 @@ def load_performance_results() -> Dict:
     
     return results
 
+def aggregate_blocking_handlers(results: Dict) -> List[Dict]:
+    """Combinar los handlers que bloquearon el event loop en todas las pruebas"""
+    handlers: Dict[str, Dict] = {}
+    for test in results["auth"] + results["search"]:
+        for handler in (test.get("loop_lag") or {}).get("blocking_handlers", []):
+            entry = handlers.setdefault(handler["route"], {"route": handler["route"], "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += handler["count"]
+            entry["total_ms"] += handler["total_ms"]
+            entry["max_ms"] = max(entry["max_ms"], handler["max_ms"])
+    return sorted(handlers.values(), key=lambda h: h["total_ms"], reverse=True)
+
 def generate_pr_comment(results: Dict) -> str:
     """Generar comentario para PR"""
     summary = results["summary"]
@@ -149,6 +160,15 @@ def generate_pr_comment(results: Dict) -> str:
     else:
         comment += "- No search tests found\n"
     
+    comment += "\n### 🌀 Event Loop Blocking\n\n"
+    blocking = aggregate_blocking_handlers(results)
+    if blocking:
+        comment += "| Handler | Bloqueos | Total | Máximo |\n|---------|----------|-------|--------|\n"
+        for handler in blocking[:10]:
+            comment += f"| `{handler['route']}` | {handler['count']} | {handler['total_ms']:.0f}ms | {handler['max_ms']:.0f}ms |\n"
+    else:
+        comment += "- Sin bloqueos sobre el umbral (o ADMIN_TOKEN no configurado)\n"
+    
     comment += f"""
 ### 📈 Quality Gates
 
@@ -195,6 +215,17 @@ def generate_html_report(results: Dict) -> str:
         </tr>
         """
     
+    blocking_rows = ""
+    for handler in aggregate_blocking_handlers(results):
+        blocking_rows += f"""
+        <tr>
+            <td><code>{handler['route']}</code></td>
+            <td>{handler['count']}</td>
+            <td>{handler['total_ms']:.0f} ms</td>
+            <td>{handler['max_ms']:.0f} ms</td>
+        </tr>
+        """
+    
     html_content = f"""
     <!DOCTYPE html>
     <html>
@@ -272,6 +303,21 @@ def generate_html_report(results: Dict) -> str:
                 </tbody>
             </table>
             
+            <h2>🌀 Handlers que bloquean el event loop</h2>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Handler</th>
+                        <th>Bloqueos</th>
+                        <th>Tiempo total</th>
+                        <th>Máximo</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {blocking_rows if blocking_rows else '<tr><td colspan="4">Sin bloqueos sobre el umbral</td></tr>'}
+                </tbody>
+            </table>
+            
             <h2>📊 Fitness Functions Definition</h2>
             
             <h3>f(latencia) - Authentication Service</h3>
@@ -318,6 +364,8 @@ def main():
     with open("reports/summary/performance_summary.html", "w") as f:
         f.write(html_report)
     
+    results["blocking_handlers"] = aggregate_blocking_handlers(results)
+    
     # Guardar resultados JSON
     with open("reports/summary/performance_summary.json", "w") as f:
         json.dump(results, f, indent=2)
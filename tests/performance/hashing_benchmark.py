@@ -0,0 +1,71 @@
+"""
+Benchmark de hashing de passwords
+Objetivo: comparar bcrypt, argon2id y PBKDF2 con costos fijos y calibrados al host
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+def measure(label: str, func, iterations: int) -> dict:
+    """Ejecutar func N veces y calcular latencia media y throughput"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return {
+        "case": label,
+        "iterations": iterations,
+        "ms_per_op": elapsed / iterations * 1000,
+        "ops_per_second": iterations / elapsed,
+    }
+
+def run_benchmarks(iterations: int, target_ms: float) -> list:
+    from src.services.password_hashers import create_registry
+
+    registry = create_registry()
+    results = []
+    for scheme in registry.schemes():
+        if scheme == "legacy_hex":
+            continue
+        hasher = registry.get(scheme)
+        configured = hasher.cost
+        calibrated = hasher.calibrate(target_ms)
+        for label, cost in (("configurado", configured), ("calibrado", calibrated)):
+            hasher.cost = cost
+            hashed = hasher.hash("benchmark-password")
+            result = measure(
+                f"{scheme} verify ({label}, costo={cost})",
+                lambda: hasher.verify("benchmark-password", hashed),
+                iterations
+            )
+            result.update({"scheme": scheme, "cost": cost, "target_ms": target_ms})
+            results.append(result)
+        hasher.cost = configured
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Password Hashing Benchmark")
+    parser.add_argument("--iterations", type=int, default=10, help="Verificaciones por caso")
+    parser.add_argument("--target-ms", type=float, default=100, help="Tiempo objetivo de calibración")
+    parser.add_argument("--output", type=str, default="reports/hashing_benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    print(f"🔐 Hashing Benchmark - {args.iterations} verificaciones por caso, objetivo {args.target_ms:.0f}ms")
+    results = run_benchmarks(args.iterations, args.target_ms)
+
+    print(f"\n{'Caso':<48} {'ms/op':>9} {'ops/s':>9}")
+    for result in results:
+        print(f"{result['case']:<48} {result['ms_per_op']:>9.1f} {result['ops_per_second']:>9.1f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "results": results}, f, indent=2)
+    print(f"\n📊 Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark de verificación JWT
+Objetivo: comparar python-jose vs PyJWT (HS256 y EdDSA) y el camino rápido con cache
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+def measure(label: str, func, iterations: int) -> dict:
+    """Ejecutar func N veces y calcular operaciones por segundo"""
+    func()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return {
+        "case": label,
+        "iterations": iterations,
+        "ops_per_second": iterations / elapsed,
+        "us_per_op": elapsed / iterations * 1_000_000,
+    }
+
+def generate_ed25519_keys():
+    """Generar par de claves Ed25519 en PEM (requiere cryptography)"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    private_key = Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+def run_benchmarks(iterations: int) -> list:
+    from jose import jwt as jose_jwt
+    from src.config import settings
+    from src.services import auth_service
+    from src.services.jwt_backends import create_backend, pyjwt
+
+    claims = {"sub": "benchmark", "uid": 1, "act": True, "exp": datetime.utcnow() + timedelta(hours=1)}
+    results = []
+
+    # Referencia: decode de python-jose construyendo la clave en cada llamada (implementación anterior)
+    token = jose_jwt.encode(claims, settings.jwt_secret_key, algorithm="HS256")
+    results.append(measure(
+        "jose HS256 (clave por llamada)",
+        lambda: jose_jwt.decode(token, settings.jwt_secret_key, algorithms=["HS256"]),
+        iterations
+    ))
+
+    jose_backend = create_backend("jose", "HS256")
+    results.append(measure("jose HS256 (clave preconstruida)", lambda: jose_backend.decode(token), iterations))
+
+    if pyjwt is not None:
+        pyjwt_backend = create_backend("pyjwt", "HS256")
+        results.append(measure("pyjwt HS256", lambda: pyjwt_backend.decode(token), iterations))
+        try:
+            settings.jwt_private_key, settings.jwt_public_key = generate_ed25519_keys()
+            eddsa_backend = create_backend("pyjwt", "EdDSA")
+            eddsa_token = eddsa_backend.encode(claims)
+            results.append(measure("pyjwt EdDSA", lambda: eddsa_backend.decode(eddsa_token), iterations))
+        except ImportError:
+            print("⚠️  cryptography no instalado: se omite EdDSA")
+    else:
+        print("⚠️  PyJWT no instalado: se omiten los casos pyjwt")
+
+    app_token = auth_service.create_access_token({"sub": "benchmark", "uid": 1, "act": True})
+    auth_service.verified_tokens.clear()
+    results.append(measure(
+        "verify_token_claims (LRU)",
+        lambda: auth_service.verify_token_claims(app_token),
+        iterations
+    ))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="JWT Verification Benchmark")
+    parser.add_argument("--iterations", type=int, default=20000, help="Iteraciones por caso")
+    parser.add_argument("--output", type=str, default="reports/jwt_benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    print(f"🔑 JWT Benchmark - {args.iterations} iteraciones por caso")
+    results = run_benchmarks(args.iterations)
+
+    baseline = results[0]["ops_per_second"]
+    print(f"\n{'Caso':<36} {'ops/s':>12} {'µs/op':>10} {'speedup':>9}")
+    for result in results:
+        speedup = result["ops_per_second"] / baseline
+        print(f"{result['case']:<36} {result['ops_per_second']:>12,.0f} {result['us_per_op']:>10.2f} {speedup:>8.1f}x")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "results": results}, f, indent=2)
+    print(f"\n📊 Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Lag del event loop durante las fitness functions
+Consulta /api/v1/admin/loop-lag (requiere ADMIN_TOKEN) para reportar qué handlers bloquean el loop
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Dict, Optional
+
+def _request(url: str, method: str = "GET") -> Optional[Dict]:
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return None
+    request = urllib.request.Request(url, method=method, headers={"X-Admin-Token": token})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ValueError) as e:
+        print(f"⚠️  No se pudo consultar el monitor de lag: {e}")
+        return None
+
+def reset_loop_lag(base_url: str):
+    """Reiniciar las estadísticas antes de la prueba"""
+    _request(f"{base_url}/api/v1/admin/loop-lag/reset", method="POST")
+
+def fetch_loop_lag(base_url: str, max_events: int = 5) -> Optional[Dict]:
+    """Obtener lag del loop, handlers bloqueantes y los stacks de los peores bloqueos"""
+    report = _request(f"{base_url}/api/v1/admin/loop-lag")
+    if report is None:
+        return None
+    report["events"] = sorted(report.get("events", []), key=lambda e: e["lag_ms"], reverse=True)[:max_events]
+    return report
+
+def print_loop_lag(report: Optional[Dict]):
+    if not report:
+        return
+    lag = report["lag"]
+    print(f"\n🌀 Event loop lag: p50 {lag['p50_ms']:.1f}ms, p99 {lag['p99_ms']:.1f}ms, max {lag['max_ms']:.1f}ms")
+    for handler in report["blocking_handlers"][:10]:
+        print(f"   - {handler['route']}: {handler['count']} bloqueos, {handler['total_ms']:.0f}ms total, max {handler['max_ms']:.0f}ms")
@@ -0,0 +1,232 @@
+"""
+Verificador de planes de consulta para el SQL caliente
+Objetivo: capturar el SQL que emite cada función de servicio, ejecutar EXPLAIN QUERY PLAN
+sobre una base sembrada y fallar si una consulta caliente hace SCAN en lugar de usar un índice.
+También reporta cuántas consultas ejecuta cada endpoint por request.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
+
+# Pasos del plan que indican trabajo proporcional al tamaño de la tabla
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT = re.compile(r"^USE TEMP B-TREE FOR (ORDER|GROUP) BY$")
+
+class HotQuery:
+    """Función de servicio caliente y los pasos de plan permitidos (con su justificación)"""
+
+    def __init__(self, name: str, run: Callable[[Session], object], allow: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.run = run
+        self.allow = allow or {}
+
+def _hot_queries() -> List[HotQuery]:
+    from src.services import paper_service, user_service
+
+    return [
+        HotQuery("search_papers", lambda db: paper_service.search_papers(db, "learning"), {
+            "SCAN papers": "LIKE '%q%' sobre title_norm no puede usar un índice B-tree",
+        }),
+        HotQuery("search_papers_by_author", lambda db: paper_service.search_papers_by_author(db, "Smith"), {
+            "SCAN papers": "LIKE '%q%' sobre authors_norm no puede usar un índice B-tree",
+        }),
+        HotQuery("get_papers", lambda db: paper_service.get_papers(db, skip=500, limit=10), {
+            "SCAN papers": "paginación con OFFSET sin ORDER BY: recorre skip + limit filas, no la tabla",
+        }),
+        HotQuery("get_popular_papers", lambda db: paper_service.get_popular_papers(db, limit=10)),
+        HotQuery("get_paper_by_id", lambda db: paper_service.get_paper_by_id(db, 42)),
+        HotQuery("get_paper_by_doi", lambda db: paper_service.get_paper_by_doi(db, "10.1000/qp.42")),
+        HotQuery("get_user_by_username", lambda db: user_service.get_user_by_username(db, "qp_user_7")),
+        HotQuery("get_user_by_email", lambda db: user_service.get_user_by_email(db, "qp_user_7@example.com")),
+    ]
+
+# Presupuesto de consultas SQL por request (method, ruta) -> máximo
+QUERY_BUDGETS = {
+    ("GET", "/api/v1/papers/?limit=10"): 1,
+    ("GET", "/api/v1/papers/?skip=500&limit=10"): 1,
+    ("GET", "/api/v1/papers/popular?limit=10"): 1,
+    ("GET", "/api/v1/papers/42"): 1,
+    # Búsqueda (sin cache) + INSERT en search_logs
+    ("GET", "/api/v1/search/papers?q=learning"): 2,
+    ("GET", "/api/v1/search/authors?q=Smith"): 2,
+}
+
+@contextmanager
+def capture_sql(engine):
+    """Registrar (sql, parámetros) de cada sentencia que se ejecuta en el engine"""
+    statements: List[tuple] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def explain(engine, statement: str, parameters) -> List[str]:
+    """Pasos (detail) del EXPLAIN QUERY PLAN de una sentencia"""
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+def plan_problems(steps: List[str]) -> List[str]:
+    """Pasos del plan que recorren la tabla completa u ordenan en memoria"""
+    return [step for step in steps if FULL_SCAN.match(step) or TEMP_SORT.match(step)]
+
+def _seed_paper(i: int) -> Dict:
+    from src.database.normalization import normalized_paper_columns
+
+    paper = {
+        "title": f"Paper {i} on {'machine learning' if i % 3 == 0 else 'databases'}",
+        "authors": json.dumps([f"Author {i % 50}", "Smith" if i % 7 == 0 else "Doe"]),
+        "keywords": json.dumps(["ml" if i % 3 == 0 else "db"]),
+        "year": 2000 + i % 25,
+        "doi": f"10.1000/qp.{i}",
+        "citations": (i * 37) % 1000,
+    }
+    paper.update(normalized_paper_columns(paper["title"], paper["authors"], paper["keywords"]))
+    return paper
+
+def seed_database(engine, papers: int = 2000, users: int = 200):
+    """Crear el schema y sembrar datos para que el planner vea tablas no triviales"""
+    from src.database.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM papers"))
+        conn.execute(text("DELETE FROM users"))
+        conn.execute(
+            text(
+                "INSERT INTO users (username, email, hashed_password, is_active, created_at) "
+                "VALUES (:username, :email, 'x', 1, CURRENT_TIMESTAMP)"
+            ),
+            [{"username": f"qp_user_{i}", "email": f"qp_user_{i}@example.com"} for i in range(users)],
+        )
+        conn.execute(
+            text(
+                "INSERT INTO papers (title, abstract, authors, publication_year, doi, keywords, citation_count, "
+                "created_at, updated_at, title_norm, authors_norm, keywords_norm) "
+                "VALUES (:title, 'abstract', :authors, :year, :doi, :keywords, :citations, "
+                "CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, :title_norm, :authors_norm, :keywords_norm)"
+            ),
+            [_seed_paper(i) for i in range(papers)],
+        )
+        conn.execute(text("ANALYZE"))
+
+def check_query_plans(engine) -> List[Dict]:
+    """Ejecutar cada consulta caliente, capturar su SQL y evaluar el plan contra su allowlist"""
+    SessionFactory = sessionmaker(bind=engine)
+    results = []
+    for hot in _hot_queries():
+        db = SessionFactory()
+        try:
+            with capture_sql(engine) as statements:
+                hot.run(db)
+        finally:
+            db.close()
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            steps = explain(engine, statement, parameters)
+            problems = plan_problems(steps)
+            results.append({
+                "query": hot.name,
+                "sql": " ".join(statement.split()),
+                "plan": steps,
+                "allowed": {step: hot.allow[step] for step in problems if step in hot.allow},
+                "violations": [step for step in problems if step not in hot.allow],
+            })
+    return results
+
+def measure_queries_per_request(engine, budgets: Optional[Dict] = None) -> List[Dict]:
+    """Contar las sentencias SQL de cada endpoint (un request por entrada del presupuesto)"""
+    from fastapi.testclient import TestClient
+    from src.database import get_db
+    from src.main import app
+    from src.services.search_service import clear_search_cache
+
+    SessionFactory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    results = []
+    try:
+        client = TestClient(app)
+        for (method, path), budget in (budgets or QUERY_BUDGETS).items():
+            clear_search_cache()
+            with capture_sql(engine) as statements:
+                response = client.request(method, path)
+            results.append({
+                "endpoint": f"{method} {path}",
+                "status_code": response.status_code,
+                "queries": len(statements),
+                "budget": budget,
+                "over_budget": len(statements) > budget,
+            })
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous
+    return results
+
+def print_report(plans: List[Dict], requests: List[Dict]):
+    print("\n🔎 Planes de consulta:")
+    for result in plans:
+        mark = "❌" if result["violations"] else "✅"
+        print(f"   {mark} {result['query']}: {' | '.join(result['plan'])}")
+        for step in result["violations"]:
+            print(f"      - {step} (sin allowlist)")
+        for step, reason in result["allowed"].items():
+            print(f"      - {step} (permitido: {reason})")
+    print("\n📈 Consultas por request:")
+    for result in requests:
+        mark = "❌" if result["over_budget"] else "✅"
+        print(f"   {mark} {result['endpoint']}: {result['queries']} (presupuesto {result['budget']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plan regression checker")
+    parser.add_argument("--papers", type=int, default=2000, help="Papers a sembrar")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios a sembrar")
+    parser.add_argument("--output", default="reports", help="Directorio del reporte JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'query_plans.db')}", connect_args={"check_same_thread": False})
+        seed_database(engine, args.papers, args.users)
+        plans = check_query_plans(engine)
+        requests = measure_queries_per_request(engine)
+        engine.dispose()
+
+    print_report(plans, requests)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"query_plans_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump({"query_plans": plans, "queries_per_request": requests}, f, indent=2)
+    print(f"\n📊 Reporte guardado en {path}")
+
+    failed = any(result["violations"] for result in plans) or any(result["over_budget"] for result in requests)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
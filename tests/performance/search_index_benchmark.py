@@ -0,0 +1,144 @@
+"""
+Benchmark del índice de búsqueda tolerante a errores
+Objetivo: construcción del vocabulario, actualización incremental, latencia de "did you mean" y
+de facetas sobre todas las coincidencias (pocos ms), y arranque en frío desde el archivo mmap
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+WORDS = (
+    "neural network learning deep reinforcement representation graph quantum entanglement "
+    "segmentation vision language model transformer attention retrieval database index query "
+    "optimization compiler distributed consensus blockchain security privacy federated robust "
+    "garcia lopez perez silva martinez rodriguez sanchez ramirez torres flores"
+).split()
+
+def synthetic_word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 11)))
+
+def typo(word: str, rng: random.Random) -> str:
+    """Introducir un error: transposición, borrado o sustitución"""
+    i = rng.randrange(len(word) - 1)
+    kind = rng.choice(("swap", "delete", "replace"))
+    if kind == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == "delete":
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+def run_benchmark(papers: int, vocabulary: int, queries: int) -> dict:
+    from src.services.search_index import SearchIndex
+
+    rng = random.Random(42)
+    extra = [synthetic_word(rng) for _ in range(vocabulary)]
+    index = SearchIndex(max_distance=2, min_similarity=0.4)
+    index.built = True
+
+    pool = list(WORDS) + extra
+    documents = [
+        (
+            " ".join(rng.choice(pool) for _ in range(8)),
+            json.dumps([f"{rng.choice(WORDS)} {rng.choice(extra)}"]),
+            json.dumps(rng.sample(WORDS, 3)),
+        )
+        for _ in range(papers)
+    ]
+    started = time.perf_counter()
+    for paper_id, (title, authors, keywords) in enumerate(documents):
+        index.index_paper(paper_id, title, authors, keywords, rng.randint(1990, 2024))
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index.prepare_spelling()
+    spelling_seconds = time.perf_counter() - started
+    terms = list(index.frequencies)
+    misspelled = [f"{typo(rng.choice(terms), rng)} {typo(rng.choice(terms), rng)}" for _ in range(queries)]
+    latencies = []
+    for query in misspelled:
+        started = time.perf_counter()
+        index.suggest(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    # Facetas de año/keyword/autor para consultas de un término frecuente (conjuntos grandes) y uno raro
+    facet_latencies = []
+    for term in [rng.choice(WORDS) for _ in range(queries // 2)] + [rng.choice(extra) for _ in range(queries // 2)]:
+        matches = index.term_bitmap("title", term)
+        started = time.perf_counter()
+        index.facet_summary(matches, ("year", "keyword", "author"), 10)
+        facet_latencies.append((time.perf_counter() - started) * 1000)
+    facet_latencies.sort()
+
+    # Persistencia: escribir el archivo, abrirlo como otro worker y resolver la primera consulta
+    from src.services.index_store import IndexSnapshot
+    from src.services.query_language import execute_query
+    directory = tempfile.mkdtemp(prefix="search_index_benchmark_")
+    try:
+        path = os.path.join(directory, "search_index.idx")
+        started = time.perf_counter()
+        index.save(path, {"papers": papers}, {"seq": 0, "change": None})
+        save_seconds = time.perf_counter() - started
+        file_bytes = os.path.getsize(path)
+        started = time.perf_counter()
+        warm = SearchIndex(max_distance=2, min_similarity=0.4, path=path)
+        warm.open_snapshot(IndexSnapshot(path))
+        open_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        execute_query(warm, f"{WORDS[0]} {WORDS[1]}", 0, 10)
+        first_query_ms = (time.perf_counter() - started) * 1000
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "papers": papers,
+        **index.stats(),
+        "index_seconds": build_seconds,
+        "papers_per_second": papers / build_seconds,
+        "spelling_seconds": spelling_seconds,
+        "suggest_p50_ms": latencies[len(latencies) // 2],
+        "suggest_p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "facets_p50_ms": facet_latencies[len(facet_latencies) // 2],
+        "facets_p99_ms": facet_latencies[min(len(facet_latencies) - 1, int(len(facet_latencies) * 0.99))],
+        "save_seconds": save_seconds,
+        "file_bytes": file_bytes,
+        "open_seconds": open_seconds,
+        "first_query_ms": first_query_ms,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Search Index Benchmark")
+    parser.add_argument("--papers", type=int, default=20000, help="Papers sintéticos a indexar")
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Términos sintéticos adicionales")
+    parser.add_argument("--queries", type=int, default=500, help="Consultas con errores a corregir")
+    parser.add_argument("--output", type=str, default="reports/search_index_benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    print(f"🔤 Search Index Benchmark - {args.papers} papers, {args.queries} consultas con errores")
+    result = run_benchmark(args.papers, args.vocabulary, args.queries)
+    print(f"   Términos: {result['terms']}, borrados SymSpell: {result['deletes']}")
+    print(f"   Indexación: {result['index_seconds']:.2f}s ({result['papers_per_second']:.0f} papers/s)")
+    print(f"   Corrector ortográfico (fuera del lock): {result['spelling_seconds']:.2f}s")
+    print(f"   Sugerencia: p50 {result['suggest_p50_ms']:.2f}ms, p99 {result['suggest_p99_ms']:.2f}ms")
+    print(f"   Facetas: p50 {result['facets_p50_ms']:.2f}ms, p99 {result['facets_p99_ms']:.2f}ms")
+    print(f"   Bitmaps: {result['bitmap_bytes'] / 1024:.0f} KB")
+    print(f"   Archivo: {result['file_bytes'] / 1024:.0f} KB escrito en {result['save_seconds']:.2f}s")
+    print(f"   Arranque desde mmap: {result['open_seconds'] * 1000:.1f}ms (vs {result['index_seconds']:.2f}s de indexación), "
+          f"primera consulta {result['first_query_ms']:.2f}ms")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "result": result}, f, indent=2)
+    print(f"\n📊 Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark del índice semántico (TF-IDF + SVD truncada)
+Objetivo: ajuste en segundos para decenas de miles de papers, apertura por memmap casi instantánea,
+top-k en pocos ms y recall@10 de LSH frente al coseno exacto
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Temas sintéticos: cada paper mezcla vocabulario de uno o dos temas
+TOPICS = [
+    "neural network deep learning convolutional image vision classification training gradient",
+    "quantum qubit entanglement superconducting decoherence error correction gate circuit",
+    "database query index transaction optimizer storage relational join plan",
+    "protein folding genome sequence molecular biology cell expression gene",
+    "climate carbon emission temperature ocean atmosphere model warming",
+    "graph network community detection spectral clustering node edge embedding",
+    "language translation transformer attention text corpus token semantic",
+    "robot control motion planning reinforcement policy navigation sensor",
+]
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def synthetic_papers(count: int, rng: random.Random):
+    vocabularies = [topic.split() for topic in TOPICS]
+    for paper_id in range(1, count + 1):
+        topics = rng.sample(range(len(TOPICS)), rng.choice((1, 1, 2)))
+        words = [rng.choice(vocabularies[rng.choice(topics)]) for _ in range(40)]
+        yield paper_id, " ".join(words)
+
+def run_benchmark(papers: int, queries: int, dimensions: int) -> dict:
+    from src.services.semantic_index import SemanticIndex
+
+    rng = random.Random(42)
+    documents = list(synthetic_papers(papers, rng))
+    directory = tempfile.mkdtemp(prefix="semantic_benchmark_")
+    try:
+        exact = SemanticIndex(dimensions, 32768, directory, papers + 1, 8, 12)
+        started = time.perf_counter()
+        exact.fit(documents)
+        fit_seconds = time.perf_counter() - started
+        exact._save({"seq": 0, "change": None}, {"papers": papers, "updated_at": None})
+
+        # Solo la apertura por memmap (sin BD no hay change log que reaplicar)
+        approximate = SemanticIndex(dimensions, 32768, directory, 0, 8, 12)
+        started = time.perf_counter()
+        opened = approximate._map(approximate._read_manifest())
+        open_seconds = time.perf_counter() - started
+
+        texts = [" ".join(rng.sample(TOPICS[rng.randrange(len(TOPICS))].split(), 3)) for _ in range(queries)]
+        exact_latencies, ann_latencies, recalls = [], [], []
+        for text in texts:
+            vector = exact.embed(text)
+            started = time.perf_counter()
+            expected = {paper_id for paper_id, _ in exact.nearest(vector, 10)}
+            exact_latencies.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            found = {paper_id for paper_id, _ in approximate.nearest(vector, 10)}
+            ann_latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(expected & found) / max(len(expected), 1))
+        exact_latencies.sort()
+        ann_latencies.sort()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "papers": papers,
+        "dimensions": exact.stats()["dimensions"],
+        "fit_seconds": fit_seconds,
+        "memmap_opened": opened,
+        "open_seconds": open_seconds,
+        "exact_p50_ms": percentile(exact_latencies, 0.5),
+        "exact_p99_ms": percentile(exact_latencies, 0.99),
+        "lsh_p50_ms": percentile(ann_latencies, 0.5),
+        "lsh_p99_ms": percentile(ann_latencies, 0.99),
+        "lsh_recall_at_10": sum(recalls) / len(recalls),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic Index Benchmark")
+    parser.add_argument("--papers", type=int, default=50000, help="Papers sintéticos a indexar")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas a medir")
+    parser.add_argument("--dimensions", type=int, default=128, help="Dimensiones de la SVD truncada")
+    parser.add_argument("--output", type=str, default="reports/semantic_benchmark.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    print(f"🧭 Semantic Index Benchmark - {args.papers} papers, {args.queries} consultas")
+    result = run_benchmark(args.papers, args.queries, args.dimensions)
+    print(f"   Ajuste: {result['fit_seconds']:.2f}s ({result['dimensions']} dimensiones)")
+    print(f"   Apertura memmap: {result['open_seconds'] * 1000:.1f}ms")
+    print(f"   Coseno exacto: p50 {result['exact_p50_ms']:.2f}ms, p99 {result['exact_p99_ms']:.2f}ms")
+    print(f"   LSH: p50 {result['lsh_p50_ms']:.2f}ms, p99 {result['lsh_p99_ms']:.2f}ms, recall@10 {result['lsh_recall_at_10']:.2f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "result": result}, f, indent=2)
+    print(f"\n📊 Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
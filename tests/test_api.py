@@ -1,4 +1,5 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -22,11 +23,28 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 
 @pytest.fixture(scope="session")
-def client():
+def client(tmp_path_factory):
     """Cliente de pruebas para FastAPI"""
+    from src.config import settings
+    from src.services.search_index import search_index
+    from src.services.semantic_index import semantic_index
+    from src.services.trending import trending_searches
+    # Índices y snapshots persistidos en un directorio temporal, no en data/
+    data = tmp_path_factory.mktemp("data")
+    paths = {
+        "search_index_path": str(data / "search_index.idx"),
+        "semantic_index_dir": str(data / "semantic"),
+        "trending_snapshot_path": str(data / "trending.npz"),
+    }
     Base.metadata.create_all(bind=engine)
-    with TestClient(app) as c:
-        yield c
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in paths.items():
+            patch.setattr(settings, name, value)
+        patch.setattr(search_index, "path", paths["search_index_path"])
+        patch.setattr(semantic_index, "directory", paths["semantic_index_dir"])
+        patch.setattr(trending_searches, "snapshot_path", paths["trending_snapshot_path"])
+        with TestClient(app) as c:
+            yield c
     Base.metadata.drop_all(bind=engine)
 
 def test_health_check(client):
@@ -152,3 +170,1194 @@ def test_search_suggestions(client):
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
+
+def get_auth_headers(client, username="bulkuser", password="bulkpassword"):
+    """Registrar (si no existe) e iniciar sesión para obtener headers con token"""
+    client.post("/api/v1/auth/register", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": password
+    })
+    response = client.post("/api/v1/auth/login", data={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_bulk_import_papers_ndjson(client):
+    """Test de carga masiva NDJSON con errores por fila"""
+    lines = [
+        '{"title": "Bulk Paper 1", "authors": ["A"], "doi": "10.1000/bulk.1"}',
+        '{"title": "Bulk Paper 2", "doi": "10.1000/bulk.1"}',
+        '{"abstract": "sin titulo"}',
+        'no es json',
+        '{"title": "Bulk Paper 3", "keywords": ["bulk"]}',
+    ]
+    files = {"file": ("papers.ndjson", "\n".join(lines), "application/x-ndjson")}
+    response = client.post("/api/v1/papers/bulk", files=files, headers=get_auth_headers(client))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_rows"] == 5
+    assert data["inserted"] == 2
+    assert data["failed"] == 3
+    assert sorted(error["row"] for error in data["errors"]) == [2, 3, 4]
+
+def test_bulk_import_papers_csv(client):
+    """Test de carga masiva CSV con conflicto de DOI existente"""
+    content = (
+        "title,authors,publication_year,doi,keywords\n"
+        "CSV Paper,Autor Uno;Autor Dos,2023,10.1000/bulk.csv,ml;data\n"
+        "CSV Duplicado,Autor,2023,10.1000/bulk.1,\n"
+    )
+    files = {"file": ("papers.csv", content, "text/csv")}
+    response = client.post("/api/v1/papers/bulk", files=files, headers=get_auth_headers(client))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 1
+    assert data["errors"][0]["doi"] == "10.1000/bulk.1"
+    
+    response = client.get("/api/v1/search/papers?q=CSV Paper")
+    assert response.json()["results"][0]["authors"] == ["Autor Uno", "Autor Dos"]
+
+def test_export_papers_ndjson(client):
+    """Test de exportación en streaming NDJSON"""
+    response = client.get("/api/v1/papers/export?format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) > 0
+    assert isinstance(rows[0]["authors"], list)
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+def test_export_search_logs_csv(client, monkeypatch):
+    """Test de exportación CSV de logs de búsqueda (solo administración)"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    client.get("/api/v1/search/papers?q=Machine")
+    assert client.get("/api/v1/search/logs/export?format=csv").status_code == 403
+    response = client.get("/api/v1/search/logs/export?format=csv", headers={"X-Admin-Token": "test-admin-token"})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,query,user_id,results_count,search_type,created_at"
+    assert len(lines) > 1
+
+def test_export_invalid_format(client):
+    """Test de formato de exportación no soportado"""
+    response = client.get("/api/v1/papers/export?format=xml")
+    assert response.status_code == 400
+
+def test_export_papers_parquet(client):
+    """Test de exportación Parquet (requiere pyarrow)"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    response = client.get("/api/v1/papers/export?format=parquet")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows > 0
+    assert "authors" in table.column_names
+
+def test_list_papers_with_fields(client):
+    """Test de proyección de campos en el listado"""
+    response = client.get("/api/v1/papers/?fields=title,authors")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) > 0
+    assert all(set(paper) == {"id", "title", "authors"} for paper in data)
+
+def test_search_and_popular_with_fields(client):
+    """Test de proyección de campos en búsqueda y populares"""
+    response = client.get("/api/v1/search/papers?q=Machine&fields=title")
+    assert response.status_code == 200
+    assert all(set(paper) == {"id", "title"} for paper in response.json()["results"])
+    
+    response = client.get("/api/v1/papers/popular?fields=citation_count")
+    assert response.status_code == 200
+    assert all(set(paper) == {"id", "citation_count"} for paper in response.json())
+    
+    response = client.get("/api/v1/papers/?fields=title,password")
+    assert response.status_code == 400
+
+def test_get_paper_etag_not_modified(client):
+    """Test de GET condicional con ETag sobre un paper"""
+    paper_id = client.get("/api/v1/papers/").json()[0]["id"]
+    response = client.get(f"/api/v1/papers/{paper_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "cache-control" in response.headers
+    
+    response = client.get(f"/api/v1/papers/{paper_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+def test_list_and_search_etag(client):
+    """Test de ETag en listado y en resultados de búsqueda cacheados"""
+    response = client.get("/api/v1/papers/?limit=5")
+    etag = response.headers["etag"]
+    assert client.get("/api/v1/papers/?limit=5", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/v1/papers/?limit=1", headers={"If-None-Match": etag}).status_code == 200
+    
+    response = client.get("/api/v1/search/papers?q=Machine")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    response = client.get("/api/v1/search/papers?q=Machine", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+def test_response_compression(client):
+    """Test de compresión con umbral mínimo y cuerpos precomprimidos en el cache de búsqueda"""
+    from src.services.search_service import search_cache
+    lines = [
+        json.dumps({"title": f"Compressible Paper {i}", "abstract": "long abstract " * 40})
+        for i in range(5)
+    ]
+    files = {"file": ("papers.ndjson", "\n".join(lines), "application/x-ndjson")}
+    client.post("/api/v1/papers/bulk", files=files, headers=get_auth_headers(client))
+    
+    response = client.get("/api/v1/search/papers?q=Compressible", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["results"]) == 5
+    assert any("gzip" in entry["encoded"] for entry in search_cache.values())
+    
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    
+    response = client.get("/api/v1/papers/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) > 5
+
+def test_profile_uses_user_cache(client):
+    """Test de validación de token sin consultar la BD e invalidación al actualizar"""
+    from src.services.user_cache import user_cache
+    from src.database.models import User as DBUser
+    headers = get_auth_headers(client, "cacheuser", "cachepassword")
+    
+    hits_before = user_cache.stats()["hits"]
+    response = client.get("/api/v1/auth/profile", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "cacheuser"
+    assert user_cache.stats()["hits"] == hits_before + 1
+    
+    # Desactivar el usuario invalida el cache y el token deja de ser aceptado
+    db = TestingSessionLocal()
+    db_user = db.query(DBUser).filter(DBUser.username == "cacheuser").first()
+    db_user.is_active = False
+    db.commit()
+    assert user_cache.get(db_user.id) is None
+    db.close()
+    
+    response = client.get("/api/v1/auth/profile", headers=headers)
+    assert response.status_code == 401
+
+def test_deactivated_user_cannot_write_papers(client):
+    """Test de que un usuario desactivado no puede crear papers aunque su token siga vigente"""
+    from src.services.user_cache import user_cache
+    from src.database.models import User as DBUser
+    headers = get_auth_headers(client, "writeruser", "writerpassword")
+    response = client.post("/api/v1/papers/", json={"title": "Paper de un usuario activo"}, headers=headers)
+    assert response.status_code == 201
+    
+    db = TestingSessionLocal()
+    db_user = db.query(DBUser).filter(DBUser.username == "writeruser").first()
+    db_user.is_active = False
+    db.commit()
+    assert user_cache.get(db_user.id) is None
+    db.close()
+    
+    response = client.post("/api/v1/papers/", json={"title": "Paper de un usuario desactivado"}, headers=headers)
+    assert response.status_code == 401
+
+def test_invalid_token_is_rejected_not_anonymous(client):
+    """Test de que un token inválido recibe 401 en vez de pasar como anónimo (sin token sigue siendo anónimo)"""
+    headers = get_auth_headers(client, "owneruser", "ownerpassword")
+    paper_id = client.post("/api/v1/papers/", json={"title": "Paper con creador"}, headers=headers).json()["id"]
+    token = headers["Authorization"].removeprefix("Bearer ")
+    for bad in (token[:-2] + ("aa" if not token.endswith("aa") else "bb"), "no-es-un-jwt"):
+        bad_headers = {"Authorization": f"Bearer {bad}"}
+        assert client.put(f"/api/v1/papers/{paper_id}", json={"title": "Editado"}, headers=bad_headers).status_code == 401
+        assert client.delete(f"/api/v1/papers/{paper_id}", headers=bad_headers).status_code == 401
+    assert client.get(f"/api/v1/papers/{paper_id}").json()["title"] == "Paper con creador"
+    assert client.post("/api/v1/papers/", json={"title": "Paper anónimo"}).status_code == 201
+
+def test_verified_token_cache(monkeypatch):
+    """Test del LRU de tokens verificados: evita decodificar de nuevo y respeta exp"""
+    from datetime import timedelta
+    from src.services import auth_service
+    token = auth_service.create_access_token({"sub": "lruuser"})
+    assert auth_service.verify_token_claims(token)["sub"] == "lruuser"
+    
+    def fail_decode(token):
+        raise AssertionError("no debería decodificar un token cacheado")
+    monkeypatch.setattr(auth_service.jwt_backend, "decode", fail_decode)
+    assert auth_service.verify_token(token) == "lruuser"
+    monkeypatch.undo()
+    
+    expired = auth_service.create_access_token({"sub": "lruuser"}, expires_delta=timedelta(seconds=-1))
+    assert auth_service.verify_token(expired) is None
+
+def test_password_hasher_schemes():
+    """Test de los esquemas de hashing: verificación cruzada y detección de rehash"""
+    from src.services.password_hashers import Pbkdf2Hasher, password_hashers
+    pbkdf2 = Pbkdf2Hasher(100_000)
+    hashed = pbkdf2.hash("secreto")
+    assert hashed.startswith("$pbkdf2-sha256$100000$")
+    assert password_hashers.verify("secreto", hashed)
+    assert not password_hashers.verify("otro", hashed)
+    
+    # Un hash de otro esquema es válido pero se reemplaza por uno del esquema por defecto
+    valid, new_hash = password_hashers.verify_and_update("secreto", hashed)
+    if password_hashers.default_scheme != "pbkdf2_sha256":
+        assert valid and password_hashers.default.identify(new_hash)
+    
+    current = password_hashers.hash("secreto")
+    assert password_hashers.verify_and_update("secreto", current) == (True, None)
+    assert not password_hashers.verify("secreto", "no-es-un-hash")
+    
+    # La calibración parte del costo configurado: con un objetivo bajo no lo reduce
+    assert Pbkdf2Hasher(200_000).calibrate(target_ms=0.001) == 200_000
+
+def test_login_rehashes_legacy_password(client):
+    """Test de rehash transparente al iniciar sesión con un hash SHA-256 antiguo"""
+    import hashlib
+    from src.database.models import User as DBUser
+    from src.services.password_hashers import password_hashers
+    db = TestingSessionLocal()
+    db.add(DBUser(
+        username="legacyuser", email="legacyuser@example.com",
+        hashed_password=hashlib.sha256("legacypass".encode()).hexdigest()
+    ))
+    db.commit()
+    
+    response = client.post("/api/v1/auth/login", data={"username": "legacyuser", "password": "legacypass"})
+    assert response.status_code == 200
+    db.expire_all()
+    db_user = db.query(DBUser).filter(DBUser.username == "legacyuser").first()
+    assert password_hashers.default.identify(db_user.hashed_password)
+    db.close()
+    
+    response = client.post("/api/v1/auth/login", data={"username": "legacyuser", "password": "legacypass"})
+    assert response.status_code == 200
+
+def test_auth_rate_limit_and_admission(client, monkeypatch):
+    """Test de token bucket por username (429) y cupo de hashing (503) con Retry-After"""
+    from src.services import rate_limiter
+    monkeypatch.setattr(rate_limiter.auth_username_limiter, "capacity", 2)
+    credentials = {"username": "ratelimited", "password": "wrongpassword"}
+    for _ in range(2):
+        assert client.post("/api/v1/auth/login", data=credentials).status_code == 401
+    response = client.post("/api/v1/auth/login", data=credentials)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    
+    monkeypatch.setattr(rate_limiter.hash_admission, "max_in_flight", 0)
+    response = client.post("/api/v1/auth/login-json", json={"username": "otheruser", "password": "x"})
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    rate_limiter.bucket_store.clear()
+
+def test_sqlite_bucket_store_shared(tmp_path):
+    """Test del store SQLite: dos instancias (workers) comparten el mismo bucket, poda y varios buckets a la vez"""
+    import time
+    from src.services.rate_limiter import RateLimiter, SqliteBucketStore, TooManyRequests, hit_all
+    path = str(tmp_path / "ratelimit.db")
+    worker_a = RateLimiter(SqliteBucketStore(path), "test", capacity=2, per_minute=1)
+    worker_b = RateLimiter(SqliteBucketStore(path), "test", capacity=2, per_minute=1)
+    worker_a.hit("1.2.3.4")
+    worker_b.hit("1.2.3.4")
+    with pytest.raises(TooManyRequests) as exc_info:
+        worker_a.hit("1.2.3.4")
+    assert exc_info.value.retry_after > 0
+    worker_b.hit("5.6.7.8")
+    
+    # Solo se podan los buckets ya recargados por completo
+    store = SqliteBucketStore(path)
+    assert store.prune(time.time()) == 0
+    assert store.prune(time.time() + 180) == 2
+    
+    # Si el bucket por username rechaza no se descuenta el de IP
+    ip_limiter = RateLimiter(store, "ip", capacity=1, per_minute=1)
+    user_limiter = RateLimiter(store, "user", capacity=1, per_minute=1)
+    user_limiter.hit("ana")
+    with pytest.raises(TooManyRequests) as exc_info:
+        hit_all([(ip_limiter, "1.2.3.4"), (user_limiter, "ana")])
+    assert exc_info.value.scope == "user"
+    ip_limiter.hit("1.2.3.4")
+
+def test_bulk_register_users_csv(client, monkeypatch):
+    """Test de alta masiva de usuarios (solo administración) con conflictos y resultado por fila"""
+    from src.config import settings
+    from src.services.rate_limiter import hash_admission
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    headers = {"X-Admin-Token": "test-admin-token"}
+    content = (
+        "username,email,password,full_name\n"
+        "student100,student100@example.com,pass100,Student 100\n"
+        "student101,student101@example.com,pass101,\n"
+        "student100,other100@example.com,pass,Duplicado en archivo\n"
+        "bulkuser,nuevo@example.com,pass,Ya existe\n"
+        "student102,no-es-email,pass,Email inválido\n"
+    )
+    response = client.post(
+        "/api/v1/auth/bulk-register",
+        files={"file": ("students.csv", content, "text/csv")},
+        headers=headers
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["total_rows"] == 5
+    assert report["created"] == 2
+    assert report["failed"] == 3
+    assert [result["status"] for result in report["results"]] == ["created", "created", "error", "error", "error"]
+    assert report["results"][0]["id"] is not None
+    assert report["rows_per_second"] > 0
+    
+    response = client.post("/api/v1/auth/login", data={"username": "student101", "password": "pass101"})
+    assert response.status_code == 200
+    
+    # Un usuario común no puede dar de alta usuarios en masa
+    response = client.post(
+        "/api/v1/auth/bulk-register",
+        files={"file": ("more.csv", "username,email,password\nstudent103,s103@example.com,pass\n", "text/csv")},
+        headers=get_auth_headers(client)
+    )
+    assert response.status_code == 403
+    
+    # Sin cupo de hashing responde 503 y el reporte acota los resultados por fila
+    with hash_admission.slot(hash_admission.max_in_flight):
+        response = client.post(
+            "/api/v1/auth/bulk-register",
+            files={"file": ("more.csv", "username,email,password\nstudent103,s103@example.com,pass\n", "text/csv")},
+            headers=headers
+        )
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    monkeypatch.setattr(settings, "bulk_max_reported_results", 1)
+    response = client.post(
+        "/api/v1/auth/bulk-register",
+        files={"file": ("more.csv", "username,email,password\nstudent103,s103@example.com,pass\nstudent104,s104@example.com,pass\n", "text/csv")},
+        headers=headers
+    )
+    report = response.json()
+    assert report["created"] == 2 and len(report["results"]) == 1 and report["results_truncated"]
+
+def test_refresh_token_rotation_and_logout(client):
+    """Test de refresh token con rotación, reuso detectado y revocación vía logout"""
+    client.post("/api/v1/auth/register", json={
+        "username": "sessionuser", "email": "sessionuser@example.com", "password": "sessionpass"
+    })
+    tokens = client.post(
+        "/api/v1/auth/login", data={"username": "sessionuser", "password": "sessionpass"}
+    ).json()
+    assert tokens["refresh_token"] and tokens["expires_in"] > 0
+    
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert client.get("/api/v1/auth/profile", headers=headers).status_code == 200
+    
+    # Logout revoca la sesión: access token y refresh token dejan de funcionar
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/v1/auth/profile", headers=headers).status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": refreshed["refresh_token"]})
+    assert response.status_code == 401
+
+def test_deactivation_revokes_user_sessions(client):
+    """Test de que desactivar un usuario revoca todas sus sesiones, también al reactivarlo"""
+    from src.database.models import User as DBUser, UserSession
+    client.post("/api/v1/auth/register", json={
+        "username": "leavinguser", "email": "leavinguser@example.com", "password": "leavingpass"
+    })
+    tokens = [
+        client.post("/api/v1/auth/login", data={"username": "leavinguser", "password": "leavingpass"}).json()
+        for _ in range(2)
+    ]
+    
+    db = TestingSessionLocal()
+    db_user = db.query(DBUser).filter(DBUser.username == "leavinguser").first()
+    db_user.is_active = False
+    db.commit()
+    assert db.query(UserSession).filter(UserSession.user_id == db_user.id, UserSession.revoked_at.is_(None)).count() == 0
+    db_user.is_active = True
+    db.commit()
+    db.close()
+    
+    for token in tokens:
+        assert client.post("/api/v1/auth/refresh", json={"refresh_token": token["refresh_token"]}).status_code == 401
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+        assert client.get("/api/v1/auth/profile", headers=headers).status_code == 401
+
+def test_refresh_token_reuse_revokes_session(client):
+    """Test de reuso de un refresh token ya rotado"""
+    tokens = client.post(
+        "/api/v1/auth/login-json", json={"username": "sessionuser", "password": "sessionpass"}
+    ).json()
+    # Un secreto inventado para un sid conocido se rechaza sin revocar la sesión
+    session_id = tokens["refresh_token"].split(".")[0]
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": f"{session_id}.garbage"}).status_code == 401
+    response = client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert client.post("/api/v1/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+def test_bloom_filter_revocation_list():
+    """Test del Bloom filter: sin falsos negativos y tasa de falsos positivos acotada"""
+    from src.services.revocation import BloomFilter
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"revoked-{i}")
+    assert all(f"revoked-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"active-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_loop_lag_monitor_attributes_blocking_route(client, monkeypatch):
+    """Test del monitor de lag: un handler async que bloquea queda atribuido con su stack"""
+    import time as time_module
+    from src.config import settings
+    from src.monitoring import loop_lag_monitor
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    admin_headers = {"X-Admin-Token": "test-admin-token"}
+    assert client.get("/api/v1/admin/loop-lag").status_code == 403
+    
+    async def blocking_endpoint():
+        time_module.sleep(0.4)
+        return {"ok": True}
+    app.add_api_route("/api/v1/test-blocking", blocking_endpoint, methods=["GET"])
+    loop_lag_monitor.register_routes(app)
+    try:
+        client.post("/api/v1/admin/loop-lag/reset", headers=admin_headers)
+        assert client.get("/api/v1/test-blocking").status_code == 200
+        time_module.sleep(0.2)
+        report = client.get("/api/v1/admin/loop-lag", headers=admin_headers).json()
+    finally:
+        app.router.routes.pop()
+    
+    assert report["running"] and report["lag"]["samples"] > 0
+    routes = [handler["route"] for handler in report["blocking_handlers"]]
+    assert "GET /api/v1/test-blocking" in routes
+    event = next(e for e in report["events"] if e["route"] == "GET /api/v1/test-blocking")
+    assert event["lag_ms"] >= 300
+    assert any("blocking_endpoint" in frame for frame in event["stack"])
+    
+    metrics = client.get("/api/v1/admin/metrics", headers=admin_headers).text
+    assert 'event_loop_blocked_total{route="GET /api/v1/test-blocking"}' in metrics
+
+def busy_work(seconds: float) -> int:
+    """Trabajo de CPU en Python puro para los tests de perfilado"""
+    import time as time_module
+    deadline = time_module.perf_counter() + seconds
+    total = 0
+    while time_module.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+def test_profiling_header_and_toggle(client, monkeypatch):
+    """Test de perfilado bajo demanda por header y por toggle con límite de perfiles"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    admin_headers = {"X-Admin-Token": "test-admin-token"}
+    
+    async def cpu_endpoint():
+        return {"total": busy_work(0.15)}
+    app.add_api_route("/api/v1/test-cpu", cpu_endpoint, methods=["GET"])
+    try:
+        response = client.get("/api/v1/test-cpu")
+        assert "x-profile-id" not in response.headers
+        response = client.get("/api/v1/test-cpu", headers={"X-Profile": "wrong"})
+        assert "x-profile-id" not in response.headers
+        
+        response = client.get("/api/v1/test-cpu", headers={"X-Profile": "test-admin-token"})
+        profile_id = response.headers["x-profile-id"]
+        collapsed = client.get(f"/api/v1/admin/profiles/{profile_id}?format=collapsed", headers=admin_headers).text
+        assert any("busy_work" in line and line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+        
+        toggle = {"enabled": True, "sample_rate": 1.0, "path_prefix": "/api/v1/test-cpu", "max_profiles": 1}
+        assert client.post("/api/v1/admin/profiling", json=toggle, headers=admin_headers).status_code == 200
+        assert "x-profile-id" not in client.get("/api/v1/papers/").headers
+        profile_id = client.get("/api/v1/test-cpu").headers["x-profile-id"]
+        assert "x-profile-id" not in client.get("/api/v1/test-cpu").headers
+    finally:
+        app.router.routes.pop()
+    
+    speedscope = client.get(f"/api/v1/admin/profiles/{profile_id}", headers=admin_headers).json()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+    assert any("cpu_endpoint" in frame["name"] for frame in speedscope["shared"]["frames"])
+
+def test_continuous_profiler_flamegraph(client, monkeypatch, tmp_path):
+    """Test del profiler continuo: stacks del handler en el flamegraph, store acotado y escritura a disco"""
+    from src.config import settings
+    from src.monitoring import ContinuousProfiler, continuous_profiler
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    admin_headers = {"X-Admin-Token": "test-admin-token"}
+    assert continuous_profiler.running
+    
+    async def cpu_endpoint():
+        return {"total": busy_work(0.3)}
+    app.add_api_route("/api/v1/test-cpu", cpu_endpoint, methods=["GET"])
+    try:
+        client.post("/api/v1/admin/flamegraph/reset", headers=admin_headers)
+        assert client.get("/api/v1/test-cpu").status_code == 200
+    finally:
+        app.router.routes.pop()
+    
+    collapsed = client.get("/api/v1/admin/flamegraph?format=collapsed&contains=busy_work", headers=admin_headers).text
+    assert collapsed and all("cpu_endpoint" in line for line in collapsed.splitlines())
+    top = client.get("/api/v1/admin/flamegraph?format=top&contains=busy_work", headers=admin_headers).json()
+    assert top["stats"]["samples"] > 0
+    assert any(f["function"].startswith("busy_work") and f["own_samples"] > 0 for f in top["functions"])
+    
+    assert client.post("/api/v1/admin/flamegraph/write", headers=admin_headers).status_code == 400
+    monkeypatch.setattr(settings, "profiler_report_dir", str(tmp_path))
+    assert client.post("/api/v1/admin/flamegraph/write", headers=admin_headers).status_code == 200
+    assert sorted(p.suffix for p in tmp_path.iterdir()) == [".collapsed", ".json"]
+    
+    bounded = ContinuousProfiler(interval_ms=10, max_stacks=2)
+    for stack in ("a;b", "a;c", "a;d", "a;b"):
+        bounded._add(stack)
+    assert bounded.stats()["unique_stacks"] == 2 and bounded.dropped == 1
+    assert bounded.snapshot() == {"a;b": 2, "a;c": 1, "[otros stacks]": 1}
+
+def test_search_ignores_accents_and_case(client):
+    """Test de búsqueda sin acentos ni mayúsculas: "Garcia" encuentra "García" (alta, edición y carga masiva)"""
+    from src.database.normalization import fold_text
+    assert fold_text("  José  GARCÍA-López ") == "jose garcia-lopez"
+    
+    created = client.post("/api/v1/papers/", json={
+        "title": "Análisis de Redes Neuronales en Perú",
+        "authors": ["José García Márquez"],
+        "keywords": ["Visión"]
+    }).json()
+    authors = client.get("/api/v1/search/authors?q=garcia marquez").json()["results"]
+    assert created["id"] in [paper["id"] for paper in authors]
+    titles = client.get("/api/v1/search/papers?q=ANALISIS DE REDES").json()["results"]
+    assert created["id"] in [paper["id"] for paper in titles]
+    
+    client.put(f"/api/v1/papers/{created['id']}", json={"title": "Señales y Sistemas Ópticos"})
+    titles = client.get("/api/v1/search/papers?q=senales y sistemas").json()["results"]
+    assert [paper["title"] for paper in titles] == ["Señales y Sistemas Ópticos"]
+    
+    lines = ['{"title": "Compiladores modernos", "authors": ["Ana López"], "doi": "10.1000/accent.1"}']
+    files = {"file": ("papers.ndjson", "\n".join(lines), "application/x-ndjson")}
+    client.post("/api/v1/papers/bulk", files=files, headers=get_auth_headers(client))
+    authors = client.get("/api/v1/search/authors?q=Lopez").json()["results"]
+    assert "Compiladores modernos" in [paper["title"] for paper in authors]
+
+def test_search_did_you_mean(client):
+    """Test de sugerencias "did you mean": índice incremental y sin cachear búsquedas vacías"""
+    from src.services.search_service import search_cache
+    client.post("/api/v1/papers/", json={"title": "Neural Networks for Image Segmentation", "authors": ["Grace Hopper"]})
+    
+    data = client.get("/api/v1/search/papers?q=nueral netwroks").json()
+    assert data["total"] == 0
+    assert data["suggestion"] == "neural networks"
+    assert not any("nueral" in key for key in search_cache)
+    
+    # Papers agregados con el índice ya construido se incorporan al vocabulario
+    client.post("/api/v1/papers/", json={"title": "Quantum Entanglement Survey", "authors": ["Ada Lovelace"]})
+    assert client.get("/api/v1/search/papers?q=quantum entanglment").json()["suggestion"] == "quantum entanglement"
+    assert client.get("/api/v1/search/authors?q=lovelaec").json()["suggestion"] == "lovelace"
+    assert "suggestion" not in client.get("/api/v1/search/papers?q=quantum").json()
+
+def test_search_index_trigram_candidates():
+    """Test del índice de trigramas y SymSpell fuera de la distancia de edición"""
+    from src.services.search_index import SearchIndex, edit_distance
+    index = SearchIndex(max_distance=2, min_similarity=0.3)
+    index.built = True
+    index.index_paper(1, "Reinforcement Learning", '["Richard Sutton"]', '["control"]')
+    index.index_paper(2, "Representation Learning", "[]", "[]")
+    assert edit_distance("learning", "laerning", 2) == 1
+    # Sin el corrector armado no hay sugerencia (se arma en segundo plano)
+    assert index.suggest("reinforcment lerning") is None
+    index._spelling_thread.join()
+    assert index.suggest("reinforcment lerning") == "reinforcement learning"
+    assert index.fuzzy_terms("reinforcemnet")[0][0] == "reinforcement"
+    index.remove_paper(1)
+    assert "reinforcement" not in index.frequencies and "learning" in index.frequencies
+
+def test_structured_query_search(client):
+    """Test del lenguaje de consultas: calificadores, rangos, frases, NOT, plan y errores de sintaxis"""
+    papers = [
+        {"title": "Probabilistic Graph Models", "authors": ["Lucía Fernández"], "publication_year": 2021, "keywords": ["graphical models"]},
+        {"title": "Graph Neural Models in Practice", "authors": ["Lucia Fernandez", "Bob Stone"], "publication_year": 2017, "keywords": ["gnn"]},
+        {"title": "Probabilistic Programming", "authors": ["Bob Stone"], "publication_year": 2022, "keywords": ["graphical models"]},
+    ]
+    ids = [client.post("/api/v1/papers/", json=paper).json()["id"] for paper in papers]
+    
+    def search(q):
+        response = client.get("/api/v1/search/papers", params={"q": q, "fields": "title"})
+        assert response.status_code == 200, response.text
+        return response.json()
+    
+    data = search("author:fernandez year:2020..2024")
+    assert data["total"] == 1 and data["results"][0]["id"] == ids[0]
+    assert {p["id"] for p in search('keyword:"graphical models"')["results"]} == {ids[0], ids[2]}
+    assert [p["id"] for p in search('probabilistic -programming author:"lucia fernandez"')["results"]] == [ids[0]]
+    assert {p["id"] for p in search("(gnn OR programming) AND year:>=2017")["results"]} == {ids[1], ids[2]}
+    
+    # Sin operadores se mantiene la búsqueda simple por texto en el título
+    assert search("Graph Neural")["total"] == 1
+    
+    plan = client.get("/api/v1/search/explain", params={"q": "graph author:stone year:2017"}).json()["plan"]
+    assert plan["op"] == "and"
+    estimates = [child["estimate"] for child in plan["children"]]
+    assert estimates == sorted(estimates)
+    
+    response = client.get("/api/v1/search/papers", params={"q": 'author:"sin cerrar'})
+    assert response.status_code == 400
+    
+    # Anidamiento profundo o consultas enormes: 400, no RecursionError
+    for q in ("(" * 400 + "graph" + ")" * 400, "NOT " * 400 + "graph", "graph " * 1000):
+        for endpoint in ("/api/v1/search/papers", "/api/v1/search/explain"):
+            response = client.get(endpoint, params={"q": q, "syntax": "query"})
+            assert response.status_code == 400, (endpoint, q[:20])
+    assert client.get("/api/v1/search/explain", params={"q": "(" * 32 + "graph" + ")" * 32}).status_code == 200
+
+def test_query_plan_cache_and_citation_ranges():
+    """Test del cache de planes y de rangos de citas con orden por citas"""
+    from src.services.query_language import QueryPlanCache, execute_query, plan_cache
+    from src.services.search_index import SearchIndex
+    index = SearchIndex(max_distance=2, min_similarity=0.4)
+    index.built = True
+    for paper_id, citations in ((1, 10), (2, 75), (3, 51), (4, 50)):
+        index.index_paper(paper_id, f"Paper {paper_id}", "[]", '["systems"]', 2020, citations)
+    
+    assert execute_query(index, "cited:>50", 0, 10) == (2, [2, 3])
+    assert execute_query(index, "keyword:systems cited:<=50", 1, 10) == (2, [1])
+    index.index_paper(1, "Paper 1", "[]", '["systems"]', 2020, 90)
+    assert execute_query(index, "cited:>50", 0, 10) == (3, [1, 2, 3])
+    
+    cache = QueryPlanCache(max_entries=2)
+    assert cache.get("a  AND b") is cache.get("a AND b")
+    cache.get("c")
+    cache.get("d")
+    assert cache.hits == 1 and cache.misses == 3 and len(cache._plans) == 2
+    assert plan_cache.get("cited:>50") is plan_cache.get(" cited:>50 ")
+
+def test_search_facets(client):
+    """Test de facetas por año, keyword y autor sobre todas las coincidencias, mantenidas al editar"""
+    papers = [
+        {"title": "Zeolite Catalysis Basics", "authors": ["Ana Ruiz"], "publication_year": 2019, "keywords": ["Zeolites", "catalysis"]},
+        {"title": "Zeolite Catalysis at Scale", "authors": ["Ana Ruiz", "Tom Kay"], "publication_year": 2021, "keywords": ["zeolites"]},
+        {"title": "Zeolite Catalysis Review", "authors": ["Tom Kay"], "publication_year": 2021, "keywords": ["catalysis"]},
+    ]
+    ids = [client.post("/api/v1/papers/", json=paper).json()["id"] for paper in papers]
+    
+    def facets(q, **params):
+        response = client.get("/api/v1/search/papers", params={"q": q, "limit": 1, "facets": "year,keyword,author", **params})
+        assert response.status_code == 200, response.text
+        return response.json()["facets"]
+    
+    # Búsqueda simple: la página trae 1 resultado pero las facetas cuentan los 3
+    counts = facets("zeolite catalysis")
+    assert counts["year"] == [{"value": 2021, "count": 2}, {"value": 2019, "count": 1}]
+    assert {item["value"]: item["count"] for item in counts["keyword"]} == {"zeolites": 2, "catalysis": 2}
+    assert {item["value"]: item["count"] for item in counts["author"]} == {"ana ruiz": 2, "tom kay": 2}
+    
+    counts = facets("title:zeolite -review")
+    assert {item["value"]: item["count"] for item in counts["author"]} == {"ana ruiz": 2, "tom kay": 1}
+    
+    # Los bitmaps de facetas se actualizan con cada edición y borrado
+    client.put(f"/api/v1/papers/{ids[0]}", json={"publication_year": 2021, "authors": ["Tom Kay"]})
+    client.delete(f"/api/v1/papers/{ids[2]}", headers=get_auth_headers(client))
+    counts = facets("title:zeolite catalysis")
+    assert counts["year"] == [{"value": 2021, "count": 2}]
+    assert counts["author"] == [{"value": "tom kay", "count": 2}, {"value": "ana ruiz", "count": 1}]
+    
+    response = client.get("/api/v1/search/papers", params={"q": "zeolite", "facets": "year,venue"})
+    assert response.status_code == 400
+
+def test_roaring_bitmap_matches_set_semantics():
+    """Test del bitmap comprimido contra sets de Python (contenedores dispersos y densos)"""
+    import random
+    from src.services.bitmaps import Bitmap, union_all
+    rng = random.Random(7)
+    samples = [
+        {rng.randrange(200000) for _ in range(size)}
+        for size in (0, 3, 500, 6000, 30000)
+    ]
+    for a in samples:
+        for b in samples:
+            A, B = Bitmap.from_ids(a), Bitmap.from_ids(b)
+            assert list(A & B) == sorted(a & b)
+            assert list(A | B) == sorted(a | b)
+            assert list(A - B) == sorted(a - b)
+            assert A.intersection_size(B) == len(a & b)
+            assert union_all([A, B]) == Bitmap.from_ids(a | b)
+    
+    bitmap, expected = Bitmap(), set()
+    for _ in range(20000):
+        value = rng.randrange(70000)
+        if rng.random() < 0.6:
+            bitmap.add(value)
+            expected.add(value)
+        else:
+            bitmap.discard(value)
+            expected.discard(value)
+    assert bitmap == Bitmap.from_ids(expected) and len(bitmap) == len(expected)
+    # Un id alto aislado ocupa 2 bytes, no id/8
+    assert Bitmap.from_ids([10 ** 7]).memory_bytes() == 2
+
+def test_semantic_search_hybrid(client, tmp_path, monkeypatch):
+    """Test de búsqueda semántica: papers relacionados sin compartir la consulta exacta, y ranking híbrido"""
+    from src.services.semantic_index import semantic_index
+    monkeypatch.setattr(semantic_index, "directory", str(tmp_path))
+    semantic_index.reset()
+    papers = [
+        {"title": "Lattice Cryptography Primer", "abstract": "Post-quantum encryption schemes built on lattice problems resist quantum attacks."},
+        {"title": "Post-Quantum Key Exchange", "abstract": "Lattice based key exchange and encryption for quantum resistant protocols."},
+        {"title": "Sourdough Fermentation", "abstract": "Wild yeast and bacteria in bread dough fermentation."},
+    ]
+    ids = [client.post("/api/v1/papers/", json=paper).json()["id"] for paper in papers]
+    
+    response = client.get("/api/v1/search/semantic", params={"q": "quantum resistant encryption", "keyword_weight": 0})
+    assert response.status_code == 200, response.text
+    found = [paper["id"] for paper in response.json()["results"]]
+    assert set(found[:2]) == {ids[0], ids[1]}
+    assert ids[2] not in found
+    
+    # El paper nuevo se proyecta con el modelo vigente sin reajustar; el híbrido lo encuentra por título
+    new_id = client.post("/api/v1/papers/", json={
+        "title": "Lattice Signatures", "abstract": "Quantum resistant digital signatures from lattice problems."
+    }).json()["id"]
+    response = client.get("/api/v1/search/semantic", params={"q": "lattice signatures", "keyword_weight": 0.5})
+    assert response.json()["results"][0]["id"] == new_id
+    
+    # Otro arranque abre los vectores como memmap y reaplica del change log los papers posteriores al ajuste
+    semantic_index.reset()
+    response = client.get("/api/v1/search/semantic", params={"q": "yeast fermentation"})
+    assert semantic_index.stats()["memory_mapped"] is True
+    assert response.json()["results"][0]["id"] == ids[2]
+    response = client.get("/api/v1/search/semantic", params={"q": "lattice signatures", "keyword_weight": 0.5})
+    assert response.json()["results"][0]["id"] == new_id
+    
+    assert client.get("/api/v1/search/semantic", params={"q": "lattice", "keyword_weight": 2}).status_code == 400
+
+def test_search_indexes_prepared_at_startup_and_refit_in_background(client, tmp_path, monkeypatch):
+    """Test de los índices al arrancar (fuera del event loop) y del reajuste semántico en segundo plano"""
+    from src.database.models import Paper
+    from src.services.change_feed import change_feed
+    from src.services.search_index import search_index
+    from src.services.search_service import prepare_search_indexes
+    from src.services.semantic_index import SemanticIndex, semantic_index
+    monkeypatch.setattr(semantic_index, "directory", str(tmp_path / "startup"))
+    semantic_index.reset()
+    prepare_search_indexes(change_feed.session_factory)
+    assert search_index.built and semantic_index.built
+    
+    client.post("/api/v1/papers/", json={"title": "Tern Foraging Range", "abstract": "Seabird foraging trips at sea."})
+    index = SemanticIndex(8, 1024, str(tmp_path / "refit"), 10 ** 6, 4, 4)
+    index.built, index.stale = True, True
+    # Un modelo desactualizado no bloquea al request: se reajusta en un hilo y se adopta al terminar
+    db = TestingSessionLocal()
+    try:
+        index.ensure_built(db)
+        papers = db.query(Paper).count()
+    finally:
+        db.close()
+    index._refit_thread.join()
+    assert not index.stale and index.components is not None and len(index.rows) == papers
+    assert index.stats()["refitting"] is False
+    assert SemanticIndex(8, 1024, str(tmp_path / "refit"), 10 ** 6, 4, 4)._read_manifest()["papers"] == len(index.ids)
+
+def test_semantic_index_memmap_and_lsh(client, tmp_path, monkeypatch):
+    """Test del índice semántico: reapertura por memmap, delta incremental, borrados y LSH"""
+    import numpy as np
+    import os
+    import sys
+    from src.services.change_feed import log_position
+    from src.services.search_index import corpus_signature
+    from src.services.semantic_index import MANIFEST_FILE, SemanticIndex
+    documents = [(i, f"topic{i % 4} alpha{i % 4} beta{i % 4} shared") for i in range(1, 41)]
+    db = TestingSessionLocal()
+    try:
+        position, signature = log_position(db), corpus_signature(db)
+        fitted = SemanticIndex(8, 1024, str(tmp_path / "current"), 10, 4, 4)
+        fitted.fit(documents)
+        fitted._save(position, signature)
+        
+        opened = SemanticIndex(8, 1024, str(tmp_path / "current"), 10, 4, 4)
+        assert opened._open(db) and isinstance(opened.vectors, np.memmap)
+        assert opened.lsh is not None
+        # Otro ajuste se publica en su propio directorio y cambia solo el manifiesto; el memmap abierto sigue válido
+        first = opened._read_manifest()["version"]
+        monkeypatch.setattr(sys.modules["src.services.semantic_index"], "VERSION_RETENTION_SECONDS", -1)
+        fitted._save(position, signature)
+        second = opened._read_manifest()["version"]
+        assert sorted(os.listdir(tmp_path / "current")) == sorted([MANIFEST_FILE, second]) and second != first
+        assert np.array_equal(np.asarray(opened.vectors), fitted.vectors)
+        # Otra configuración, o una posición que no está en el log (otra base): se reajusta
+        assert not SemanticIndex(16, 1024, str(tmp_path / "current"), 10, 4, 4)._open(db)
+        fitted.directory = str(tmp_path / "foreign")
+        fitted._save({"seq": position["seq"], "change": [-1, "insert", None]}, signature)
+        assert not SemanticIndex(8, 1024, str(tmp_path / "foreign"), 10, 4, 4)._open(db)
+    finally:
+        db.close()
+    
+    vector = opened.embed("topic1 alpha1")
+    assert {paper_id % 4 for paper_id, _ in opened.nearest(vector, 5)} == {1}
+    opened.index_paper(100, "topic1 alpha1", "beta1")
+    opened.remove_paper(1)
+    nearest = [paper_id for paper_id, _ in opened.nearest(vector, 20)]
+    assert 100 in nearest and 1 not in nearest
+    assert opened.similarities(vector, [100, 2]).keys() == {100, 2}
+
+def test_search_index_snapshot_roundtrip(client, tmp_path):
+    """Test del índice persistido: abrirlo por mmap da los mismos resultados y acepta escrituras encima"""
+    from src.services.change_feed import log_position
+    from src.services.query_language import execute_query
+    from src.services.search_index import SearchIndex, corpus_signature
+    path = str(tmp_path / "search.idx")
+    db = TestingSessionLocal()
+    position, signature = log_position(db), corpus_signature(db)
+    memory = SearchIndex(max_distance=2, min_similarity=0.4)
+    memory.built = True
+    papers = [
+        (1, "Graph Neural Networks", '["Ana Pérez"]', '["gnn"]', 2020, 10),
+        (2, "Graph Databases at Scale", '["Bob Stone"]', '["databases"]', 2018, 75),
+        (3, "Probabilistic Programming", '["Ana Perez"]', '["gnn", "bayes"]', 2022, 51),
+        (4, "Neural Machine Translation", '[]', None, None, 3),
+    ]
+    for paper in papers:
+        memory.index_paper(*paper)
+    memory.save(str(tmp_path / "foreign.idx"), signature, {"seq": position["seq"], "change": [-1, "insert", None]})
+    memory.save(path, signature, position)
+    
+    assert not SearchIndex(max_distance=2, min_similarity=0.4, path=str(tmp_path / "foreign.idx"))._open_published(db)
+    opened = SearchIndex(max_distance=2, min_similarity=0.4, path=path)
+    assert opened._open_published(db) is not None and opened.snapshot is not None
+    # Las citas se leen del archivo: no se copian a diccionarios por proceso
+    assert opened.citations == {} and opened.by_citations == []
+    opened.prepare_spelling()
+    db.close()
+    for query in ("graph", "author:perez", "keyword:gnn -year:2022", "cited:>5 neural", '"graph databases"'):
+        assert execute_query(opened, query, 0, 10) == execute_query(memory, query, 0, 10), query
+    assert opened.facet_summary(opened.all_ids, ("year", "author"), 10) == memory.facet_summary(memory.all_ids, ("year", "author"), 10)
+    assert opened.suggest("grpah") == "graph"
+    
+    # Escrituras posteriores quedan en memoria sobre el archivo (edición, alta y baja)
+    for index in (memory, opened):
+        index.index_paper(2, "Vector Databases", '["Bob Stone"]', '["databases"]', 2019, 80)
+        index.index_paper(5, "Graph Sampling", '[]', '["gnn"]', 2024, 0)
+        index.remove_paper(1)
+    assert set(opened.citations) == {2, 5} and opened.shadowed == {1, 2}
+    for query in ("graph", "databases year:2019", "keyword:gnn", "cited:>=0", "cited:>50", "cited:<=10"):
+        assert execute_query(opened, query, 0, 10) == execute_query(memory, query, 0, 10), query
+    assert opened.facet_summary(opened.all_ids, ("keyword",), 10) == memory.facet_summary(memory.all_ids, ("keyword",), 10)
+
+def test_persisted_indexes_replay_changes_on_open(client, tmp_path):
+    """Test de los índices persistidos: al reabrirlos se reaplican los cambios del log aunque no toquen updated_at"""
+    from sqlalchemy import text
+    from src.services.search_index import SearchIndex
+    from src.services.semantic_index import SemanticIndex
+    paper_id = client.post("/api/v1/papers/", json={
+        "title": "Puffin Colony Census", "abstract": "Counting seabird burrows on coastal islands."
+    }).json()["id"]
+    path, directory = str(tmp_path / "search.idx"), str(tmp_path / "semantic")
+    db = TestingSessionLocal()
+    try:
+        SearchIndex(max_distance=2, min_similarity=0.4, path=path).ensure_built(db)
+        SemanticIndex(8, 1024, directory, 10 ** 6, 4, 4).ensure_built(db)
+        # Otro proceso edita el título sin tocar updated_at: la firma de la tabla no cambia
+        db.execute(text("UPDATE papers SET title = 'Gannet Colony Census', title_norm = 'gannet colony census' WHERE id = :id"), {"id": paper_id})
+        db.commit()
+        search = SearchIndex(max_distance=2, min_similarity=0.4, path=path)
+        semantic = SemanticIndex(8, 1024, directory, 10 ** 6, 4, 4)
+        search.ensure_built(db)
+        semantic.ensure_built(db)
+    finally:
+        db.close()
+    assert search.snapshot is not None and semantic.memory_mapped
+    assert paper_id in search.term_bitmap("title", "gannet") and paper_id not in search.term_bitmap("title", "puffin")
+    assert paper_id in semantic.delta_ids
+
+def test_search_index_adopts_published_file_in_background(client, tmp_path):
+    """Test de la recarga del índice publicado por otro proceso: se abre y pone al día fuera del request"""
+    from src.services.change_feed import log_position
+    from src.services.search_index import SearchIndex, corpus_signature, read_papers
+    path = str(tmp_path / "search.idx")
+    db = TestingSessionLocal()
+    try:
+        worker = SearchIndex(max_distance=2, min_similarity=0.4, path=path)
+        worker.ensure_built(db)
+        paper_id = client.post("/api/v1/papers/", json={"title": "Cormorant Diving Depths"}).json()["id"]
+        publisher = SearchIndex(max_distance=2, min_similarity=0.4)
+        position = log_position(db)
+        publisher.load(read_papers(db))
+        publisher.save(path, corpus_signature(db), position)
+    finally:
+        db.close()
+    assert paper_id not in worker.term_bitmap("title", "cormorant")
+    
+    worker.refresh(0)
+    worker._reload_thread.join()
+    assert paper_id in worker.term_bitmap("title", "cormorant") and worker.snapshot is not None
+    assert worker.spelling_ready and worker.suggest("cormorant divng") == "cormorant diving"
+
+def test_admin_search_index_rebuild(client, tmp_path, monkeypatch):
+    """Test de la reconstrucción en segundo plano: cambios reaplicados, conteo verificado, swap y rollback"""
+    from sqlalchemy import text
+    from src.config import settings
+    from src.services import index_rebuild
+    from src.services.index_rebuild import index_rebuilder, previous_path
+    from src.services.index_store import file_identity
+    from src.services.search_index import SearchIndex, search_index
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    path = str(tmp_path / "search.idx")
+    monkeypatch.setattr(search_index, "path", path)
+    admin_headers = {"X-Admin-Token": "test-admin-token"}
+    paper_id = client.post("/api/v1/papers/", json={"title": "Persisted Zeppelin Index"}).json()["id"]
+    # Versión publicada antes de la reconstrucción
+    db = TestingSessionLocal()
+    SearchIndex(max_distance=2, min_similarity=0.4, path=path).ensure_built(db)
+    db.close()
+    published_before = file_identity(path)
+    
+    # Otro worker inserta un paper mientras se construye la versión nueva
+    original_read_papers = index_rebuild.read_papers
+    def read_papers_with_concurrent_write(db):
+        for position, paper in enumerate(original_read_papers(db)):
+            if position == 0:
+                writer = TestingSessionLocal()
+                writer.execute(text("INSERT INTO papers (title, title_norm, citation_count, created_at, updated_at) VALUES ('Albatross Flight', 'albatross flight', 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"))
+                writer.commit()
+                writer.close()
+            yield paper
+    monkeypatch.setattr(index_rebuild, "read_papers", read_papers_with_concurrent_write)
+    
+    assert client.post("/api/v1/admin/search-index/rebuild").status_code in (401, 403)
+    response = client.post("/api/v1/admin/search-index/rebuild", headers=admin_headers)
+    assert response.status_code == 202, response.text
+    assert index_rebuilder.wait(10)
+    progress = client.get("/api/v1/admin/search-index/rebuild", headers=admin_headers).json()
+    assert progress["status"] == "swapped", progress
+    assert progress["replayed_changes"] >= 1 and progress["processed"] == progress["total"]
+    assert progress["verified_papers"] == client.get("/api/v1/admin/search-index", headers=admin_headers).json()["papers"]
+    assert file_identity(path) != published_before and file_identity(previous_path(path)) == published_before
+    # Otro worker adopta la versión publicada
+    worker = SearchIndex(max_distance=2, min_similarity=0.4, path=path)
+    db = TestingSessionLocal()
+    worker.ensure_built(db)
+    db.close()
+    assert worker.identity == file_identity(path)
+    assert [p["id"] for p in client.get("/api/v1/search/papers", params={"q": "title:zeppelin"}).json()["results"]] == [paper_id]
+    assert client.get("/api/v1/search/papers", params={"q": "title:albatross"}).json()["total"] == 1
+    
+    # Rollback a la versión anterior, puesta al día con lo escrito después del swap
+    heron_id = client.post("/api/v1/papers/", json={"title": "Rollback Pelican Survey"}).json()["id"]
+    response = client.post("/api/v1/admin/search-index/rollback", headers=admin_headers)
+    assert response.status_code == 200 and response.json()["status"] == "rolled_back"
+    # El archivo anterior vuelve a publicarse y los demás workers convergen con refresh
+    assert file_identity(path) == published_before
+    worker.refresh(0)
+    worker._reload_thread.join()
+    assert worker.identity == published_before
+    assert [p["id"] for p in client.get("/api/v1/search/papers", params={"q": "title:pelican"}).json()["results"]] == [heron_id]
+    assert client.get("/api/v1/search/papers", params={"q": "title:albatross"}).json()["total"] == 1
+    
+    # Una versión nueva que no coincide con la tabla no reemplaza a la vigente
+    monkeypatch.setattr(index_rebuild, "read_papers", lambda db: iter(list(original_read_papers(db))[1:]))
+    client.post("/api/v1/admin/search-index/rebuild", headers=admin_headers)
+    assert index_rebuilder.wait(10)
+    progress = index_rebuilder.progress()
+    assert progress["status"] == "failed" and "papers" in progress["error"]
+    assert client.get("/api/v1/search/papers", params={"q": "title:pelican"}).json()["total"] == 1
+    search_index.reset()
+
+def test_paper_writes_do_not_block_event_loop_on_feed_lock(client):
+    """Test de que una escritura que espera el lock del feed no bloquea el event loop"""
+    import threading
+    from src.services.change_feed import change_feed
+    responses = []
+    with change_feed._lock:
+        writer = threading.Thread(target=lambda: responses.append(
+            client.post("/api/v1/papers/", json={"title": "Paper que espera al feed"})
+        ))
+        writer.start()
+        writer.join(0.5)
+        # La escritura sigue esperando el lock, pero el loop atiende otros requests
+        assert writer.is_alive()
+        health = threading.Thread(target=lambda: responses.append(client.get("/health")))
+        health.start()
+        health.join(5)
+        assert not health.is_alive() and responses[0].status_code == 200
+    health.join()
+    writer.join(10)
+    assert responses[1].status_code == 201
+
+def test_change_log_converges_writes_from_other_workers(client, monkeypatch):
+    """Test del change log: una escritura de otro proceso llega a índice y cache sin vaciar todo el cache"""
+    from sqlalchemy import text
+    from src.config import settings
+    from src.services.change_feed import change_feed
+    from src.services.search_service import search_cache
+    kestrel = client.post("/api/v1/papers/", json={"title": "Kestrel Migration Routes"}).json()["id"]
+    client.post("/api/v1/papers/", json={"title": "Heron Nesting Sites"})
+    assert client.get("/api/v1/search/papers", params={"q": "kestrel"}).json()["total"] == 1
+    assert client.get("/api/v1/search/papers", params={"q": "heron nesting"}).json()["total"] == 1
+    assert client.get("/api/v1/search/papers", params={"q": "title:kestrel"}).json()["total"] == 1
+    heron_keys = [key for key in search_cache if "heron nesting" in key]
+    
+    # Otro worker edita el paper directamente en la BD: el trigger registra el cambio
+    db = TestingSessionLocal()
+    try:
+        db.execute(text("UPDATE papers SET title = 'Osprey Migration Routes', title_norm = 'osprey migration routes' WHERE id = :id"), {"id": kestrel})
+        db.commit()
+        change_feed.poll(db)
+    finally:
+        db.close()
+    assert client.get("/api/v1/search/papers", params={"q": "kestrel"}).json()["total"] == 0
+    assert client.get("/api/v1/search/papers", params={"q": "title:kestrel"}).json()["total"] == 0
+    assert [p["id"] for p in client.get("/api/v1/search/papers", params={"q": "title:osprey"}).json()["results"]] == [kestrel]
+    assert heron_keys and all(key in search_cache for key in heron_keys)
+    
+    monkeypatch.setattr(settings, "admin_token", "test-admin-token")
+    data = client.get("/api/v1/admin/changes", params={"after": 0, "limit": 1000}, headers={"X-Admin-Token": "test-admin-token"}).json()
+    assert {"seq": data["latest_seq"], "paper_id": kestrel, "op": "update"} in data["changes"]
+    assert data["feed"]["position"] == data["latest_seq"]
+
+def test_change_feed_batches_and_resets_on_gap(tmp_path):
+    """Test del feed: lotes en orden colapsados por paper, y reinicio si el log se recortó"""
+    from sqlalchemy import text
+    from src.services.change_feed import ChangeFeed, prune_changes
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'changes.db'}")
+    Base.metadata.create_all(bind=test_engine)
+    db = sessionmaker(bind=test_engine)()
+    batches, resets = [], []
+    feed = ChangeFeed(poll_seconds=0, batch_size=2, retention=1)
+    feed.subscribe("recorder", batches.append, lambda: resets.append(True))
+    assert feed.poll(db) == 0 and resets == [True] and feed.position == 0
+    
+    for title in ("a", "b", "c"):
+        db.execute(text("INSERT INTO papers (title) VALUES (:title)"), {"title": title})
+    db.execute(text("UPDATE papers SET citation_count = 5 WHERE title = 'a'"))
+    db.execute(text("DELETE FROM papers WHERE title = 'c'"))
+    db.commit()
+    assert feed.poll(db) == 5 and feed.position == 5
+    deltas = [(delta.paper_id, delta.inserted, delta.row is not None) for batch in batches for delta in batch]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert deltas == [(1, True, True), (2, True, True), (3, True, False), (1, False, True), (3, False, False)]
+    
+    # Un worker atrasado más allá de la retención no puede aplicar deltas: reconstruye
+    feed.position = 1
+    assert prune_changes(db, 1) == 4
+    feed.poll(db)
+    assert len(resets) == 2 and feed.position == 5
+    db.close()
+    test_engine.dispose()
+
+def test_search_warmup_from_weighted_logs(client):
+    """Test del warm-up: historial ponderado por recencia, primeras páginas en cache sin registrar logs"""
+    from contextlib import contextmanager
+    from datetime import datetime, timedelta
+    from src.database.models import SearchLog
+    from src.services.search_service import search_cache, clear_search_cache
+    from src.services.search_warmup import SearchWarmup, top_queries
+    client.post("/api/v1/papers/", json={"title": "Warmup Falcon Optics"})
+    client.post("/api/v1/papers/", json={"title": "Warmup Sparrow Songs"})
+    db = TestingSessionLocal()
+    db.query(SearchLog).delete()
+    now = datetime.utcnow()
+    db.add_all(
+        [SearchLog(query="falcon optics", search_type="papers", created_at=now - timedelta(hours=1)) for _ in range(3)]
+        + [SearchLog(query="sparrow", search_type="papers", created_at=now - timedelta(days=5)) for _ in range(20)]
+        + [SearchLog(query="author:nobody", search_type="query", created_at=now)]
+        + [SearchLog(query="ancient", search_type="papers", created_at=now - timedelta(days=30))]
+    )
+    db.commit()
+    
+    ranked, total = top_queries(db, 10, lookback_days=7, half_life_hours=24)
+    assert [key for key, _ in ranked] == [("falcon optics", "papers"), ("author:nobody", "query"), ("sparrow", "papers")]
+    
+    clear_search_cache()
+    warmup = SearchWarmup(10, lookback_days=7, half_life_hours=24, time_budget_seconds=30)
+    warmup.start(contextmanager(override_get_db), target_hit_ratio=0.5)
+    assert warmup.wait_ready(10)
+    warmup._thread.join(10)
+    stats = warmup.stats()
+    assert stats["status"] == "done" and stats["warmed"] == 3 and stats["cached"] == 2
+    assert 0.5 < stats["hit_ratio"] < 1
+    assert {"papers_falcon optics_0_10_*_", "papers_sparrow_0_10_*_"} <= set(search_cache)
+    assert db.query(SearchLog).count() == 25
+    db.close()
+    
+    response = client.get("/ready")
+    assert response.status_code == 200 and response.json()["status"] == "ready"
+
+def test_trending_sketches_sliding_windows_and_snapshot(tmp_path):
+    """Test de tendencias: heavy hitters con Count-Min + heap, HyperLogLog de buscadores, ventanas y snapshot"""
+    from src.services.trending import TrendingSearches
+    trending = TrendingSearches(10, 1024, 4, 12, str(tmp_path / "trending.npz"), 0)
+    now = 1_000_000.0
+    for i in range(3000):
+        query = "Redes Neuronales" if i % 3 == 0 else f"consulta rara {i}"
+        trending.record(query, f"cliente-{i % 400}", now + i * 0.5)
+    end = now + 1500
+    
+    summary = trending.trending("1h", 5, now=end)
+    assert summary["queries"][0]["query"] == "redes neuronales"
+    assert 1000 <= summary["queries"][0]["count"] <= 1000 + 3000 * 3 / 1024
+    assert summary["searches"] == 3000
+    assert abs(summary["distinct_searchers"] - 400) <= 20
+    
+    # Pasada la hora solo queda en la ventana de 24h
+    later = end + 2 * 3600
+    assert trending.trending("1h", 5, now=later)["queries"] == []
+    assert trending.trending("24h", 5, now=later)["queries"][0]["query"] == "redes neuronales"
+    
+    trending.save()
+    restored = TrendingSearches(10, 1024, 4, 12, str(tmp_path / "trending.npz"), 0)
+    assert restored.load()
+    assert restored.trending("24h", 5, now=later) == trending.trending("24h", 5, now=later)
+    assert not TrendingSearches(10, 2048, 4, 12, str(tmp_path / "trending.npz"), 0).load()
+
+def test_trending_snapshots_per_worker(tmp_path):
+    """Test de tendencias con varios workers: cada uno guarda su snapshot, se suman al consultar y los huérfanos se adoptan una vez"""
+    import os
+    from src.services.trending import TrendingSearches
+    path = str(tmp_path / "trending.npz")
+    now = 1_000_000.0
+    
+    def worker(worker_id):
+        return TrendingSearches(10, 1024, 4, 12, path, 0, worker_id=worker_id)
+    
+    finished = worker("999999999")
+    for i in range(3):
+        finished.record("redes neuronales", f"cliente-{i}", now)
+    finished.save()
+    running = worker(str(os.getppid()))
+    for i in range(2):
+        running.record("grafos", "cliente-0", now)
+    running.save()
+    
+    current = worker(str(os.getpid()))
+    current.start()
+    assert not os.path.exists(finished.worker_path) and os.path.exists(running.worker_path)
+    current.record("compiladores", "cliente-9", now + 1)
+    summary = current.trending("1h", 5, now=now + 2)
+    assert summary["queries"] == [
+        {"query": "redes neuronales", "count": 3}, {"query": "grafos", "count": 2}, {"query": "compiladores", "count": 1}
+    ]
+    assert summary["searches"] == 6 and summary["distinct_searchers"] == 4
+    
+    # Reiniciar no duplica: el snapshot adoptado ya no está y el del worker que sigue corriendo solo se lee
+    restarted = worker(str(os.getpid()))
+    restarted.start()
+    assert restarted.trending("1h", 5, now=now + 2)["queries"] == [
+        {"query": "redes neuronales", "count": 3}, {"query": "grafos", "count": 2}
+    ]
+
+def test_trending_endpoint_fed_from_search_path(client):
+    """Test del endpoint de tendencias alimentado por las búsquedas con resultados"""
+    from src.services.trending import trending_searches
+    trending_searches.clear()
+    client.post("/api/v1/papers/", json={"title": "Trending Quasar Survey", "authors": ["Vera Rubin"]})
+    for _ in range(3):
+        client.get("/api/v1/search/papers", params={"q": "Trending QUASAR"})
+    client.get("/api/v1/search/authors", params={"q": "vera rubin"})
+    client.get("/api/v1/search/papers", params={"q": "zzzz sin resultados"})
+    
+    response = client.get("/api/v1/search/trending", params={"window": "1h", "limit": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["queries"] == [{"query": "trending quasar", "count": 3}, {"query": "vera rubin", "count": 1}]
+    assert data["searches"] == 4 and data["distinct_searchers"] == 1
+    
+    assert client.get("/api/v1/search/trending", params={"window": "7d"}).status_code == 400
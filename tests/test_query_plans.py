@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import create_engine
+
+from tests.performance.query_plan_checker import (
+    check_query_plans, explain, measure_queries_per_request, plan_problems, seed_database
+)
+
+@pytest.fixture(scope="module")
+def seeded_engine(tmp_path_factory):
+    """Base SQLite sembrada para evaluar planes de consulta"""
+    path = tmp_path_factory.mktemp("query_plans") / "query_plans.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    seed_database(engine, papers=1000, users=100)
+    yield engine
+    engine.dispose()
+
+def test_hot_queries_use_indexes(seeded_engine):
+    """Test de regresión: ninguna consulta caliente hace SCAN fuera de su allowlist"""
+    results = check_query_plans(seeded_engine)
+    assert {result["query"] for result in results} >= {
+        "search_papers", "search_papers_by_author", "get_papers", "get_popular_papers", "get_user_by_username"
+    }
+    violations = {result["query"]: result["violations"] for result in results if result["violations"]}
+    assert violations == {}
+
+    popular = next(result for result in results if result["query"] == "get_popular_papers")
+    assert any("ix_papers_citation_count" in step for step in popular["plan"])
+
+def test_plan_checker_detects_full_scan(seeded_engine):
+    """Test del checker: un filtro sin índice se reporta como SCAN y un ORDER BY sin índice como sort temporal"""
+    steps = explain(seeded_engine, "SELECT id FROM papers WHERE abstract = ? ORDER BY publication_year", ("x",))
+    assert plan_problems(steps) == ["SCAN papers", "USE TEMP B-TREE FOR ORDER BY"]
+
+    steps = explain(seeded_engine, "SELECT id FROM users WHERE username = ?", ("qp_user_1",))
+    assert plan_problems(steps) == []
+
+def test_queries_per_request_within_budget(seeded_engine):
+    """Test del presupuesto de consultas SQL por request de cada endpoint"""
+    results = measure_queries_per_request(seeded_engine)
+    assert all(result["status_code"] == 200 for result in results)
+    over_budget = {result["endpoint"]: result["queries"] for result in results if result["over_budget"]}
+    assert over_budget == {}